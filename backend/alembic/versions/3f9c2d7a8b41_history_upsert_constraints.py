@@ -0,0 +1,38 @@
+"""history upsert constraints
+
+Revision ID: 3f9c2d7a8b41
+Revises: ca4bbd565b8c
+Create Date: 2026-10-19 09:12:40.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f9c2d7a8b41'
+down_revision: Union[str, None] = 'ca4bbd565b8c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Drop duplicate history rows left by the old select-then-insert path, keeping the latest
+    op.execute("""
+        DELETE FROM history a
+        USING history b
+        WHERE a.user_id = b.user_id
+          AND a.movie_id = b.movie_id
+          AND a.id < b.id
+    """)
+    op.create_unique_constraint('unique_user_movie_history', 'history', ['user_id', 'movie_id'])
+    op.create_index('ix_history_user_id_timestamp', 'history', ['user_id', sa.text('timestamp DESC')], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_history_user_id_timestamp', table_name='history')
+    op.drop_constraint('unique_user_movie_history', 'history', type_='unique')
@@ -0,0 +1,42 @@
+"""history and ratings keyset indexes
+
+Revision ID: 8d2e61b0c5f7
+Revises: 3f9c2d7a8b41
+Create Date: 2026-10-19 11:40:02.511873
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d2e61b0c5f7'
+down_revision: Union[str, None] = '3f9c2d7a8b41'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Keyset pagination compares (timestamp, id), so timestamp can't be NULL
+    op.execute("UPDATE history SET timestamp = 'epoch' WHERE timestamp IS NULL")
+    op.alter_column('history', 'timestamp',
+               existing_type=sa.DateTime(),
+               nullable=False,
+               server_default=sa.text('now()'))
+    op.drop_index('ix_history_user_id_timestamp', table_name='history')
+    op.create_index('ix_history_user_id_timestamp_id', 'history', ['user_id', sa.text('timestamp DESC'), sa.text('id DESC')], unique=False)
+    op.create_index('ix_ratings_user_id_id', 'ratings', ['user_id', sa.text('id DESC')], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_ratings_user_id_id', table_name='ratings')
+    op.drop_index('ix_history_user_id_timestamp_id', table_name='history')
+    op.create_index('ix_history_user_id_timestamp', 'history', ['user_id', sa.text('timestamp DESC')], unique=False)
+    op.alter_column('history', 'timestamp',
+               existing_type=sa.DateTime(),
+               nullable=True,
+               server_default=None)
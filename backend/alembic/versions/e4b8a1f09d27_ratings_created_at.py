@@ -0,0 +1,29 @@
+"""ratings created_at
+
+Revision ID: e4b8a1f09d27
+Revises: b7e1d94a2c36
+Create Date: 2026-10-19 18:40:12.551903
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4b8a1f09d27'
+down_revision: Union[str, None] = 'b7e1d94a2c36'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Existing ratings get the migration time and decay from there
+    op.add_column('ratings', sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('ratings', 'created_at')
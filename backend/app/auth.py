@@ -1,7 +1,13 @@
+import asyncio
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from app.config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
+from app.config import (
+    SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES, PASSWORD_HASH_WORKERS, PASSWORD_HASH_QUEUE
+)
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -19,3 +25,79 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     expire = datetime.utcnow() + (expires_delta if expires_delta else timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+
+
+class PasswordHasherBusy(Exception):
+    """Every bcrypt worker is busy and the wait queue is full."""
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt on its own small thread pool instead of the shared request threadpool.
+
+    bcrypt releases the GIL, so `workers` threads give that many cores to hashing
+    and no more. At most `queue_size` further calls may wait; beyond that calls
+    fail fast with PasswordHasherBusy, so a login burst can't starve other routes.
+    """
+
+    def __init__(self, workers=PASSWORD_HASH_WORKERS, queue_size=PASSWORD_HASH_QUEUE):
+        self.workers = workers
+        self.queue_size = queue_size
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        # Recent (queue wait, hash time) samples in ms, for percentiles
+        self._samples = deque(maxlen=1000)
+
+    async def _run(self, fn, *args):
+        if self._in_flight >= self.workers + self.queue_size:
+            self.rejected += 1
+            raise PasswordHasherBusy()
+
+        self._in_flight += 1
+        submitted = time.perf_counter()
+
+        def timed():
+            started = time.perf_counter()
+            return fn(*args), started, time.perf_counter()
+
+        try:
+            result, started, finished = await asyncio.get_running_loop().run_in_executor(self._executor, timed)
+        finally:
+            self._in_flight -= 1
+        self.completed += 1
+        self._samples.append(((started - submitted) * 1000, (finished - started) * 1000))
+        return result
+
+    async def hash(self, password: str):
+        return await self._run(hash_password, password)
+
+    async def verify(self, plain_password, hashed_password):
+        return await self._run(verify_password, plain_password, hashed_password)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        waits = sorted(s[0] for s in self._samples)
+        times = sorted(s[1] for s in self._samples)
+
+        def pct(values, q):
+            return round(values[min(len(values) - 1, int(q * len(values)))], 3) if values else None
+
+        return {
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "in_flight": self._in_flight,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "hash_ms_p50": pct(times, 0.5),
+            "hash_ms_p95": pct(times, 0.95),
+            "hash_ms_max": round(times[-1], 3) if times else None,
+            "queue_wait_ms_p50": pct(waits, 0.5),
+            "queue_wait_ms_p95": pct(waits, 0.95),
+        }
+
+
+password_hasher = PasswordHasher()
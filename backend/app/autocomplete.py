@@ -0,0 +1,137 @@
+import heapq
+import re
+from array import array
+from bisect import bisect_left
+from collections import Counter, defaultdict
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+_ARTICLES = ("the ", "a ", "an ")
+
+# Fuzzy lookups seed candidates from this many of the query's rarest trigrams
+FUZZY_SEED_TRIGRAMS = 6
+MAX_FUZZY_CANDIDATES = 50
+# Trigrams shared by more titles than this carry too little signal to seed from
+MAX_SEED_POSTINGS = 5000
+MIN_FUZZY_SIMILARITY = 0.3
+
+
+def normalize(title):
+    """Lowercase, drop punctuation and collapse whitespace: "Spider-Man: Homecoming" -> "spider man homecoming"."""
+    return _NON_ALNUM.sub(" ", str(title).lower()).strip()
+
+
+def _trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TitleIndex:
+    """
+    Autocomplete and title-resolution index.
+
+    Prefix lookups bisect a sorted array of normalized titles (each title is also
+    stored without a leading article, so "dark kn" finds "The Dark Knight").
+    Typo-tolerant lookups use a character-trigram inverted index scored by
+    trigram overlap (Jaccard similarity).
+    """
+
+    def __init__(self, titles, weights=None):
+        self.titles = list(titles)
+        self.weights = list(weights) if weights is not None else [0.0] * len(self.titles)
+        self._normalized = [normalize(t) for t in self.titles]
+
+        # Exact lookup by normalized title (first occurrence wins)
+        self._exact = {}
+        for doc, key in enumerate(self._normalized):
+            self._exact.setdefault(key, doc)
+
+        entries = []
+        for doc, key in enumerate(self._normalized):
+            entries.append((key, doc))
+            for article in _ARTICLES:
+                if key.startswith(article):
+                    entries.append((key[len(article):], doc))
+                    break
+        entries.sort()
+        self._keys = [key for key, _ in entries]
+        self._docs = array("i", (doc for _, doc in entries))
+
+        postings = defaultdict(lambda: array("i"))
+        for doc, key in enumerate(self._normalized):
+            for gram in _trigrams(key):
+                postings[gram].append(doc)
+        self._postings = dict(postings)
+
+    def __len__(self):
+        return len(self.titles)
+
+    def prefix(self, query, limit=10):
+        """Docs whose title (or title without its article) starts with `query`, shortest/most popular first."""
+        q = normalize(query)
+        if not q:
+            return []
+        start = bisect_left(self._keys, q)
+        seen = set()
+        candidates = []
+        # Scan a bounded window so very short prefixes stay cheap
+        for i in range(start, min(start + limit * 20, len(self._keys))):
+            if not self._keys[i].startswith(q):
+                break
+            doc = self._docs[i]
+            if doc not in seen:
+                seen.add(doc)
+                candidates.append(doc)
+        candidates.sort(key=lambda doc: (len(self._normalized[doc]), -self.weights[doc]))
+        return candidates[:limit]
+
+    def fuzzy(self, query, limit=10, min_similarity=MIN_FUZZY_SIMILARITY):
+        """
+        [(doc, similarity)] by trigram Jaccard similarity, best first.
+
+        Candidates come from the rarest few query trigrams only (a single typo
+        breaks at most three); the ones sharing the most of them are then scored
+        against their full trigram set, so the work is bounded by short posting
+        lists rather than catalog size.
+        """
+        q = normalize(query)
+        if not q:
+            return []
+        grams = _trigrams(q)
+        seeds = sorted((g for g in grams if g in self._postings), key=lambda g: len(self._postings[g]))
+        hits = Counter()
+        for gram in seeds[:FUZZY_SEED_TRIGRAMS]:
+            postings = self._postings[gram]
+            if len(postings) > MAX_SEED_POSTINGS:
+                break
+            hits.update(postings)
+        if not hits:
+            return []
+
+        scored = []
+        for doc, _ in hits.most_common(MAX_FUZZY_CANDIDATES):
+            title_grams = _trigrams(self._normalized[doc])
+            shared = len(grams & title_grams)
+            scored.append((doc, shared / (len(grams) + len(title_grams) - shared)))
+        best = heapq.nlargest(limit, scored, key=lambda item: (item[1], self.weights[item[0]]))
+        return [(doc, sim) for doc, sim in best if sim >= min_similarity]
+
+    def suggest(self, query, limit=10):
+        """Prefix matches first, topped up with fuzzy matches for typos."""
+        docs = self.prefix(query, limit)
+        if len(docs) < limit:
+            seen = set(docs)
+            for doc, _ in self.fuzzy(query, limit):
+                if doc not in seen:
+                    docs.append(doc)
+                    seen.add(doc)
+                if len(docs) >= limit:
+                    break
+        return docs
+
+    def resolve(self, title, min_similarity=0.4):
+        """Best doc for a possibly misspelled title, or None."""
+        doc = self._exact.get(normalize(title))
+        if doc is not None:
+            return doc
+        matches = self.fuzzy(title, limit=1, min_similarity=min_similarity)
+        return matches[0][0] if matches else None
@@ -0,0 +1,76 @@
+import ast
+import pickle
+import sys
+from pathlib import Path
+import pandas as pd
+
+MODEL_DIR = Path("app/ml_model")
+META_PATH = MODEL_DIR / "movie_meta.pkl"
+
+
+def _names(obj, limit=None, job=None):
+    names = []
+    for item in ast.literal_eval(obj) if isinstance(obj, str) else []:
+        if job and item.get("job") != job:
+            continue
+        names.append(item["name"])
+        if limit and len(names) >= limit:
+            break
+    return names
+
+
+def build_metadata(movies_csv=MODEL_DIR / "tmdb_5000_movies.csv",
+                   credits_csv=MODEL_DIR / "tmdb_5000_credits.csv",
+                   fetch_posters=False):
+    """
+    Build movie_meta.pkl (tmdb_id -> display metadata) from the TMDB 5000 dataset
+    used to train the model, so search and recommendations can be served without TMDB.
+
+    Poster paths are not in the dataset; with fetch_posters=True they are looked
+    up once from TMDB at background priority and stored with the rest.
+    """
+    movies = pd.read_csv(movies_csv)
+    credits = pd.read_csv(credits_csv)
+    movies = movies.merge(credits[["movie_id", "cast", "crew"]], left_on="id", right_on="movie_id")
+
+    meta = {}
+    for row in movies.itertuples(index=False):
+        meta[int(row.id)] = {
+            "title": row.title,
+            "overview": row.overview if isinstance(row.overview, str) else "",
+            "release_date": row.release_date if isinstance(row.release_date, str) else None,
+            "vote_average": float(row.vote_average),
+            "popularity": float(row.popularity),
+            "genres": _names(row.genres),
+            "keywords": _names(row.keywords),
+            "cast": _names(row.cast, limit=3),
+            "directors": _names(row.crew, job="Director"),
+            "poster_path": None,
+        }
+
+    if fetch_posters:
+        from app import tmdb
+
+        for i, (tmdb_id, entry) in enumerate(meta.items(), 1):
+            try:
+                response = tmdb.get(f"/movie/{tmdb_id}", priority=tmdb.PRIORITY_BACKGROUND)
+            except tmdb.TMDBUnavailable:
+                continue
+            if response.status_code == 200:
+                entry["poster_path"] = response.json().get("poster_path")
+            if i % 500 == 0:
+                print(f"Fetched posters for {i}/{len(meta)} movies")
+
+    META_PATH.parent.mkdir(parents=True, exist_ok=True)
+    with open(META_PATH, "wb") as f:
+        pickle.dump(meta, f)
+    print(f"✅ Wrote metadata for {len(meta)} movies to {META_PATH}")
+    return meta
+
+
+if __name__ == "__main__":
+    try:
+        build_metadata(fetch_posters="--posters" in sys.argv)
+    except Exception as e:
+        print(f"❌ Error building metadata: {e}")
+        exit(1)
@@ -0,0 +1,44 @@
+import argparse
+import logging
+import os
+import pickle
+import sys
+import time
+from pathlib import Path
+from app.shards import build
+
+MODEL_DIR = Path(os.getenv("MODEL_DIR", "app/ml_model"))
+
+
+def build_shards(n_shards, model_dir=MODEL_DIR, out_dir=None, dtype=None):
+    """
+    Split simi.pkl into `n_shards` column slabs for MODEL_SHARDS.
+
+    Serving hosts then only need movie_dict.pkl, movie_meta.pkl and the shards
+    directory. Rebuild whenever simi.pkl changes.
+    """
+    source = Path(model_dir) / "simi.pkl"
+    out_dir = Path(out_dir) if out_dir else Path(model_dir) / "shards"
+    with open(source, "rb") as f:
+        simi = pickle.load(f)
+    start = time.perf_counter()
+    manifest = build(simi, out_dir, n_shards, dtype=dtype, source=f"{source.name}:{source.stat().st_size}")
+    print(f"✅ Wrote {n_shards} shards of {manifest['rows']} rows ({manifest['dtype']}) to {out_dir} "
+          f"in {time.perf_counter() - start:.1f}s")
+    return manifest
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Split the similarity matrix into shards (see app/shards.py).")
+    parser.add_argument("--shards", type=int, required=True, help="usually one per core given to the model")
+    parser.add_argument("--model-dir", type=Path, default=MODEL_DIR)
+    parser.add_argument("--out", type=Path, help="defaults to <model-dir>/shards")
+    parser.add_argument("--dtype", choices=["float32", "float64"], help="float32 halves the size; default keeps simi.pkl's")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    try:
+        build_shards(args.shards, args.model_dir, args.out, args.dtype)
+    except Exception as e:
+        print(f"❌ Error building shards: {e}")
+        sys.exit(1)
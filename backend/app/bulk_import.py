@@ -0,0 +1,31 @@
+import argparse
+import asyncio
+import json
+from pathlib import Path
+from app.database import AsyncSessionLocal, async_engine
+from app.services.import_service import ImportFormatError, import_events, parse_lines, CHUNK_SIZE
+
+
+async def run_import(path: Path, fmt: str, chunk_size: int):
+    async with AsyncSessionLocal() as db:
+        with open(path, newline="", encoding="utf-8") as f:
+            stats = await import_events(db, parse_lines(f, fmt), chunk_size=chunk_size)
+    await async_engine.dispose()
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk import watch/rating events (user, tmdb_id, timestamp, rating).")
+    parser.add_argument("path", type=Path, help="CSV or NDJSON file")
+    parser.add_argument("--format", choices=["csv", "ndjson"], help="defaults from the file extension")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="rows per staging load")
+    args = parser.parse_args()
+
+    fmt = args.format or ("ndjson" if args.path.suffix.lower() in (".ndjson", ".jsonl") else "csv")
+    try:
+        stats = asyncio.run(run_import(args.path, fmt, args.chunk_size))
+        print(json.dumps(stats, indent=2))
+        print(f"✅ Imported {stats['rows']} rows at {stats['rows_per_sec']} rows/sec")
+    except ImportFormatError as e:
+        print(f"❌ Invalid import file: {e}")
+        exit(1)
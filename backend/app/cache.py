@@ -0,0 +1,327 @@
+"""
+Caches for the request path.
+
+TTLCache is a per-process LRU. NearCache puts one in front of a shared
+backend (see CACHE_URL): values are served from the local level for up to
+CACHE_NEAR_TTL seconds, and otherwise read from the backend, which every
+replica writes to. A cold replica then mostly starts from warm data, and the
+hit rate grows with the fleet size rather than being split across it.
+
+Backends store encoded bytes and implement get_many / set_many / delete /
+stats. LocalBackend keeps them in process; RedisBackend (app/redis_backend.py)
+talks to any Redis-protocol server. The shared cache is best effort: if the
+backend fails or is slow, lookups count as misses and callers go to the source.
+"""
+import asyncio
+import datetime
+import io
+import pickle
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from app.config import (
+    CACHE_URL, CACHE_PREFIX, CACHE_NEAR_TTL, CACHE_COMPRESS_MIN,
+)
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries also expire after `ttl` seconds.
+
+    Used for small per-process caches on the request path; each process keeps
+    its own copy, so `ttl` bounds how stale an entry can get on other workers.
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._items = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+        with self._lock:
+            item = self._items.get(key)
+            if item is None or item[1] <= now:
+                if item is not None:
+                    del self._items[key]
+                self.misses += 1
+                return default
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def set(self, key, value, ttl=None):
+        """Store `value`; `ttl` overrides the default lifetime (never extends past it)."""
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._items[key] = (value, time.monotonic() + ttl)
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            item = self._items.pop(key, None)
+        return item[0] if item is not None else None
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self):
+        return len(self._items)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._items),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+        }
+
+
+class CacheUnavailable(Exception):
+    """The shared backend couldn't answer; callers treat this as a miss."""
+
+
+# Values are pickled, but only these classes (plus ones passed to cacheable()) may be unpickled,
+# so whoever can write to the shared server can't make a replica run arbitrary code
+_ALLOWED_CLASSES = {
+    ("builtins", name) for name in ("dict", "list", "tuple", "set", "frozenset", "bytes", "bytearray")
+} | {
+    ("datetime", name) for name in ("datetime", "date", "time", "timedelta", "timezone")
+}
+
+_RAW = b"\x00"
+_ZLIB = b"\x01"
+
+
+def cacheable(cls):
+    """Class decorator allowing instances of `cls` in shared-cache values."""
+    _ALLOWED_CLASSES.add((cls.__module__, cls.__qualname__))
+    return cls
+
+
+class _Unpickler(pickle.Unpickler):
+    def find_class(self, module, name):
+        if (module, name) not in _ALLOWED_CLASSES:
+            raise pickle.UnpicklingError(f"{module}.{name} is not allowed in cached values")
+        return super().find_class(module, name)
+
+
+def encode(value):
+    """Compact binary form: a format byte, then the pickle (zlib-compressed when that pays off)."""
+    data = pickle.dumps(value, protocol=5)
+    if len(data) >= CACHE_COMPRESS_MIN:
+        packed = zlib.compress(data, 1)
+        if len(packed) < len(data):
+            return _ZLIB + packed
+    return _RAW + data
+
+
+def decode(blob):
+    data = zlib.decompress(blob[1:]) if blob[:1] == _ZLIB else blob[1:]
+    return _Unpickler(io.BytesIO(data)).load()
+
+
+class LocalBackend:
+    """In-process backend; shared by the caches of one process only (and for tests and benchmarks)."""
+
+    name = "memory"
+
+    def __init__(self, maxsize=100_000):
+        self._items = TTLCache(maxsize, float("inf"))
+
+    def get_many(self, keys):
+        return [self._items.get(key) for key in keys]
+
+    def set_many(self, items, ttl):
+        for key, blob in items.items():
+            self._items.set(key, blob, ttl)
+
+    def delete(self, keys):
+        for key in keys:
+            self._items.pop(key)
+
+    def close(self):
+        self._items.clear()
+
+    def stats(self):
+        return {"backend": self.name, "entries": len(self._items)}
+
+
+_MISSING = object()
+
+
+class NearCache:
+    """
+    Two-level cache: a per-process TTLCache of decoded values in front of a
+    shared backend of encoded ones. Without a backend it's just the TTLCache.
+
+    The sync methods do network I/O on a miss; from the event loop use the
+    a* variants, which only leave the loop when the local level misses.
+    """
+
+    def __init__(self, name, ttl, maxsize, backend=None, near_ttl=CACHE_NEAR_TTL):
+        self.name = name
+        self.ttl = ttl
+        self.backend = backend
+        self.local = TTLCache(maxsize, ttl if backend is None else min(ttl, near_ttl))
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.remote_hits = 0
+        self.errors = 0
+
+    def _key(self, key):
+        return f"{CACHE_PREFIX}{self.name}:{key}"
+
+    def _count(self, hits, misses, remote_hits=0, errors=0):
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+            self.remote_hits += remote_hits
+            self.errors += errors
+
+    def _local_many(self, keys):
+        found, missing = {}, []
+        for key in keys:
+            value = self.local.get(key, _MISSING)
+            if value is _MISSING:
+                missing.append(key)
+            else:
+                found[key] = value
+        return found, missing
+
+    def _remote_many(self, keys):
+        """Read `keys` from the backend in one round trip and fill the local level with what's found."""
+        found = {}
+        errors = 0
+        if self.backend is not None and keys:
+            try:
+                blobs = self.backend.get_many([self._key(key) for key in keys])
+            except CacheUnavailable:
+                blobs = ()
+                errors += 1
+            for key, blob in zip(keys, blobs):
+                if blob is None:
+                    continue
+                try:
+                    value = decode(blob)
+                except Exception:
+                    errors += 1  # written by an incompatible version, or corrupt; recomputed by the caller
+                    continue
+                self.local.set(key, value)
+                found[key] = value
+        return found, errors
+
+    def get_many(self, keys):
+        """{key: value} for the keys found at either level."""
+        found, missing = self._local_many(keys)
+        local_hits = len(found)
+        remote, errors = self._remote_many(missing)
+        found.update(remote)
+        self._count(local_hits + len(remote), len(missing) - len(remote), len(remote), errors)
+        return found
+
+    def get(self, key, default=None):
+        return self.get_many([key]).get(key, default)
+
+    async def aget(self, key, default=None):
+        value = self.local.get(key, _MISSING)
+        if value is not _MISSING:
+            self._count(1, 0)
+            return value
+        remote, errors = {}, 0
+        if self.backend is not None:
+            remote, errors = await asyncio.to_thread(self._remote_many, [key])
+        self._count(len(remote), 1 - len(remote), len(remote), errors)
+        return remote.get(key, default)
+
+    def set_many(self, items, ttl=None):
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+        for key, value in items.items():
+            self.local.set(key, value, ttl)
+        if self.backend is not None:
+            try:
+                self.backend.set_many({self._key(key): encode(value) for key, value in items.items()}, ttl)
+            except CacheUnavailable:
+                self._count(0, 0, errors=1)
+
+    def set(self, key, value, ttl=None):
+        self.set_many({key: value}, ttl)
+
+    async def aset(self, key, value, ttl=None):
+        if self.backend is None:
+            self.set(key, value, ttl)
+        else:
+            await asyncio.to_thread(self.set, key, value, ttl)
+
+    def pop(self, key):
+        """Drop `key` at both levels; other replicas may serve their local copy for up to near_ttl."""
+        value = self.local.pop(key)
+        if self.backend is not None:
+            try:
+                self.backend.delete([self._key(key)])
+            except CacheUnavailable:
+                self._count(0, 0, errors=1)
+        return value
+
+    async def apop(self, key):
+        if self.backend is None:
+            return self.pop(key)
+        return await asyncio.to_thread(self.pop, key)
+
+    def clear(self):
+        """Empty the local level (the shared one is left to expire)."""
+        self.local.clear()
+
+    def __len__(self):
+        return len(self.local)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.local),
+            "maxsize": self.local.maxsize,
+            "ttl": self.ttl,
+            "near_ttl": self.local.ttl,
+            "backend": self.backend.name if self.backend is not None else None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "remote_hits": self.remote_hits,
+            "errors": self.errors,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+        }
+
+
+def make_backend(url):
+    """Backend for a CACHE_URL, or None for process-local caching only."""
+    if not url:
+        return None
+    if url.startswith("memory://"):
+        return LocalBackend()
+    if url.startswith(("redis://", "rediss://")):
+        from app.redis_backend import RedisBackend
+        return RedisBackend(url)
+    raise ValueError(f"Unsupported CACHE_URL scheme: {url.split('://')[0]}")
+
+
+# One backend (and connection pool) per process, shared by every NearCache
+backend = make_backend(CACHE_URL)
+
+
+def shared_cache(name, ttl, maxsize):
+    """A NearCache over the configured backend; `name` namespaces its keys on the shared server."""
+    return NearCache(name, ttl, maxsize, backend)
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 # Load .env file
@@ -9,6 +10,13 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 if not DATABASE_URL:
     raise ValueError("DATABASE_URL environment variable is not set")
 
+# Database connection pool
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))  # seconds to wait for a free connection
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # seconds before a connection is replaced
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "500"))  # asyncpg prepared statements per connection
+
 # JWT Configuration
 SECRET_KEY = os.getenv("SECRET_KEY")
 if not SECRET_KEY:
@@ -21,3 +29,98 @@ ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30")
 TMDB_API_KEY = os.getenv("TMDB_API_KEY")
 if not TMDB_API_KEY:
     raise ValueError("TMDB_API_KEY environment variable is not set")
+
+TMDB_BASE_URL = os.getenv("TMDB_BASE_URL", "https://api.themoviedb.org/3")  # overridden by the benchmark stub
+
+# TMDB client limits
+TMDB_RATE_LIMIT = float(os.getenv("TMDB_RATE_LIMIT", "40"))  # requests per second
+TMDB_BURST = int(os.getenv("TMDB_BURST", "20"))
+TMDB_TIMEOUT = float(os.getenv("TMDB_TIMEOUT", "5"))  # seconds per upstream call
+TMDB_QUEUE_TIMEOUT = float(os.getenv("TMDB_QUEUE_TIMEOUT", "2"))  # max wait for a rate-limit token
+TMDB_MAX_RETRIES = int(os.getenv("TMDB_MAX_RETRIES", "3"))
+TMDB_INTERACTIVE_RETRIES = int(os.getenv("TMDB_INTERACTIVE_RETRIES", "1"))  # retry cap for calls made inside a request
+TMDB_DEADLINE = float(os.getenv("TMDB_DEADLINE", "8"))  # seconds an interactive call may take, waits and retries included
+TMDB_BACKGROUND_DEADLINE = float(os.getenv("TMDB_BACKGROUND_DEADLINE", "30"))  # same for background refreshes
+TMDB_BREAKER_THRESHOLD = int(os.getenv("TMDB_BREAKER_THRESHOLD", "5"))  # consecutive failures
+TMDB_BREAKER_COOLDOWN = float(os.getenv("TMDB_BREAKER_COOLDOWN", "30"))  # seconds
+
+# Admin access (bulk import and other maintenance endpoints)
+ADMIN_USERNAMES = {u.strip() for u in os.getenv("ADMIN_USERNAMES", "").split(",") if u.strip()}
+
+# bcrypt runs on a dedicated pool: worker threads plus a bounded wait queue (excess calls get 503)
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_QUEUE = int(os.getenv("PASSWORD_HASH_QUEUE", "32"))
+
+# Per-process cache of authenticated users (get_current_user) and verified bearer tokens
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "60"))  # seconds; bounds staleness across workers
+
+# Write-behind buffering for POST /history (off by default: writes commit on the request path)
+HISTORY_WRITE_BEHIND = os.getenv("HISTORY_WRITE_BEHIND", "false").lower() in ("1", "true", "yes")
+HISTORY_BUFFER_SIZE = int(os.getenv("HISTORY_BUFFER_SIZE", "10000"))  # max queued events before rejecting
+HISTORY_FLUSH_BATCH = int(os.getenv("HISTORY_FLUSH_BATCH", "500"))  # rows per multi-row insert
+HISTORY_FLUSH_INTERVAL = float(os.getenv("HISTORY_FLUSH_INTERVAL", "0.5"))  # seconds
+HISTORY_ENQUEUE_TIMEOUT = float(os.getenv("HISTORY_ENQUEUE_TIMEOUT", "0.1"))  # seconds to wait for queue space
+HISTORY_FLUSH_RETRIES = int(os.getenv("HISTORY_FLUSH_RETRIES", "3"))  # retries of a failing batch before it's dropped
+
+# Popularity ranking (cold start and /movies/popular): time-decayed history/ratings blended with TMDB popularity
+POPULARITY_HALF_LIFE_DAYS = float(os.getenv("POPULARITY_HALF_LIFE_DAYS", "7"))
+POPULARITY_ENGAGEMENT_WEIGHT = float(os.getenv("POPULARITY_ENGAGEMENT_WEIGHT", "0.5"))  # 0 = dataset popularity only
+POPULARITY_REFRESH_INTERVAL = float(os.getenv("POPULARITY_REFRESH_INTERVAL", "60"))  # seconds
+POPULAR_LIST_SIZE = int(os.getenv("POPULAR_LIST_SIZE", "500"))
+
+# Materialized per-user recommendation feeds
+FEED_SIZE = int(os.getenv("FEED_SIZE", "50"))  # movies stored per user
+FEED_MAX_AGE = float(os.getenv("FEED_MAX_AGE", "3600"))  # seconds before a feed is recomputed by the sweep
+FEED_SWEEP_INTERVAL = float(os.getenv("FEED_SWEEP_INTERVAL", "300"))  # seconds between sweeps
+FEED_DEBOUNCE = float(os.getenv("FEED_DEBOUNCE", "2"))  # seconds to coalesce bursts of events
+FEED_WORKERS = int(os.getenv("FEED_WORKERS", "2"))
+
+# Slow-request span tracing: requests slower than this many ms keep a DB/TMDB/model/serialization breakdown (0 = off)
+TRACE_SLOW_REQUEST_MS = float(os.getenv("TRACE_SLOW_REQUEST_MS", "0"))
+TRACE_BUFFER_SIZE = int(os.getenv("TRACE_BUFFER_SIZE", "100"))  # most recent slow traces kept per process
+
+# On-demand sampling profiler (POST /api/admin/profile); workers coordinate through files in PROFILE_DIR
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() in ("1", "true", "yes")
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "movie-rec-profiles"))
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "60"))
+
+# Logging: JSON lines through a background queue listener (see app/log.py)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")  # per-logger overrides, e.g. "app.routes.user=DEBUG,sqlalchemy.engine=INFO"
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()  # json or text
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))  # records beyond this are dropped, not waited on
+LOG_HOT_PATH_RATE = float(os.getenv("LOG_HOT_PATH_RATE", "5"))  # records/second per call site on request paths (0 = no limit)
+
+# Response compression
+GZIP_MIN_SIZE = int(os.getenv("GZIP_MIN_SIZE", "1024"))  # bytes; smaller bodies aren't worth the CPU
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "5"))  # 1-9; 5 gets most of the size win of 9 at a fraction of the CPU
+
+# HTTP caching of model-backed responses (recommend, suggest, movie metadata) and the popular list
+MODEL_CACHE_MAX_AGE = int(os.getenv("MODEL_CACHE_MAX_AGE", "3600"))  # seconds; responses only change with the model files
+POPULAR_CACHE_MAX_AGE = int(os.getenv("POPULAR_CACHE_MAX_AGE", str(int(POPULARITY_REFRESH_INTERVAL))))
+
+# Shared cache behind the per-process caches: "" keeps them process-local, "memory://" is an in-process
+# backend, "redis://[:password@]host:port/db" shares entries across replicas (any Redis-protocol server)
+CACHE_URL = os.getenv("CACHE_URL", "")
+CACHE_PREFIX = os.getenv("CACHE_PREFIX", "movie-rec:")  # key namespace, so several apps can share one server
+CACHE_NEAR_TTL = float(os.getenv("CACHE_NEAR_TTL", "5"))  # seconds a replica serves its local copy of a shared entry
+CACHE_TIMEOUT = float(os.getenv("CACHE_TIMEOUT", "0.1"))  # seconds per round trip; slower counts as a miss
+CACHE_POOL_SIZE = int(os.getenv("CACHE_POOL_SIZE", "8"))  # idle connections kept per process
+CACHE_RETRY_AFTER = float(os.getenv("CACHE_RETRY_AFTER", "1"))  # seconds to skip the shared cache after a failure
+CACHE_COMPRESS_MIN = int(os.getenv("CACHE_COMPRESS_MIN", "1024"))  # bytes; larger values are zlib-compressed
+# Seconds successful TMDB responses are reused (0 = off); off by default without a shared CACHE_URL
+TMDB_CACHE_TTL = float(os.getenv("TMDB_CACHE_TTL", "3600" if CACHE_URL else "0"))
+TMDB_CACHE_SIZE = int(os.getenv("TMDB_CACHE_SIZE", "5000"))  # responses kept in each process's near cache
+
+# Sharded similarity index (app/shards.py): column shards of simi.pkl, each scanned by its own process
+MODEL_SHARDS = int(os.getenv("MODEL_SHARDS", "0"))  # must match the built shards; 0 = whole matrix in-process
+MODEL_SHARD_DIR = os.getenv("MODEL_SHARD_DIR", "")  # defaults to MODEL_DIR/shards
+MODEL_SHARD_TIMEOUT = float(os.getenv("MODEL_SHARD_TIMEOUT", "2"))  # seconds; shards slower than this are left out
+
+# In-process job scheduler (app/scheduler.py); replicas elect one leader through a Postgres advisory lock
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "true").lower() in ("1", "true", "yes")
+# Leader election needs a session-level lock, so point this past any transaction-mode pooler (PgBouncer, Neon -pooler)
+SCHEDULER_DATABASE_URL = os.getenv("SCHEDULER_DATABASE_URL", DATABASE_URL)
+SCHEDULER_LEADER_POLL = float(os.getenv("SCHEDULER_LEADER_POLL", "10"))  # seconds between leadership checks
+SCHEDULER_SCHEDULES = os.getenv("SCHEDULER_SCHEDULES", "")  # per-job overrides, e.g. "feeds.sweep=*/10 * * * *,popularity.refresh=120"
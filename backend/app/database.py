@@ -1,12 +1,121 @@
-from sqlalchemy import create_engine
+import json
+from time import perf_counter
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from app.config import DATABASE_URL
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool, NullPool
+from app.config import (
+    DATABASE_URL,
+    DB_POOL_SIZE,
+    DB_MAX_OVERFLOW,
+    DB_POOL_TIMEOUT,
+    DB_POOL_RECYCLE,
+    DB_STATEMENT_CACHE_SIZE,
+)
+from app import tracing
+from app.metrics import DB_QUERY_SECONDS, DB_POOL_WAIT_SECONDS
 
-engine = create_engine(DATABASE_URL)
+# Statement kinds reported in db_query_duration_seconds; anything else is "OTHER"
+_STATEMENT_KINDS = {"SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "COPY"}
+
+
+def _timed_pool(base, label):
+    """Pool class recording how long each checkout waits for a connection (or for a new one to open)."""
+
+    class TimedPool(base):
+        def _do_get(self):
+            start = perf_counter()
+            try:
+                return super()._do_get()
+            finally:
+                elapsed = perf_counter() - start
+                DB_POOL_WAIT_SECONDS.observe(elapsed, label)
+                if tracing.ENABLED:
+                    tracing.record("db_pool_wait", label, start, elapsed)
+
+    TimedPool.__name__ = f"Timed{base.__name__}"
+    return TimedPool
+
+
+def _instrument(sync_engine, label):
+    """Record statement execution time, labelled by statement kind (SELECT, INSERT, ...)."""
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _stop(conn, cursor, statement, parameters, context, executemany):
+        start = conn.info["query_start"].pop()
+        elapsed = perf_counter() - start
+        kind = statement.split(None, 1)[0].upper() if statement else ""
+        kind = kind if kind in _STATEMENT_KINDS else "OTHER"
+        DB_QUERY_SECONDS.observe(elapsed, label, kind)
+        if tracing.ENABLED:
+            tracing.record("db", kind, start, elapsed)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _failed(context):
+        # after_cursor_execute doesn't fire for failed statements
+        starts = context.connection.info.get("query_start") if context.connection is not None else None
+        if starts:
+            starts.pop()
+
+_pool_options = dict(
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_pre_ping=True,
+)
+
+# Sync engine: Alembic, scripts and the remaining threadpool routes
+engine = create_engine(DATABASE_URL, poolclass=_timed_pool(QueuePool, "sync"), **_pool_options)
+_instrument(engine, "sync")
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+
+def _async_url(url):
+    """
+    Turn the configured postgres URL into an asyncpg one.
+
+    asyncpg doesn't understand libpq's sslmode/channel_binding query params
+    (Neon URLs carry both), so sslmode is passed through as asyncpg's `ssl`.
+    """
+    url = make_url(url)
+    query = dict(url.query)
+    connect_args = {
+        "statement_cache_size": DB_STATEMENT_CACHE_SIZE,
+        "prepared_statement_cache_size": DB_STATEMENT_CACHE_SIZE,
+    }
+    sslmode = query.pop("sslmode", None)
+    query.pop("channel_binding", None)
+    if sslmode and sslmode != "disable":
+        connect_args["ssl"] = sslmode
+    return url.set(drivername="postgresql+asyncpg", query=query), connect_args
+
+
+_async_database_url, _async_connect_args = _async_url(DATABASE_URL)
+
+# Async engine: hot request paths run on the event loop instead of the threadpool
+async_engine = create_async_engine(
+    _async_database_url,
+    connect_args=_async_connect_args,
+    poolclass=_timed_pool(AsyncAdaptedQueuePool, "async"),
+    **_pool_options
+)
+_instrument(async_engine.sync_engine, "async")
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+
+
+def create_unpooled_async_engine(url=DATABASE_URL):
+    """Async engine that opens a fresh connection per connect(), for connections held indefinitely (advisory locks)."""
+    async_url, connect_args = _async_url(url)
+    return create_async_engine(async_url, connect_args=connect_args, poolclass=NullPool)
+
 # Dependency to get DB session
 def get_db():
     db = SessionLocal()
@@ -14,3 +123,38 @@ def get_db():
         yield db
     finally:
         db.close()
+
+# Dependency to get an async DB session
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def stream_ndjson(query, to_dict, batch_size=500):
+    """
+    Yield the rows of `query` as NDJSON lines, read through a server-side cursor
+    in batches so memory stays flat however many rows there are.
+
+    Uses its own session because it runs while the response is being streamed.
+    """
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(query.execution_options(yield_per=batch_size))
+        async for rows in result.partitions():
+            yield "".join(json.dumps(to_dict(row)) + "\n" for row in rows)
+
+
+def _pool_status(pool):
+    return {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+    }
+
+
+def pool_stats():
+    """Connection usage for both engines."""
+    return {
+        "sync": _pool_status(engine.pool),
+        "async": _pool_status(async_engine.pool),
+    }
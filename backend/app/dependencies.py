@@ -1,33 +1,115 @@
+import time
+from dataclasses import dataclass
+from typing import List, Optional
 from fastapi import Depends, HTTPException, Security
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from jose import jwt, JWTError
-from app.database import get_db
-from app.config import SECRET_KEY, ALGORITHM
+from app.cache import TTLCache, cacheable, shared_cache
+from app.database import get_async_db, AsyncSessionLocal
+from app.config import (
+    SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES, ADMIN_USERNAMES, USER_CACHE_SIZE, USER_CACHE_TTL
+)
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
-def get_current_user(token: str = Security(oauth2_scheme), db: Session = Depends(get_db)):
-    from app.models import User  # 🚀 Import inside function to avoid circular import
+# Bearer token -> subject, for tokens already verified (kept until the token expires)
+_token_cache = TTLCache(USER_CACHE_SIZE, ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+# Username -> CurrentUser, dropped by invalidate_user() whenever the row is written; shared across
+# replicas when CACHE_URL is set (tokens stay per process: verifying one is cheaper than a round trip)
+_user_cache = shared_cache("user", USER_CACHE_TTL, USER_CACHE_SIZE)
+
+
+@cacheable
+@dataclass(frozen=True)
+class CurrentUser:
+    """Read-only projection of the authenticated user (no password hash)."""
+    id: int
+    username: str
+    email: str
+    favorite_genres: Optional[List[str]]
+    favorite_actors: Optional[List[str]]
+    favorite_directors: Optional[List[str]]
 
-    credentials_exception = HTTPException(
+    @classmethod
+    def from_model(cls, user):
+        return cls(
+            id=user.id,
+            username=user.username,
+            email=user.email,
+            favorite_genres=user.favorite_genres,
+            favorite_actors=user.favorite_actors,
+            favorite_directors=user.favorite_directors,
+        )
+
+
+def _credentials_exception():
+    return HTTPException(
         status_code=401,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
 
+
+def _token_subject(token: str):
+    """Username from a bearer token; repeated tokens skip signature verification."""
+    username = _token_cache.get(token)
+    if username is not None:
+        return username
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
+    except JWTError:
+        raise _credentials_exception()
 
-        if username is None:
-            raise credentials_exception
+    username = payload.get("sub")
+    if username is None:
+        raise _credentials_exception()
 
-    except JWTError:
-        raise credentials_exception
+    exp = payload.get("exp")
+    if exp is not None:
+        _token_cache.set(token, username, ttl=exp - time.time())
+    return username
+
+
+async def invalidate_user(username: str):
+    """Forget the cached projection after the user's row changes."""
+    await _user_cache.apop(username)
 
-    user = db.query(User).filter(User.username == username).first()
+
+def auth_cache_stats():
+    return {"tokens": _token_cache.stats(), "users": _user_cache.stats()}
+
+
+async def get_current_user(token: str = Security(oauth2_scheme)):
+    from app.models import User  # 🚀 Import inside function to avoid circular import
+
+    username = _token_subject(token)
+    user = await _user_cache.aget(username)
+    if user is not None:
+        return user
+
+    async with AsyncSessionLocal() as db:
+        row = (await db.execute(select(User).where(User.username == username))).scalar_one_or_none()
+    if row is None:
+        raise _credentials_exception()
+
+    user = CurrentUser.from_model(row)
+    await _user_cache.aset(username, user)
+    return user
+
+async def get_current_user_for_update(token: str = Security(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
+    """The user's ORM row in the request session, for routes that modify it (call invalidate_user after commit)."""
+    from app.models import User
+
+    username = _token_subject(token)
+    user = (await db.execute(select(User).where(User.username == username))).scalar_one_or_none()
     if user is None:
-        raise credentials_exception
+        raise _credentials_exception()
+    return user
 
+async def get_admin_user(user=Depends(get_current_user)):
+    if user.username not in ADMIN_USERNAMES:
+        raise HTTPException(status_code=403, detail="Admin access required")
     return user
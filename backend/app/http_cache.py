@@ -0,0 +1,57 @@
+"""
+ETag / Cache-Control support for responses that are a pure function of a
+version (model files, popularity ranking) and the request's parameters.
+
+The ETag is computed from those inputs rather than from the response body,
+so a matching If-None-Match is answered with 304 before the route does any work.
+"""
+import hashlib
+from fastapi import HTTPException, Request, Response
+
+
+def compute_etag(kind, version, request):
+    """Strong ETag for `kind` at `version`, over the path and sorted query params."""
+    digest = hashlib.blake2b(digest_size=12)
+    digest.update(f"{kind}\0{version}\0{request.url.path}\0".encode())
+    for key, value in sorted(request.query_params.multi_items()):
+        digest.update(f"{key}={value}&".encode())
+    # gzip and identity bodies are different representations, so they get different strong ETags
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        digest.update(b"\0gzip")
+    return f'"{digest.hexdigest()}"'
+
+
+def etag_matches(if_none_match, etag):
+    """If-None-Match uses weak comparison: W/ prefixes are ignored, and "*" matches anything."""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def conditional(kind, version, cache_control):
+    """
+    Route dependency: sets ETag and Cache-Control on the response, or ends the
+    request with 304 Not Modified when the client already holds that ETag.
+
+    `version` is called per request, so it can follow a value that changes at runtime.
+    """
+    async def dependency(request: Request, response: Response):
+        etag = compute_etag(kind, version(), request)
+        headers = {"ETag": etag, "Cache-Control": cache_control}
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            # GZipMiddleware adds Vary to compressed 200s; a bodiless 304 has to carry it itself
+            raise HTTPException(status_code=304, headers={**headers, "Vary": "Accept-Encoding"})
+        response.headers.update(headers)
+
+    return dependency
+
+
+def uncacheable(response: Response):
+    """Drop the validators set by `conditional` (e.g. when a route falls back to live TMDB data)."""
+    if "ETag" in response.headers:
+        del response.headers["ETag"]
+    response.headers["Cache-Control"] = "no-cache"
@@ -0,0 +1,221 @@
+"""
+Logging pipeline: request threads only enqueue records, and one listener
+thread formats them (JSON lines by default) and writes them to stdout.
+
+Levels come from LOG_LEVEL plus per-logger overrides in LOG_LEVELS
+("app.routes.user=DEBUG,sqlalchemy.engine=INFO"). API keys and bearer tokens
+are masked in every message. If the queue is full, records are dropped and
+counted rather than blocking the request. Hot paths log through
+`hot_logger()`, which lets only a few records per second through from each
+call site.
+"""
+import atexit
+import copy
+import datetime
+import json
+import logging
+import queue
+import re
+import sys
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+from app.config import LOG_LEVEL, LOG_LEVELS, LOG_FORMAT, LOG_QUEUE_SIZE, LOG_HOT_PATH_RATE
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# Loggers that are chatty at DEBUG; urllib3 also logs full request URLs, TMDB api_key included
+DEFAULT_LEVELS = {
+    "urllib3": "WARNING",
+    "asyncio": "WARNING",
+    "multipart": "WARNING",
+    "passlib": "WARNING",
+}
+
+_SECRETS = [
+    (re.compile(r"(api_key=)[^&\s\"']+"), r"\1***"),
+    (re.compile(r"(Bearer\s+)[\w\-.~+/]+=*"), r"\1***"),
+]
+
+# LogRecord attributes that aren't user-supplied `extra` fields
+_RECORD_FIELDS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+def redact(text):
+    for pattern, replacement in _SECRETS:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per record, with any `extra=` fields as top-level keys."""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc)
+                  .isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": redact(record.getMessage()),
+            "pid": record.process,
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_text:
+            entry["exc"] = redact(record.exc_text)
+        if record.stack_info:
+            entry["stack"] = record.stack_info
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record):
+        return redact(super().format(record))
+
+
+class _QueueHandler(QueueHandler):
+    """Enqueues without blocking; a full queue drops the record and counts it."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Resolve the message now, since args may be mutated after the call returns. Traceback text
+        # is rendered here too, so the record no longer references the frames. JSON rendering and the
+        # stdout write happen on the listener thread.
+        message = record.getMessage()
+        record = copy.copy(record)
+        record.msg = message
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_handler = None
+_listener = None
+
+
+def _parse_levels(spec):
+    levels = {}
+    for item in spec.split(","):
+        name, sep, level = item.partition("=")
+        if sep and name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def setup_logging():
+    """Route every logger through the queue; safe to call more than once."""
+    global _handler, _listener
+    if _listener is not None:
+        return
+
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(TextFormatter(TEXT_FORMAT) if LOG_FORMAT == "text" else JSONFormatter())
+
+    log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    _handler = _QueueHandler(log_queue)
+    _listener = QueueListener(log_queue, output, respect_handler_level=False)
+    _listener.start()
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(_handler)
+    root.setLevel(LOG_LEVEL.upper())
+    for name, level in {**DEFAULT_LEVELS, **_parse_levels(LOG_LEVELS)}.items():
+        logging.getLogger(name).setLevel(level)
+
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """Flush queued records and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def stats():
+    return {
+        "queued": _handler.queue.qsize() if _handler else 0,
+        "capacity": LOG_QUEUE_SIZE,
+        "dropped": _handler.dropped if _handler else 0,
+    }
+
+
+class HotPathLogger(logging.LoggerAdapter):
+    """
+    Logger for per-request code: each call site (message template) gets `rate`
+    records per second at most, and the first record after a suppressed run
+    carries a `suppressed` count. Level checks come first, so disabled levels cost nothing.
+    """
+
+    def __init__(self, logger, rate=LOG_HOT_PATH_RATE):
+        super().__init__(logger, {})
+        self.rate = rate
+        self._lock = threading.Lock()
+        self._sites = {}  # msg template -> [tokens, last refill, suppressed]
+
+    def _emit(self, level, msg, args, kwargs):
+        if not self.logger.isEnabledFor(level):
+            return
+        suppressed = self._take(msg)
+        if suppressed is None:
+            return
+        if suppressed:
+            kwargs["extra"] = {**kwargs.get("extra", {}), "suppressed": suppressed}
+        # caller -> public method -> _emit -> Logger.log
+        self.logger.log(level, msg, *args, stacklevel=3, **kwargs)
+
+    def _take(self, msg):
+        """None to drop this record, otherwise how many were dropped since the last one logged."""
+        if self.rate <= 0:
+            return 0
+        now = time.monotonic()
+        with self._lock:
+            site = self._sites.get(msg)
+            if site is None:
+                site = self._sites[msg] = [float(self.rate), now, 0]
+            site[0] = min(float(self.rate), site[0] + (now - site[1]) * self.rate)
+            site[1] = now
+            if site[0] < 1:
+                site[2] += 1
+                return None
+            site[0] -= 1
+            suppressed, site[2] = site[2], 0
+            return suppressed
+
+    def log(self, level, msg, *args, **kwargs):
+        self._emit(level, msg, args, kwargs)
+
+    def debug(self, msg, *args, **kwargs):
+        self._emit(logging.DEBUG, msg, args, kwargs)
+
+    def info(self, msg, *args, **kwargs):
+        self._emit(logging.INFO, msg, args, kwargs)
+
+    def warning(self, msg, *args, **kwargs):
+        self._emit(logging.WARNING, msg, args, kwargs)
+
+    def error(self, msg, *args, **kwargs):
+        self._emit(logging.ERROR, msg, args, kwargs)
+
+    def exception(self, msg, *args, exc_info=True, **kwargs):
+        self._emit(logging.ERROR, msg, args, {**kwargs, "exc_info": exc_info})
+
+
+def hot_logger(name):
+    return HotPathLogger(logging.getLogger(name))
@@ -1,21 +1,29 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from app.routes import user, recommend
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, ORJSONResponse, PlainTextResponse
+from app.routes import user, recommend, admin, feed
+from app import tmdb, metrics, tracing, log, cache, recommendations
+from app.shards import ShardsUnavailable
+from app.auth import password_hasher, PasswordHasherBusy
+from app.database import async_engine, pool_stats
+from app.dependencies import auth_cache_stats
+from app.config import HISTORY_WRITE_BEHIND, GZIP_MIN_SIZE, GZIP_LEVEL
+from app.services.history_buffer import history_buffer
+from app.services.popularity_service import popularity
+from app.services.feed_service import feed_worker
+from app.services.import_service import stop_imports
+from app.scheduler import scheduler
+from app.profiling import profiler
+import asyncio
 import uvicorn
 import os
 import logging
 import sys
 from pathlib import Path
 
-# Configure logging
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+# JSON logs through a background queue; levels from LOG_LEVEL / LOG_LEVELS
+log.setup_logging()
 logger = logging.getLogger(__name__)
 
 # Log startup information
@@ -24,7 +32,8 @@ logger.info(f"Python version: {sys.version}")
 logger.info(f"Current working directory: {os.getcwd()}")
 logger.info(f"PYTHONPATH: {os.environ.get('PYTHONPATH', 'Not set')}")
 
-app = FastAPI(title="Movie Recommendation System")
+# orjson renders the body; routes with a response_model are serialized by pydantic-core, not jsonable_encoder
+app = FastAPI(title="Movie Recommendation System", default_response_class=ORJSONResponse)
 
 # Configure CORS
 app.add_middleware(
@@ -32,12 +41,25 @@ app.add_middleware(
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
-    allow_headers=["*"]
+    allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"]
 )
 
+# Compress responses above GZIP_MIN_SIZE bytes for clients that accept gzip
+app.add_middleware(GZipMiddleware, minimum_size=GZIP_MIN_SIZE, compresslevel=GZIP_LEVEL)
+
+# Outermost, so request latency covers compression and CORS handling as well
+app.add_middleware(metrics.MetricsMiddleware)
+
+# Slow-request tracing is only wired in when TRACE_SLOW_REQUEST_MS is set
+if tracing.ENABLED:
+    app.add_middleware(tracing.SlowRequestTracer)
+
 # Include routers
 app.include_router(user.router, prefix="/api/users", tags=["users"])
 app.include_router(recommend.router, prefix="/api/recommend", tags=["recommendations"])
+app.include_router(admin.router, prefix="/api/admin", tags=["admin"])
+app.include_router(feed.router, prefix="/api/feed", tags=["feed"])
 
 @app.get("/")
 async def root():
@@ -52,9 +74,169 @@ def health_check():
         logger.error(f"Health check failed: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/stats/tmdb")
+def tmdb_stats():
+    # Single-flight, rate limiter and circuit breaker counters for outbound TMDB calls
+    return tmdb.stats()
+
+@app.get("/stats/db")
+def db_stats():
+    # Connection pool usage for the sync and async engines
+    return pool_stats()
+
+@app.get("/stats/auth")
+def auth_stats():
+    # Hit ratios of the verified-token and authenticated-user caches
+    return auth_cache_stats()
+
+@app.get("/stats/password-hashing")
+def password_hashing_stats():
+    # bcrypt pool load, rejections and hash latency
+    return password_hasher.stats()
+
+@app.get("/stats/history-buffer")
+def history_buffer_stats():
+    # Queue depth, rejections and flush latency of the history write-behind buffer
+    return history_buffer.stats()
+
+@app.get("/stats/popularity")
+def popularity_stats():
+    # Freshness of the in-memory popularity ranking
+    return popularity.stats()
+
+@app.get("/stats/feeds")
+def feed_stats():
+    # Materialized feed jobs: queue, staleness and compute time
+    return feed_worker.stats()
+
+@app.get("/stats/scheduler")
+def scheduler_stats():
+    # Leader election and the last run of every scheduled job in this worker
+    return scheduler.stats()
+
+def _cache_stats():
+    """Hit/miss counts of the per-process caches, keyed by the cache label used in /metrics."""
+    caches = {f"auth_{name}": stats for name, stats in auth_cache_stats().items()}
+    flight = tmdb.stats()
+    # Coalesced TMDB calls are answered from another caller's in-flight request
+    caches["tmdb_single_flight"] = {
+        "hits": flight["coalesced"], "misses": flight["upstream_calls"], "size": flight["in_flight"]
+    }
+    caches["tmdb_responses"] = flight["response_cache"]
+    return caches
+
+def _hit_ratio(stats):
+    lookups = stats["hits"] + stats["misses"]
+    return stats["hits"] / lookups if lookups else None
+
+metrics.Gauge("cache_hits_total", "Cache lookups answered from the cache", ("cache",),
+              lambda: [((name,), s["hits"]) for name, s in _cache_stats().items()], kind="counter")
+metrics.Gauge("cache_misses_total", "Cache lookups that had to go to the source", ("cache",),
+              lambda: [((name,), s["misses"]) for name, s in _cache_stats().items()], kind="counter")
+metrics.Gauge("cache_hit_ratio", "Share of cache lookups that hit, since process start", ("cache",),
+              lambda: [((name,), _hit_ratio(s)) for name, s in _cache_stats().items()])
+metrics.Gauge("cache_entries", "Entries currently held", ("cache",),
+              lambda: [((name,), s["size"]) for name, s in _cache_stats().items()])
+metrics.Gauge("db_pool_connections", "Pooled database connections by state", ("engine", "state"),
+              lambda: [((engine, state), n) for engine, pool in pool_stats().items() for state, n in pool.items()])
+metrics.Gauge("scheduler_leader", "1 while this process holds the scheduler leader lock", (),
+              lambda: [((), int(scheduler.election.is_leader))])
+metrics.Gauge("scheduler_job_last_success_timestamp_seconds", "Unix time of the job's last successful run", ("job",),
+              lambda: [((name,), job.last_success) for name, job in scheduler.jobs.items()])
+metrics.Gauge("scheduler_job_skipped_total", "Leader-only runs skipped because another process leads", ("job",),
+              lambda: [((name,), job.skipped) for name, job in scheduler.jobs.items()], kind="counter")
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    # Request, TMDB, DB, model lookup and cache metrics in Prometheus text format
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+@app.get("/stats/cache")
+def shared_cache_stats():
+    # Shared cache backend (CACHE_URL) and the near caches in front of it
+    return {
+        "backend": cache.backend.stats() if cache.backend is not None else None,
+        "users": auth_cache_stats()["users"],
+        "tmdb_responses": tmdb.response_cache_stats(),
+    }
+
+@app.get("/stats/shards")
+def shard_stats():
+    # Scatter-gather similarity shards (MODEL_SHARDS); null when the matrix is served in-process
+    return recommendations.shard_index.stats() if recommendations.shard_index is not None else None
+
+@app.get("/stats/logging")
+def logging_stats():
+    # Log queue depth and records dropped because the queue was full
+    return log.stats()
+
+@app.get("/stats/tracing")
+def tracing_stats():
+    # Slow-request tracing and profiler state for this worker
+    return {"tracing": tracing.slow_traces.stats(), "profiler": profiler.stats()}
+
+@app.on_event("startup")
+async def start_background_tasks():
+    if tracing.ENABLED:
+        # Every route is registered by now
+        tracing.instrument_routes(app)
+    await profiler.start()
+    if recommendations.shard_index is not None:
+        # Spawn the shard processes now rather than on the first recommendation
+        await asyncio.to_thread(recommendations.shard_index.warm)
+    await feed_worker.start()
+    # Runs the popularity refresh (first run right away) and, on the leader, the feed sweep
+    await scheduler.start()
+    if HISTORY_WRITE_BEHIND:
+        await history_buffer.start()
+
+@app.on_event("shutdown")
+async def close_database_connections():
+    # Flush buffered history before the pool goes away
+    await profiler.stop()
+    await scheduler.stop()
+    await feed_worker.stop()
+    await stop_imports()
+    await history_buffer.stop()
+    await async_engine.dispose()
+    password_hasher.shutdown()
+    if recommendations.shard_index is not None:
+        recommendations.shard_index.close()
+    if cache.backend is not None:
+        cache.backend.close()
+    log.shutdown_logging()
+
+@app.exception_handler(tmdb.TMDBUnavailable)
+async def tmdb_unavailable_handler(request, exc):
+    logger.warning(f"TMDB unavailable: {str(exc)}")
+    headers = {"Retry-After": str(int(exc.retry_after) + 1)} if exc.retry_after is not None else None
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Movie service temporarily unavailable, please retry"},
+        headers=headers
+    )
+
+@app.exception_handler(ShardsUnavailable)
+async def shards_unavailable_handler(request, exc):
+    logger.warning(f"Similarity shards unavailable: {str(exc)}")
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Recommendations temporarily unavailable, please retry"},
+        headers={"Retry-After": "1"}
+    )
+
+@app.exception_handler(PasswordHasherBusy)
+async def password_hasher_busy_handler(request, exc):
+    logger.warning("Password hashing pool saturated, shedding request")
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Too many sign-in requests, please retry"},
+        headers={"Retry-After": "1"}
+    )
+
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
-    logger.error(f"Global error handler caught: {str(exc)}")
+    logger.error(f"Unhandled error on {request.method} {request.url.path}: {str(exc)}", exc_info=exc)
     return JSONResponse(
         status_code=500,
         content={"detail": "Internal server error"}
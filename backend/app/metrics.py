@@ -0,0 +1,258 @@
+"""
+In-process metrics in the Prometheus text exposition format, served at /metrics.
+
+Recording is lock-free on the hot path: every thread writes to its own shard
+of each metric (the event loop is one thread, the threadpools a few more), and
+shards are only merged when /metrics is scraped. The one lock is taken the
+first time a thread touches a metric.
+"""
+import threading
+from bisect import bisect_left
+from functools import wraps
+from time import perf_counter
+from app import tracing
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; request and upstream latencies
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Seconds; background jobs, from sub-second refreshes to long rebuilds
+JOB_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0, 3600.0)
+# Seconds; in-process lookups and queries that are usually sub-millisecond
+FAST_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5)
+
+_registry = []
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names, values, extra=""):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _label_order(item):
+    # Label values may mix ints and strings (status 200 vs "error")
+    return tuple(str(v) for v in item[0])
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Sharded:
+    """Base for metrics whose values live in per-thread dicts keyed by label values."""
+
+    type = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards = []
+        _registry.append(self)
+
+    def _shard(self):
+        try:
+            return self._local.values
+        except AttributeError:
+            values = self._local.values = {}
+            with self._lock:
+                self._shards.append(values)
+            return values
+
+    def _snapshots(self):
+        with self._lock:
+            shards = list(self._shards)
+        # list(dict.items()) doesn't release the GIL, so this is safe against concurrent writers
+        return [list(shard.items()) for shard in shards]
+
+    def render(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}", *self._samples()]
+
+
+class Counter(_Sharded):
+    type = "counter"
+
+    def inc(self, *labels, amount=1):
+        values = self._shard()
+        values[labels] = values.get(labels, 0) + amount
+
+    def _samples(self):
+        totals = {}
+        for items in self._snapshots():
+            for labels, value in items:
+                totals[labels] = totals.get(labels, 0) + value
+        return [
+            f"{self.name}{_label_text(self.labelnames, labels)} {_number(value)}"
+            for labels, value in sorted(totals.items(), key=_label_order)
+        ]
+
+
+class Histogram(_Sharded):
+    """Fixed-bucket histogram; each label set keeps [bucket counts..., +Inf count, sum]."""
+
+    type = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS, span_kind=None):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._width = len(self.buckets) + 2
+        # Calls timed with .time() also become trace spans of this kind when tracing is on
+        self.span_kind = span_kind
+
+    def observe(self, value, *labels):
+        values = self._shard()
+        counts = values.get(labels)
+        if counts is None:
+            counts = values[labels] = [0] * (self._width - 1) + [0.0]
+        counts[bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def time(self, *labels):
+        """Decorator recording the wrapped function's run time under `labels`."""
+        traced = tracing.ENABLED and self.span_kind is not None
+        span_name = "/".join(map(str, labels))
+
+        def decorator(fn):
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                start = perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    elapsed = perf_counter() - start
+                    self.observe(elapsed, *labels)
+                    if traced:
+                        tracing.record(self.span_kind, span_name, start, elapsed)
+            return wrapper
+        return decorator
+
+    def _samples(self):
+        totals = {}
+        for items in self._snapshots():
+            for labels, counts in items:
+                merged = totals.setdefault(labels, [0] * (self._width - 1) + [0.0])
+                for i, c in enumerate(list(counts)):
+                    merged[i] += c
+
+        lines = []
+        bounds = self.buckets + (float("inf"),)
+        for labels, merged in sorted(totals.items(), key=_label_order):
+            cumulative = 0
+            for bound, count in zip(bounds, merged):
+                cumulative += count
+                le = 'le="' + _number(bound) + '"'
+                lines.append(f"{self.name}_bucket{_label_text(self.labelnames, labels, le)} {cumulative}")
+            label_text = _label_text(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {merged[-1]!r}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+class Gauge:
+    """
+    Value read at scrape time from `fn`, which returns [(label values tuple, number), ...].
+
+    For numbers some other component already keeps (cache hit counts, pool
+    sizes); pass kind="counter" when the value only ever grows.
+    """
+
+    def __init__(self, name, help, labelnames, fn, kind="gauge"):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.fn = fn
+        self.type = kind
+        _registry.append(self)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        for labels, value in self.fn():
+            if value is not None:
+                lines.append(f"{self.name}{_label_text(self.labelnames, labels)} {_number(value)}")
+        return lines
+
+
+def render():
+    """All registered metrics as one exposition-format document."""
+    lines = []
+    for metric in _registry:
+        try:
+            lines.extend(metric.render())
+        except Exception as e:
+            # A broken collector shouldn't take the whole scrape down
+            lines.append(f"# {metric.name} unavailable: {_escape(e)}")
+    return "\n".join(lines) + "\n"
+
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template and status",
+    ("method", "route", "status"),
+)
+TMDB_REQUEST_SECONDS = Histogram(
+    "tmdb_request_duration_seconds", "Upstream TMDB call latency by endpoint and status",
+    ("endpoint", "status"),
+)
+DB_QUERY_SECONDS = Histogram(
+    "db_query_duration_seconds", "Database statement execution time",
+    ("engine", "statement"), FAST_BUCKETS,
+)
+DB_POOL_WAIT_SECONDS = Histogram(
+    "db_pool_checkout_wait_seconds", "Time spent waiting for a pooled database connection",
+    ("engine",), FAST_BUCKETS,
+)
+MODEL_LOOKUP_SECONDS = Histogram(
+    "model_lookup_duration_seconds", "In-process recommendation model and index lookups",
+    ("operation",), FAST_BUCKETS, span_kind="model",
+)
+JOB_RUN_SECONDS = Histogram(
+    "scheduler_job_duration_seconds", "Scheduled job run time by outcome (success, error, timeout)",
+    ("job", "outcome"), JOB_BUCKETS,
+)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording HTTP_REQUEST_SECONDS.
+
+    Requests are labelled with the matched route's path template
+    ("/api/recommend/{tmdb_id}"), never the raw path, so label cardinality
+    stays bounded; anything that matched no route is "unmatched".
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.observe(
+                perf_counter() - start,
+                scope["method"],
+                route.path if route is not None else "unmatched",
+                status,
+            )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Float, DateTime, ARRAY, UniqueConstraint, func
+from sqlalchemy import Column, Integer, String, ForeignKey, Float, DateTime, ARRAY, UniqueConstraint, Index, func
 from sqlalchemy.orm import relationship
 from app.database import Base
 
@@ -38,9 +38,14 @@ class Rating(Base):
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     tmdb_id = Column(Integer, ForeignKey("movies.tmdb_id", ondelete="CASCADE"), nullable=False)
     rating = Column(Float, nullable=False)  # Rating value (e.g., 1.0 - 5.0)
+    # When the rating was first given; popularity decays rating engagement by it
+    created_at = Column(DateTime, server_default=func.now(), nullable=False)
 
-    # Enforce that a user can only rate a movie once
-    __table_args__ = (UniqueConstraint("user_id", "tmdb_id", name="unique_user_movie_rating"),)
+    # Enforce that a user can only rate a movie once; ratings are listed per user by id
+    __table_args__ = (
+        UniqueConstraint("user_id", "tmdb_id", name="unique_user_movie_rating"),
+        Index("ix_ratings_user_id_id", "user_id", id.desc()),
+    )
 
     # Relationships
     user = relationship("User", back_populates="ratings")
@@ -54,7 +59,23 @@ class History(Base):
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     movie_id = Column(Integer, ForeignKey("movies.id", ondelete="CASCADE"), nullable=True)  # ✅ Fixed: ForeignKey linking to movies.id
     title = Column(String, nullable=False)  # Ensure title is not NULL
-    timestamp = Column(DateTime, default=func.now())
+    timestamp = Column(DateTime, default=func.now(), server_default=func.now(), nullable=False)
+
+    # A movie appears once per user; history pages are read newest-first per user by (timestamp, id)
+    __table_args__ = (
+        UniqueConstraint("user_id", "movie_id", name="unique_user_movie_history"),
+        Index("ix_history_user_id_timestamp_id", "user_id", timestamp.desc(), id.desc()),
+    )
 
     user = relationship("User", back_populates="history")
     movie = relationship("Movie", back_populates="history", lazy="joined")
+
+
+class UserFeed(Base):
+    __tablename__ = "user_feeds"
+
+    # Precomputed recommendations, hydrated from the in-memory catalog when served
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    tmdb_ids = Column(ARRAY(Integer), nullable=False)
+    scores = Column(ARRAY(Float), nullable=False)
+    computed_at = Column(DateTime, server_default=func.now(), nullable=False, index=True)
@@ -0,0 +1,207 @@
+"""
+On-demand statistical profiler for every worker process.
+
+POST /api/admin/profile drops a request file into PROFILE_DIR. Each worker
+polls that directory (only when PROFILING_ENABLED), samples all of its threads'
+stacks on a background thread until the window closes, and writes its counts
+back. The worker that took the admin request merges them into "collapsed"
+stacks ("thread;outer;...;inner <count>"), which flamegraph.pl, speedscope and
+inferno read directly.
+"""
+import asyncio
+import json
+import logging
+import os
+import sys
+import sysconfig
+import threading
+import time
+import uuid
+from functools import lru_cache
+from pathlib import Path
+from app.config import PROFILING_ENABLED, PROFILE_DIR
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL = 1.0  # seconds between checks for new profile requests
+RESULT_GRACE = 1.5  # seconds after the window closes to wait for workers' results
+STALE_AFTER = 300  # seconds after which leftover request/result files are removed
+
+# Leaf frames of threads that are parked (idle pool workers, an event loop waiting for I/O)
+IDLE_LEAVES = {
+    ("threading.py", "wait"),
+    ("selectors.py", "select"),
+    ("base_events.py", "run_forever"),
+    ("base_events.py", "run_until_complete"),
+    ("runners.py", "run"),
+}
+
+
+_STDLIB = sysconfig.get_paths()["stdlib"] + os.sep
+
+
+@lru_cache(maxsize=4096)
+def _short_path(filename):
+    marker = "site-packages" + os.sep
+    if marker in filename:
+        return filename.split(marker, 1)[1]
+    if filename.startswith(_STDLIB):
+        return filename[len(_STDLIB):]
+    try:
+        relative = os.path.relpath(filename)
+    except ValueError:
+        return filename
+    return filename if relative.startswith("..") else relative
+
+
+@lru_cache(maxsize=16384)
+def _frame_label(code):
+    # First line of the function, not the current line, so one function is one flamegraph box
+    return f"{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})".replace(";", ":")
+
+
+def _is_idle(frame):
+    code = frame.f_code
+    return (os.path.basename(code.co_filename), code.co_name) in IDLE_LEAVES
+
+
+def sample_stacks(until, interval, include_idle=False):
+    """
+    Sample every other thread's Python stack each `interval` seconds until
+    time.time() reaches `until`. Returns ({collapsed stack: count}, samples taken).
+    """
+    me = threading.get_ident()
+    counts = {}
+    samples = 0
+    names = {}
+    names_at = 0.0
+    while time.time() < until:
+        now = time.monotonic()
+        if now - names_at > 1.0:
+            names = {t.ident: t.name for t in threading.enumerate()}
+            names_at = now
+        for ident, frame in sys._current_frames().items():
+            if ident == me or (not include_idle and _is_idle(frame)):
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            stack.append(names.get(ident, f"thread-{ident}").replace(";", ":"))
+            key = ";".join(reversed(stack))
+            counts[key] = counts.get(key, 0) + 1
+        samples += 1
+        time.sleep(interval)
+    return counts, samples
+
+
+class Profiler:
+    """Per-process side of the cross-worker profiler; `profiler` is the shared instance."""
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self._task = None
+        self._handled = {}  # request id -> window end, so each worker samples a request once
+        self.running = 0
+        self.profiles = 0
+
+    async def start(self):
+        if not PROFILING_ENABLED or self._task is not None:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._task = asyncio.create_task(self._poll())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _poll(self):
+        while True:
+            try:
+                self._check_requests()
+            except Exception as e:
+                logger.error(f"Profile request poll failed: {str(e)}")
+            await asyncio.sleep(POLL_INTERVAL)
+
+    def _check_requests(self):
+        now = time.time()
+        self._handled = {rid: end for rid, end in self._handled.items() if end > now - STALE_AFTER}
+        for path in self.directory.glob("*.json"):
+            if path.name.endswith(".request.json"):
+                try:
+                    request = json.loads(path.read_text())
+                except (OSError, ValueError):
+                    continue  # being written, or already cleaned up
+                if request["id"] in self._handled:
+                    continue
+                self._handled[request["id"]] = request["until"]
+                if request["until"] > now:
+                    threading.Thread(
+                        target=self._sample, args=(request,), name="profiler", daemon=True
+                    ).start()
+                elif request["until"] < now - STALE_AFTER:
+                    path.unlink(missing_ok=True)
+            else:
+                try:
+                    if path.stat().st_mtime < now - STALE_AFTER:
+                        path.unlink(missing_ok=True)
+                except FileNotFoundError:
+                    pass  # collected by the requesting worker meanwhile
+
+    def _sample(self, request):
+        self.running += 1
+        try:
+            counts, samples = sample_stacks(request["until"], request["interval"], request["include_idle"])
+            result = {"pid": os.getpid(), "samples": samples, "stacks": counts}
+            target = self.directory / f"{request['id']}.{os.getpid()}.result.json"
+            tmp = target.with_suffix(".tmp")
+            tmp.write_text(json.dumps(result))
+            os.replace(tmp, target)
+            self.profiles += 1
+        except Exception as e:
+            logger.error(f"Profile {request['id']} failed: {str(e)}")
+        finally:
+            self.running -= 1
+
+    async def collect(self, seconds, interval, include_idle=False):
+        """Profile every worker for `seconds`; returns the merged collapsed stacks and per-worker sample counts."""
+        request_id = uuid.uuid4().hex
+        # Leave a poll interval for every worker to notice the request before the window starts counting
+        until = time.time() + POLL_INTERVAL + seconds
+        request = {"id": request_id, "until": until, "interval": interval, "include_idle": include_idle}
+        request_path = self.directory / f"{request_id}.request.json"
+        tmp = self.directory / f"{request_id}.tmp"
+        tmp.write_text(json.dumps(request))
+        os.replace(tmp, request_path)
+
+        await asyncio.sleep(until - time.time() + RESULT_GRACE)
+
+        merged, workers = {}, {}
+        try:
+            for path in self.directory.glob(f"{request_id}.*.result.json"):
+                result = json.loads(path.read_text())
+                workers[result["pid"]] = result["samples"]
+                for stack, count in result["stacks"].items():
+                    merged[stack] = merged.get(stack, 0) + count
+                path.unlink(missing_ok=True)
+        finally:
+            request_path.unlink(missing_ok=True)
+
+        folded = "".join(f"{stack} {count}\n" for stack, count in sorted(merged.items()))
+        return {"folded": folded, "workers": workers}
+
+    def stats(self):
+        return {
+            "enabled": PROFILING_ENABLED,
+            "directory": str(self.directory),
+            "running": self.running,
+            "profiles": self.profiles,
+        }
+
+
+profiler = Profiler(PROFILE_DIR)
@@ -1,24 +1,222 @@
+import hashlib
+import os
 import pickle
+from pathlib import Path
+import numpy as np
 import pandas as pd
+from app.search_index import SearchIndex
+from app.autocomplete import TitleIndex
+from app.metrics import MODEL_LOOKUP_SECONDS
+from app.shards import ShardedIndex
+from app.config import MODEL_SHARDS, MODEL_SHARD_DIR, MODEL_SHARD_TIMEOUT
 
-# Load the ML model files
-movie_dict = pickle.load(open("app/ml_model/movie_dict.pkl", "rb"))
-simi = pickle.load(open("app/ml_model/simi.pkl", "rb"))
+# Load the ML model files (MODEL_DIR lets the benchmarks point at a synthetic catalog)
+MODEL_DIR = Path(os.getenv("MODEL_DIR", "app/ml_model"))
+movie_dict = pickle.load(open(MODEL_DIR / "movie_dict.pkl", "rb"))
+
+# With MODEL_SHARDS the similarity matrix stays in the shard processes (see app/shards.py)
+shard_index = None
+simi = None
+if MODEL_SHARDS:
+    shard_index = ShardedIndex(Path(MODEL_SHARD_DIR or MODEL_DIR / "shards"), timeout=MODEL_SHARD_TIMEOUT)
+    if len(shard_index) != MODEL_SHARDS:
+        raise ValueError(
+            f"MODEL_SHARDS={MODEL_SHARDS} but {shard_index.directory} has {len(shard_index)} shards; "
+            f"rebuild with python -m app.build_shards --shards {MODEL_SHARDS}"
+        )
+else:
+    simi = pickle.load(open(MODEL_DIR / "simi.pkl", "rb"))
 
 movies = pd.DataFrame(movie_dict)
 
-def recommend(movie_name: str):
-    if movie_name not in movies["title"].values:
-        return []
+# Optional display metadata (see app/build_metadata.py); search works on titles and tags without it
+META_PATH = MODEL_DIR / "movie_meta.pkl"
+movie_meta = pickle.load(open(META_PATH, "rb")) if META_PATH.exists() else {}
+
+_titles = dict(zip(movies["movie_id"], movies["title"]))
+
+
+def _model_version():
+    """
+    Fingerprint of the loaded model files, for ETags on model-backed responses.
+
+    Hashes each file's size plus its first and last 64 KiB rather than
+    mtimes, so hosts that downloaded the same files agree.
+    MODEL_VERSION overrides it.
+    """
+    override = os.getenv("MODEL_VERSION")
+    if override:
+        return override
+    digest = hashlib.blake2b(digest_size=8)
+    for path in (MODEL_DIR / "movie_dict.pkl", MODEL_DIR / "simi.pkl", META_PATH):
+        if not path.exists():
+            continue
+        size = path.stat().st_size
+        digest.update(f"{path.name}:{size};".encode())
+        with open(path, "rb") as f:
+            digest.update(f.read(65536))
+            if size > 65536:
+                f.seek(max(65536, size - 65536))
+                digest.update(f.read())
+    return digest.hexdigest()
+
+
+MODEL_VERSION = _model_version()
+
+# tmdb_id -> row lookup: model ids sorted once, with the matching row positions
+_movie_ids = movies["movie_id"].to_numpy(dtype=np.int64)
+_id_order = np.argsort(_movie_ids, kind="stable")
+_sorted_ids = _movie_ids[_id_order]
+
+# Full-text index over the catalog, served in-process
+search_index = SearchIndex.build(movies, movie_meta)
+
+# Prefix/typo-tolerant title index; docs are row positions in `movies`
+title_index = TitleIndex(
+    movies["title"].tolist(),
+    weights=[movie_meta.get(mid, {}).get("popularity", 0.0) for mid in movies["movie_id"]]
+)
+
+
+def row_for_tmdb_id(tmdb_id: int):
+    """Row position of a TMDB id in the model, or None if it isn't in the catalog."""
+    pos = int(np.searchsorted(_sorted_ids, tmdb_id))
+    if pos < len(_sorted_ids) and _sorted_ids[pos] == tmdb_id:
+        return int(_id_order[pos])
+    return None
+
+
+def catalog_title(tmdb_id: int):
+    """Title of a movie in the model catalog, or None."""
+    meta = movie_meta.get(tmdb_id)
+    return meta["title"] if meta else _titles.get(tmdb_id)
+
 
-    index = movies[movies["title"] == movie_name].index[0]
-    distances = sorted(list(enumerate(simi[index])), reverse=True, key=lambda x: x[1])
+def movie_details(tmdb_id):
+    """TMDB-shaped movie payload filled from local metadata."""
+    meta = movie_meta.get(tmdb_id, {})
+    return {
+        "id": int(tmdb_id),
+        "title": meta.get("title", _titles.get(tmdb_id)),
+        "overview": meta.get("overview", ""),
+        "poster_path": meta.get("poster_path"),
+        "release_date": meta.get("release_date"),
+        "vote_average": meta.get("vote_average"),
+    }
+
+
+@MODEL_LOOKUP_SECONDS.time("search")
+def search_movies(query: str, limit: int = 20):
+    """Search the local catalog; returns movie payloads, best match first."""
+    results = []
+    for tmdb_id, score in search_index.search(query, limit=limit):
+        movie = movie_details(tmdb_id)
+        movie["score"] = round(score, 4)
+        results.append(movie)
+    return results
+
+@MODEL_LOOKUP_SECONDS.time("suggest")
+def suggest_titles(query: str, limit: int = 10):
+    """Autocomplete suggestions for a partial or misspelled title."""
+    return [
+        {"id": int(movies["movie_id"].iat[row]), "title": title_index.titles[row]}
+        for row in title_index.suggest(query, limit)
+    ]
+
+@MODEL_LOOKUP_SECONDS.time("similar")
+def recommend_for_row(row: int, k: int = 5):
+    """Top-k most similar movies to a model row, with display fields from local metadata."""
+    if shard_index is not None:
+        # +1 for the movie itself
+        top = [(i, score) for score, i in shard_index.similar(row, k + 1)]
+    else:
+        scores = simi[row]
+        # Partial selection instead of sorting the whole similarity row; +1 for the movie itself
+        rows = np.argpartition(-scores, min(k + 1, len(scores) - 1))[:k + 1]
+        rows = rows[np.argsort(-scores[rows], kind="stable")]
+        top = [(i, scores[i]) for i in rows]
 
     recommended_movies = []
-    for i in distances[1:6]:  # Top 5 recommendations
-        recommended_movies.append(movies.iloc[i[0]].title)
+    for i, score in top:
+        if i == row:
+            continue
+        movie = movie_details(_movie_ids[i])
+        release_date = movie["release_date"]
+        recommended_movies.append({
+            "id": movie["id"],
+            "title": movie["title"],
+            "poster_path": movie["poster_path"],
+            "year": int(release_date[:4]) if release_date else None,
+            "vote_average": movie["vote_average"],
+            "score": round(float(score), 4),
+        })
+    return recommended_movies[:k]
 
-    return recommended_movies
+def recommend(movie_name: str, k: int = 5):
+    # Resolve near-miss titles ("the drak knight") instead of requiring an exact match
+    index = title_index.resolve(movie_name)
+    if index is None:
+        return []
+    return recommend_for_row(index, k)
+
+def recommend_by_tmdb_id(tmdb_id: int, k: int = 5):
+    index = row_for_tmdb_id(tmdb_id)
+    if index is None:
+        return []
+    return recommend_for_row(index, k)
+
+# Favorite names (genres, actors, directors) are matched against the search index
+FAVORITE_MATCHES = 200
+FAVORITE_BOOST = 0.5
+
+@MODEL_LOOKUP_SECONDS.time("profile")
+def recommend_for_profile(seeds, exclude=(), favorites=(), k: int = 50):
+    """
+    [(tmdb_id, score)] for a user profile, best first.
+
+    `seeds` maps tmdb ids to weights (negative for disliked movies); their
+    similarity rows are averaged. Each favorite name adds a boost to its best
+    full-text matches. Seeds and `exclude` are never returned.
+    """
+    rows, weights = [], []
+    for tmdb_id, weight in seeds.items():
+        row = row_for_tmdb_id(tmdb_id)
+        if row is not None:
+            rows.append(row)
+            weights.append(weight)
+    total = sum(abs(w) for w in weights)
+
+    boosts = []
+    for name in favorites:
+        hits = search_index.search(name, limit=FAVORITE_MATCHES)
+        if not hits:
+            continue
+        best = hits[0][1]
+        for tmdb_id, score in hits:
+            row = row_for_tmdb_id(tmdb_id)
+            if row is not None:
+                boosts.append((row, FAVORITE_BOOST * score / best))
+
+    banned = rows + [row for row in map(row_for_tmdb_id, exclude) if row is not None]
+
+    if shard_index is not None:
+        ranked = [(row, score) for score, row in shard_index.profile(rows, weights, total, boosts, banned, k)]
+    else:
+        scores = np.zeros(len(movies), dtype=np.float64)
+        for row, weight in zip(rows, weights):
+            scores += weight * simi[row]
+        if total:
+            scores /= total
+        for row, boost in boosts:
+            scores[row] += boost
+        scores[banned] = -np.inf
+
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        ranked = [(row, scores[row]) for row in candidates]
+    return [(int(_movie_ids[row]), round(float(score), 4)) for row, score in ranked]
 
 # ✅ Cold Start Recommendation (Based on User Preferences)
 def recommend_by_preferences(user):
@@ -0,0 +1,207 @@
+"""
+Shared cache backend speaking the Redis protocol (RESP2) over plain sockets.
+
+Works with Redis, Valkey, KeyDB, Dragonfly and the in-memory stand-in in
+benchmarks/redis_stub.py. Only what the near cache needs is implemented:
+MGET for multi-gets, and pipelined SET ... PX / DEL, so each batch is one round trip.
+
+Every failure (refused connection, timeout, error reply) raises
+CacheUnavailable. After a connection failure the backend is skipped for
+CACHE_RETRY_AFTER seconds, so a dead cache server costs one timeout per
+process instead of one per request.
+"""
+import queue
+import socket
+import ssl
+import threading
+import time
+from urllib.parse import urlparse, unquote
+from app.cache import CacheUnavailable
+from app.config import CACHE_TIMEOUT, CACHE_POOL_SIZE, CACHE_RETRY_AFTER
+
+
+class ReplyError(Exception):
+    """The server answered a command with an error reply."""
+
+
+class ProtocolError(Exception):
+    """The server sent something that isn't a RESP reply."""
+
+
+def pack_command(*args):
+    """Encode one command as a RESP array of bulk strings."""
+    parts = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        if not isinstance(arg, (bytes, bytearray)):
+            arg = str(arg).encode()
+        parts.append(b"$%d\r\n" % len(arg))
+        parts.append(arg)
+        parts.append(b"\r\n")
+    return b"".join(parts)
+
+
+def read_reply(reader):
+    """Read one reply from a buffered binary file; error replies are returned as ReplyError instances."""
+    line = reader.readline()
+    if not line.endswith(b"\r\n"):
+        raise ConnectionError("Connection closed by the cache server")
+    kind, body = line[:1], line[1:-2]
+    if kind == b"+":
+        return body.decode()
+    if kind == b"-":
+        return ReplyError(body.decode())
+    if kind == b":":
+        return int(body)
+    if kind == b"$":
+        length = int(body)
+        if length < 0:
+            return None
+        data = reader.read(length + 2)
+        if len(data) != length + 2:
+            raise ConnectionError("Connection closed by the cache server")
+        return data[:-2]
+    if kind == b"*":
+        length = int(body)
+        if length < 0:
+            return None
+        return [read_reply(reader) for _ in range(length)]
+    raise ProtocolError(f"Unexpected reply type {kind!r}")
+
+
+class _Connection:
+    def __init__(self, sock):
+        self.sock = sock
+        self.reader = sock.makefile("rb")
+
+    def execute(self, commands):
+        """Send all commands in one write, then read one reply per command."""
+        self.sock.sendall(b"".join(pack_command(*command) for command in commands))
+        replies = [read_reply(self.reader) for _ in commands]
+        for reply in replies:
+            if isinstance(reply, ReplyError):
+                raise reply
+        return replies
+
+    def close(self):
+        try:
+            self.reader.close()
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class RedisBackend:
+    """Connection-pooled RESP client; safe to share between threads."""
+
+    name = "redis"
+
+    def __init__(self, url, timeout=CACHE_TIMEOUT, pool_size=CACHE_POOL_SIZE):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.username = unquote(parsed.username) if parsed.username else None
+        self.password = unquote(parsed.password) if parsed.password else None
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.tls = parsed.scheme == "rediss"
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._down_until = 0.0
+        self.round_trips = 0
+        self.connects = 0
+        self.failures = 0
+
+    def _connect(self):
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if self.tls:
+            sock = ssl.create_default_context().wrap_socket(sock, server_hostname=self.host)
+        conn = _Connection(sock)
+        setup = []
+        if self.password:
+            setup.append(("AUTH", self.username, self.password) if self.username else ("AUTH", self.password))
+        if self.db:
+            setup.append(("SELECT", self.db))
+        try:
+            if setup:
+                conn.execute(setup)
+        except BaseException:
+            conn.close()
+            raise
+        with self._lock:
+            self.connects += 1
+        return conn
+
+    def _execute(self, commands):
+        if time.monotonic() < self._down_until:
+            raise CacheUnavailable("Cache server marked down")
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            try:
+                conn = self._connect()
+            except (OSError, ProtocolError, ValueError, ReplyError) as e:
+                # A rejected AUTH or SELECT fails the same way on every new connection
+                raise self._mark_down(e) from e
+        try:
+            replies = conn.execute(commands)
+        except ReplyError as e:
+            # The connection is still in sync (every reply was read), so it can be reused
+            self._release(conn)
+            raise CacheUnavailable(str(e)) from e
+        except (OSError, ProtocolError, ValueError) as e:
+            conn.close()
+            raise self._mark_down(e) from e
+        self._release(conn)
+        with self._lock:
+            self.round_trips += 1
+        return replies
+
+    def _mark_down(self, error):
+        """Skip the server for CACHE_RETRY_AFTER seconds; returns the exception to raise."""
+        with self._lock:
+            self.failures += 1
+            self._down_until = time.monotonic() + CACHE_RETRY_AFTER
+        return CacheUnavailable(f"Cache server {self.host}:{self.port} failed: {str(error)}")
+
+    def _release(self, conn):
+        if self._idle.qsize() < self.pool_size:
+            self._idle.put(conn)
+        else:
+            conn.close()
+
+    def get_many(self, keys):
+        if not keys:
+            return []
+        return self._execute([("MGET", *keys)])[0]
+
+    def set_many(self, items, ttl):
+        if items:
+            px = max(1, int(ttl * 1000))
+            self._execute([("SET", key, blob, "PX", px) for key, blob in items.items()])
+
+    def delete(self, keys):
+        if keys:
+            self._execute([("DEL", *keys)])
+
+    def ping(self):
+        return self._execute([("PING",)])[0] == "PONG"
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def stats(self):
+        return {
+            "backend": self.name,
+            "server": f"{self.host}:{self.port}/{self.db}",
+            "idle_connections": self._idle.qsize(),
+            "connects": self.connects,
+            "round_trips": self.round_trips,
+            "failures": self.failures,
+            "down": time.monotonic() < self._down_until,
+        }
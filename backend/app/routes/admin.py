@@ -0,0 +1,77 @@
+import tempfile
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import PlainTextResponse
+from starlette.concurrency import run_in_threadpool
+from app.config import PROFILING_ENABLED, PROFILE_MAX_SECONDS, TRACE_BUFFER_SIZE
+from app.dependencies import get_admin_user
+from app.models import User
+from app.profiling import profiler
+from app.services.import_service import start_import, get_import
+from app.tracing import slow_traces
+
+router = APIRouter()
+
+# Uploads are spooled to disk in writes of about this size, each in the threadpool
+SPOOL_WRITE_BYTES = 1024 * 1024
+
+# ✅ Bulk import of watch/rating events (CSV or NDJSON request body); runs as a background job
+@router.post("/import", status_code=202)
+async def bulk_import(
+    request: Request,
+    format: str = Query(None, pattern="^(csv|ndjson)$", description="Defaults from the Content-Type header"),
+    admin: User = Depends(get_admin_user)
+):
+    fmt = format or ("ndjson" if "ndjson" in request.headers.get("content-type", "") else "csv")
+
+    # On disk: the job reads the file after this request has returned
+    spool = await run_in_threadpool(tempfile.TemporaryFile, mode="w+b")
+    try:
+        buffer = bytearray()
+        async for chunk in request.stream():
+            buffer += chunk
+            if len(buffer) >= SPOOL_WRITE_BYTES:
+                await run_in_threadpool(spool.write, bytes(buffer))
+                buffer.clear()
+        await run_in_threadpool(spool.write, bytes(buffer))
+        await run_in_threadpool(spool.seek, 0)
+    except BaseException:
+        await run_in_threadpool(spool.close)
+        raise
+    job = await start_import(spool, fmt)
+    return {**job, "status_url": f"{request.url.path}/{job['id']}"}
+
+# ✅ Progress of a bulk import: status, row counts and rows/sec so far
+@router.get("/import/{job_id}")
+async def bulk_import_status(job_id: str, admin: User = Depends(get_admin_user)):
+    job = await get_import(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return job
+
+# ✅ Sample every worker's stacks for a few seconds; returns collapsed stacks for flamegraph tools
+@router.post("/profile", response_class=PlainTextResponse)
+async def profile(
+    seconds: float = Query(10, gt=0, le=PROFILE_MAX_SECONDS),
+    interval_ms: float = Query(5, ge=1, le=1000, description="Time between stack samples"),
+    include_idle: bool = Query(False, description="Keep samples of threads parked waiting for work"),
+    admin: User = Depends(get_admin_user)
+):
+    if not PROFILING_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiling is disabled (set PROFILING_ENABLED=true)")
+
+    result = await profiler.collect(seconds, interval_ms / 1000, include_idle)
+    return PlainTextResponse(
+        result["folded"],
+        headers={
+            "X-Profile-Workers": str(len(result["workers"])),
+            "X-Profile-Samples": str(sum(result["workers"].values())),
+        }
+    )
+
+# ✅ Most recent slow-request traces recorded by this worker
+@router.get("/traces")
+def slow_request_traces(
+    limit: int = Query(20, ge=1, le=max(TRACE_BUFFER_SIZE, 1)),
+    admin: User = Depends(get_admin_user)
+):
+    return {**slow_traces.stats(), "traces": slow_traces.recent(limit)}
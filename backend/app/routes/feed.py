@@ -0,0 +1,129 @@
+import asyncio
+import time
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import select, func
+from starlette.concurrency import run_in_threadpool
+from app.database import AsyncSessionLocal
+from app.dependencies import get_current_user
+from app.log import hot_logger
+from app.models import User, Movie, History
+from app.recommendations import movie_details, recommend_for_profile
+from app.services.feed_service import get_feed
+from app.services.history_buffer import history_buffer
+from app.services.popularity_service import popularity
+
+router = APIRouter()
+logger = hot_logger(__name__)
+
+# Seconds each section may take before it is dropped from the response
+SECTION_BUDGETS = {
+    "popular": 0.2,
+    "recommendations": 1.0,
+    "cold_start": 0.5,
+    "history": 0.5,
+}
+
+DEFAULT_POSTER = "/default-movie-poster.jpg"
+
+
+def _poster_url(poster_path):
+    return f"https://image.tmdb.org/t/p/w500{poster_path}" if poster_path else DEFAULT_POSTER
+
+
+async def _popular(user, limit):
+    return popularity.top(limit)
+
+
+async def _recommendations(user, limit):
+    return await get_feed(user.id, limit=limit)
+
+
+async def _cold_start(user, limit):
+    # Shown to the same users as /api/recommend/cold-start (no history; popular when there are no favorites).
+    # The list itself differs: the route samples 5 titles matching the favorites, while this ranks
+    # the catalog by similarity to them and returns `limit` full movie entries, the same on every load.
+    async with AsyncSessionLocal() as db:
+        history_count = (await db.execute(
+            select(func.count()).select_from(History).where(History.user_id == user.id)
+        )).scalar_one()
+    if history_count > 0 or history_buffer.pending_for(user.id):
+        return None
+
+    favorites = (user.favorite_genres or []) + (user.favorite_actors or []) + (user.favorite_directors or [])
+    if not favorites:
+        return popularity.top(limit)
+    ranked = await run_in_threadpool(recommend_for_profile, {}, (), favorites, limit)
+    return [movie_details(tmdb_id) for tmdb_id, _ in ranked]
+
+
+async def _history(user, limit):
+    # First page of history, posters from the local catalog only so the section stays in budget
+    async with AsyncSessionLocal() as db:
+        rows = (await db.execute(
+            select(History.id, History.title, History.timestamp, Movie.tmdb_id)
+            .outerjoin(Movie, Movie.id == History.movie_id)
+            .where(History.user_id == user.id)
+            .order_by(History.timestamp.desc(), History.id.desc())
+            .limit(limit)
+        )).all()
+
+    stored = {row.tmdb_id for row in rows}
+    entries = [
+        {"id": None, "title": p.title, "timestamp": p.timestamp, "tmdb_id": p.tmdb_id}
+        for p in history_buffer.pending_for(user.id) if p.tmdb_id not in stored
+    ]
+    entries += [
+        {"id": row.id, "title": row.title, "timestamp": row.timestamp, "tmdb_id": row.tmdb_id}
+        for row in rows
+    ]
+    for entry in entries:
+        tmdb_id = entry["tmdb_id"]
+        entry["poster_path"] = _poster_url(movie_details(tmdb_id)["poster_path"] if tmdb_id else None)
+    return entries[:limit]
+
+
+SECTIONS = {
+    "popular": _popular,
+    "recommendations": _recommendations,
+    "cold_start": _cold_start,
+    "history": _history,
+}
+
+
+async def _run_section(name, user, limit):
+    """(result, status, elapsed ms) for one section, bounded by its time budget."""
+    start = time.perf_counter()
+    try:
+        result = await asyncio.wait_for(SECTIONS[name](user, limit), timeout=SECTION_BUDGETS[name])
+        status = "ok"
+    except asyncio.TimeoutError:
+        result, status = None, "timeout"
+    except Exception:
+        logger.exception("Building feed section %s failed", name)
+        result, status = None, "error"
+    return result, status, round((time.perf_counter() - start) * 1000, 3)
+
+
+# ✅ Home feed: every home-page section in one round trip
+@router.get("")
+async def get_home_feed(
+    limit: int = Query(20, ge=1, le=50),
+    user: User = Depends(get_current_user)
+):
+    start = time.perf_counter()
+    names = list(SECTIONS)
+    results = await asyncio.gather(*(_run_section(name, user, limit) for name in names))
+
+    sections, status, timings = {}, {}, {}
+    for name, (result, section_status, elapsed_ms) in zip(names, results):
+        sections[name] = result
+        status[name] = section_status
+        timings[name] = elapsed_ms
+    timings["total"] = round((time.perf_counter() - start) * 1000, 3)
+
+    return {
+        "sections": sections,
+        "status": status,
+        "partial": any(s != "ok" for s in status.values()),
+        "timings_ms": timings,
+    }
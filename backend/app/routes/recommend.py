@@ -1,31 +1,77 @@
+from typing import Optional
 from fastapi import APIRouter, Depends, Query, HTTPException
-from sqlalchemy.orm import Session
-from app.database import get_db
-from app.recommendations import recommend, recommend_by_preferences
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_async_db
+from starlette.concurrency import run_in_threadpool
+from app.recommendations import (
+    recommend, recommend_by_tmdb_id, recommend_by_preferences, suggest_titles, movie_details, catalog_title,
+    MODEL_VERSION,
+)
 from app.models import User, History
 from app.dependencies import get_current_user
+from app.services.popularity_service import popularity
+from app.schemas import RecommendationList, SuggestionList, MovieDetails
+from app.config import MODEL_CACHE_MAX_AGE
+from app.http_cache import conditional
 
 router = APIRouter()
 
-@router.get("/")
-def get_recommendations(movie: str = Query(..., description="Enter a movie name")):
-    recommendations = recommend(movie)
+# Content recommendations, suggestions and metadata only change with the model files
+model_cached = Depends(conditional("model", lambda: MODEL_VERSION, f"public, max-age={MODEL_CACHE_MAX_AGE}"))
+
+@router.get("/", response_model=RecommendationList, dependencies=[model_cached])
+def get_recommendations(
+    movie: Optional[str] = Query(None, description="Enter a movie name"),
+    tmdb_id: Optional[int] = Query(None, description="TMDB id of the movie (preferred over the name)"),
+    limit: int = Query(5, ge=1, le=50)
+):
+    if tmdb_id is None and not movie:
+        raise HTTPException(status_code=422, detail="Provide either tmdb_id or movie")
+
+    recommendations = recommend_by_tmdb_id(tmdb_id, limit) if tmdb_id is not None else []
+    if not recommendations and movie:
+        recommendations = recommend(movie, limit)
     if not recommendations:
         raise HTTPException(status_code=404, detail="Movie not found")
     return {"recommendations": recommendations}
 
+# ✅ Title Autocomplete (prefix + typo tolerant)
+@router.get("/suggest", response_model=SuggestionList, dependencies=[model_cached])
+async def get_suggestions(
+    q: str = Query(..., min_length=1, description="Partial movie title"),
+    limit: int = Query(10, ge=1, le=50)
+):
+    return {"suggestions": suggest_titles(q, limit)}
+
+# ✅ Movie metadata from the local catalog
+@router.get("/movies/{tmdb_id}", response_model=MovieDetails, dependencies=[model_cached])
+async def get_movie(tmdb_id: int):
+    if catalog_title(tmdb_id) is None:
+        raise HTTPException(status_code=404, detail="Movie not found")
+    return movie_details(tmdb_id)
+
 # ✅ Cold Start Recommendation Route (User Preferences-Based)
 @router.get("/cold-start")
-def get_cold_start_recommendations(user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+async def get_cold_start_recommendations(
+    limit: int = Query(20, ge=1, le=100),
+    user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
     # Check if user has any history
-    history_count = db.query(History).filter(History.user_id == user.id).count()
+    history_count = (await db.execute(
+        select(func.count()).select_from(History).where(History.user_id == user.id)
+    )).scalar_one()
     
     if history_count > 0:
         return {"message": "User has history, use normal recommendations"}
 
     # Get user preferences
     if not user.favorite_genres and not user.favorite_actors and not user.favorite_directors:
-        return {"message": "No preferences set, showing trending movies instead"}
+        return {
+            "message": "No preferences set, showing trending movies instead",
+            "recommendations": popularity.top(limit)
+        }
 
-    recommendations = recommend_by_preferences(user)
+    recommendations = await run_in_threadpool(recommend_by_preferences, user)
     return {"recommendations": recommendations}
@@ -1,13 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, delete, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel, EmailStr
-import requests
-from app.database import get_db
-from app.auth import hash_password, verify_password, create_access_token 
+from app.database import get_async_db, stream_ndjson
+from app.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, encode_cursor, decode_cursor
+from app.auth import password_hasher, create_access_token
 from app.models import User, Movie, History, Rating
-from passlib.context import CryptContext
-from app.schemas import HistoryResponse
-from app.dependencies import get_current_user
+from app.schemas import HistoryResponse, HistoryEntry, FeedResponse, MoviePage
+from app.dependencies import get_current_user, get_current_user_for_update, invalidate_user
+from app import tmdb
+from app.recommendations import search_movies as search_catalog, catalog_title, movie_details
+from app.services.history_service import add_history_entry
+from app.services.rating_service import upsert_rating
+from app.services.popularity_service import popularity
+from app.http_cache import conditional, uncacheable
+from app.config import POPULAR_CACHE_MAX_AGE
+from app.services.feed_service import feed_worker, get_feed
+from app.services.history_buffer import history_buffer, HistoryBufferFull, PendingHistory
+from app.log import hot_logger
+from starlette.concurrency import run_in_threadpool
 from typing import List, Optional
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from datetime import datetime, timedelta
@@ -23,10 +35,8 @@ TMDB_API_KEY = os.getenv("TMDB_API_KEY")
 if not TMDB_API_KEY:
     raise ValueError("TMDB_API_KEY environment variable is not set")
 
-# Create a password hashing context
-bcrypt_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 router = APIRouter()
+logger = hot_logger(__name__)
 
 # Define Pydantic models for request body
 class UserCreate(BaseModel):
@@ -46,12 +56,12 @@ class RatingRequest(BaseModel):
 
 # ✅ Register Route
 @router.post("/register")
-def register(user: UserCreate, db: Session = Depends(get_db)):
-    existing_user = db.query(User).filter(User.username == user.username).first()
+async def register(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
+    existing_user = (await db.execute(select(User).where(User.username == user.username))).scalar_one_or_none()
     if existing_user:
         raise HTTPException(status_code=400, detail="User already exists")
 
-    hashed_password = bcrypt_context.hash(user.password)
+    hashed_password = await password_hasher.hash(user.password)
     
     new_user = User(
         username=user.username,
@@ -63,16 +73,15 @@ def register(user: UserCreate, db: Session = Depends(get_db)):
     )
 
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
 
     return {"message": "User registered successfully"}
 
 # ✅ Login Route
 @router.post("/login")
-def login(user_data: LoginRequest, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.username == user_data.username).first()
-    if not user or not verify_password(user_data.password, user.password):
+async def login(user_data: LoginRequest, db: AsyncSession = Depends(get_async_db)):
+    user = (await db.execute(select(User).where(User.username == user_data.username))).scalar_one_or_none()
+    if not user or not await password_hasher.verify(user_data.password, user.password):
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
     token = create_access_token({"sub": user.username})
@@ -86,106 +95,157 @@ class HistoryCreate(BaseModel):
 # @router.get("/history", response_model=list[HistoryResponse])
 # def get_history(user: User = Depends(get_current_user), db: Session = Depends(get_db)):
 #     return db.query(History).filter(History.user_id == user.id).order_by(History.timestamp.desc()).all()
-@router.get("/history")
-def get_history(user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    history_entries = (
-        db.query(History)
-        .filter(History.user_id == user.id)
-        .order_by(History.timestamp.desc())
-        .all()
+@router.get("/history", response_model=List[HistoryEntry])
+async def get_history(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="Value of the X-Next-Cursor header from the previous page"),
+    user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    # Keyset pagination on (timestamp, id), newest first, served by ix_history_user_id_timestamp_id
+    query = (
+        select(History.id, History.title, History.timestamp, Movie.tmdb_id)
+        .outerjoin(Movie, Movie.id == History.movie_id)
+        .where(History.user_id == user.id)
+        .order_by(History.timestamp.desc(), History.id.desc())
+        .limit(limit + 1)
     )
+    if cursor:
+        after_timestamp, after_id = decode_cursor(cursor, datetime, int)
+        query = query.where(tuple_(History.timestamp, History.id) < tuple_(after_timestamp, after_id))
+
+    rows = (await db.execute(query)).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(rows[-1].timestamp, rows[-1].id)
 
     result = []
-    for entry in history_entries:
-        movie = db.query(Movie).filter(Movie.id == entry.movie_id).first()
-        
-        # Fetch movie poster from TMDB API
-        tmdb_url = f"https://api.themoviedb.org/3/movie/{movie.tmdb_id}?api_key={TMDB_API_KEY}"
-        response = requests.get(tmdb_url)
-        
-        poster_path = None
-        if response.status_code == 200:
-            movie_data = response.json()
-            poster_path = f"https://image.tmdb.org/t/p/w500{movie_data.get('poster_path', '')}"
+    if not cursor:
+        # Read-your-writes: entries still waiting in the write-behind buffer go on top of the first page
+        stored = {entry.tmdb_id for entry in rows}
+        for pending in history_buffer.pending_for(user.id):
+            if pending.tmdb_id not in stored:
+                poster_path = movie_details(pending.tmdb_id)["poster_path"]
+                result.append({
+                    "id": None,
+                    "title": pending.title,
+                    "timestamp": pending.timestamp,
+                    "poster_path": f"https://image.tmdb.org/t/p/w500{poster_path}" if poster_path else "/default-movie-poster.jpg",
+                })
+
+    for entry in rows:
+        # Poster from the local catalog, falling back to TMDB (and the default poster if TMDB is down)
+        poster_path = movie_details(entry.tmdb_id)["poster_path"] if entry.tmdb_id else None
+        if poster_path is None and entry.tmdb_id:
+            try:
+                tmdb_response = await run_in_threadpool(tmdb.get, f"/movie/{entry.tmdb_id}")
+            except tmdb.TMDBUnavailable:
+                tmdb_response = None
+            if tmdb_response is not None and tmdb_response.status_code == 200:
+                poster_path = tmdb_response.json().get("poster_path")
 
         result.append({
             "id": entry.id,
             "title": entry.title,
             "timestamp": entry.timestamp,
-            "poster_path": poster_path or "/default-movie-poster.jpg",
+            "poster_path": f"https://image.tmdb.org/t/p/w500{poster_path}" if poster_path else "/default-movie-poster.jpg",
         })
 
     return result
 
+# ✅ Stream the full history as NDJSON
+@router.get("/history/export")
+async def export_history(user: User = Depends(get_current_user)):
+    query = (
+        select(History.id, History.title, History.timestamp, Movie.tmdb_id)
+        .outerjoin(Movie, Movie.id == History.movie_id)
+        .where(History.user_id == user.id)
+        .order_by(History.timestamp.desc(), History.id.desc())
+    )
+    return StreamingResponse(
+        stream_ndjson(query, lambda row: {
+            "id": row.id,
+            "tmdb_id": row.tmdb_id,
+            "title": row.title,
+            "timestamp": row.timestamp.isoformat() if row.timestamp else None,
+        }),
+        media_type="application/x-ndjson"
+    )
+
+
+async def _movie_title(tmdb_id: int):
+    """(title, overview) for a movie not yet in the database: local catalog first, then TMDB."""
+    title = catalog_title(tmdb_id)
+    if title is not None:
+        return title, None
+
+    response = await run_in_threadpool(tmdb.get, f"/movie/{tmdb_id}")
+    logger.debug("TMDB lookup of movie %s returned %s", tmdb_id, response.status_code)
+    if response.status_code != 200:
+        return None, None
+    movie_data = response.json()
+    return movie_data.get("title", "Unknown Title"), movie_data.get("overview", "")
 
 # ✅ Add Movie to User History
 @router.post("/history")
-def add_history(
+async def add_history(
     request: HistoryCreate,
     user: User = Depends(get_current_user), 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     try:
         tmdb_movie_id = request.tmdb_movie_id
-        print(f"Received TMDB Movie ID: {tmdb_movie_id}")  # Debugging
-        print(f"User ID: {user.id}")  # Debugging
-
-        # Fetch movie details from TMDB API to verify it exists
-        tmdb_url = f"https://api.themoviedb.org/3/movie/{tmdb_movie_id}?api_key={TMDB_API_KEY}"
-        response = requests.get(tmdb_url)
-        print(f"TMDB API Request: {tmdb_url}")  # Debugging
-        print(f"TMDB API Status Code: {response.status_code}")  # Debugging
-
-        if response.status_code != 200:
-            print(f"TMDB API Error: {response.json()}")  # Debugging
-            raise HTTPException(status_code=404, detail="Movie not found on TMDB")
-
-        movie_data = response.json()
-        title = movie_data.get("title", "Unknown Title")
-        print(f"Movie Title: {title}")  # Debugging
-
-        # Check if movie already exists in the database
-        movie = db.query(Movie).filter(Movie.tmdb_id == tmdb_movie_id).first()
-        
-        if not movie:
-            print("Creating new movie entry")  # Debugging
-            # Insert new movie into the database
-            new_movie = Movie(tmdb_id=tmdb_movie_id, title=title)  
-            db.add(new_movie)
-            db.commit()
-            db.refresh(new_movie)
-            movie = new_movie
-            print(f"Created new movie with ID: {movie.id}")  # Debugging
-        else:
-            print(f"Found existing movie with ID: {movie.id}")  # Debugging
-
-        # Check if this movie is already in user's history
-        existing_entry = db.query(History).filter(
-            History.user_id == user.id,
-            History.movie_id == movie.id
-        ).first()
-
-        if existing_entry:
-            print("Movie already in user's history")  # Debugging
+        logger.debug("Adding movie %s to history of user %s", tmdb_movie_id, user.id)
+
+        # Write-behind: catalog movies are queued and inserted in batches by the flusher
+        if history_buffer.running:
+            title = catalog_title(tmdb_movie_id)
+            if title is not None:
+                try:
+                    await history_buffer.add(PendingHistory(user.id, tmdb_movie_id, title))
+                except HistoryBufferFull:
+                    raise HTTPException(
+                        status_code=503,
+                        detail="History is busy, please retry",
+                        headers={"Retry-After": "1"}
+                    )
+                feed_worker.mark_stale(user.id)
+                return {"message": "History saved successfully"}
+
+        # Single upsert statement when the movie is already in the database
+        added = await add_history_entry(db, user.id, tmdb_movie_id)
+
+        if added is None:
+            # New movie: take the title from the local catalog, or verify it on TMDB
+            title, overview = await _movie_title(tmdb_movie_id)
+            if title is None:
+                raise HTTPException(status_code=404, detail="Movie not found on TMDB")
+            logger.debug("Movie %s is new, title %r", tmdb_movie_id, title)
+            added = await add_history_entry(db, user.id, tmdb_movie_id, title=title, overview=overview)
+
+        if not added:
+            logger.debug("Movie %s already in history of user %s", tmdb_movie_id, user.id)
             return {"message": "Movie already in history"}
 
-        # Add history entry
-        new_entry = History(user_id=user.id, movie_id=movie.id, title=movie.title)
-        db.add(new_entry)
-        db.commit()
-        print("Added new history entry")  # Debugging
+        logger.debug("Added movie %s to history of user %s", tmdb_movie_id, user.id)
+        feed_worker.mark_stale(user.id)
 
         return {"message": "History saved successfully"}
+    except (HTTPException, tmdb.TMDBUnavailable):
+        raise
     except Exception as e:
-        print(f"Error in add_history: {str(e)}")  # Debugging
+        logger.exception("add_history failed for user %s", user.id)
         raise HTTPException(status_code=500, detail=str(e))
 
 
 # ✅ Clear User History
 @router.delete("/history")
-def clear_history(user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    db.query(History).filter(History.user_id == user.id).delete()
-    db.commit()
+async def clear_history(user: User = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    history_buffer.discard_user(user.id)
+    await db.execute(delete(History).where(History.user_id == user.id))
+    await db.commit()
+    feed_worker.mark_stale(user.id)
     return {"message": "History cleared"}
 
 @router.post("/logout")
@@ -216,122 +276,55 @@ def get_favorite_directors(user: User = Depends(get_current_user)):
 
 # Update user's favorite genres
 @router.put("/favorites/genres")
-def update_favorite_genres(
+async def update_favorite_genres(
     genres: List[str],
-    user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    user: User = Depends(get_current_user_for_update),
+    db: AsyncSession = Depends(get_async_db)
 ):
     user.favorite_genres = genres
-    db.commit()
+    await db.commit()
+    await invalidate_user(user.username)
+    feed_worker.mark_stale(user.id)
     return {"message": "Favorite genres updated successfully"}
 
 # Update user's favorite actors
 @router.put("/favorites/actors")
-def update_favorite_actors(
+async def update_favorite_actors(
     actors: List[str],
-    user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    user: User = Depends(get_current_user_for_update),
+    db: AsyncSession = Depends(get_async_db)
 ):
     user.favorite_actors = actors
-    db.commit()
+    await db.commit()
+    await invalidate_user(user.username)
+    feed_worker.mark_stale(user.id)
     return {"message": "Favorite actors updated successfully"}
 
 # Update user's favorite directors
 @router.put("/favorites/directors")
-def update_favorite_directors(
+async def update_favorite_directors(
     directors: List[str],
-    user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    user: User = Depends(get_current_user_for_update),
+    db: AsyncSession = Depends(get_async_db)
 ):
     user.favorite_directors = directors
-    db.commit()
+    await db.commit()
+    await invalidate_user(user.username)
+    feed_worker.mark_stale(user.id)
     return {"message": "Favorite directors updated successfully"}
 
 # Get personalized movie recommendations
-@router.get("/recommendations")
-def get_personalized_recommendations(user: User = Depends(get_current_user)):
+@router.get("/recommendations", response_model=FeedResponse)
+async def get_personalized_recommendations(
+    limit: int = Query(10, ge=1, le=50),
+    refresh: bool = Query(False, description="Recompute the feed now instead of serving the stored one"),
+    user: User = Depends(get_current_user)
+):
     try:
-        # Get user's favorite genres, actors, and directors
-        favorite_genres = user.favorite_genres or []
-        favorite_actors = user.favorite_actors or []
-        favorite_directors = user.favorite_directors or []
-
-        # Build TMDB API query parameters
-        params = {
-            "api_key": TMDB_API_KEY,
-            "language": "en-US",
-            "page": 1,
-            "sort_by": "popularity.desc"
-        }
-
-        # If user has favorite genres, use them
-        if favorite_genres:
-            # Get genre IDs from TMDB
-            genre_response = requests.get(
-                "https://api.themoviedb.org/3/genre/movie/list",
-                params={"api_key": TMDB_API_KEY, "language": "en-US"}
-            )
-            if genre_response.status_code == 200:
-                genre_map = {genre["name"].lower(): genre["id"] for genre in genre_response.json()["genres"]}
-                genre_ids = [genre_map[genre.lower()] for genre in favorite_genres if genre.lower() in genre_map]
-                if genre_ids:
-                    params["with_genres"] = ",".join(map(str, genre_ids))
-
-        # Fetch recommended movies from TMDB
-        response = requests.get(
-            "https://api.themoviedb.org/3/discover/movie",
-            params=params
-        )
-
-        if response.status_code != 200:
-            return {"recommendations": []}
-
-        movies = response.json()["results"][:10]  # Get top 10 movies
-
-        # If user has favorite actors or directors, try to include their movies
-        if favorite_actors or favorite_directors:
-            for person in favorite_actors + favorite_directors:
-                # Search for person in TMDB
-                person_response = requests.get(
-                    "https://api.themoviedb.org/3/search/person",
-                    params={
-                        "api_key": TMDB_API_KEY,
-                        "query": person,
-                        "language": "en-US"
-                    }
-                )
-                
-                if person_response.status_code == 200 and person_response.json()["results"]:
-                    person_id = person_response.json()["results"][0]["id"]
-                    
-                    # Get person's movies
-                    person_movies_response = requests.get(
-                        f"https://api.themoviedb.org/3/person/{person_id}/movie_credits",
-                        params={"api_key": TMDB_API_KEY}
-                    )
-                    
-                    if person_movies_response.status_code == 200:
-                        person_movies = person_movies_response.json()
-                        # Add cast/crew movies to recommendations
-                        for movie in person_movies.get("cast", []) + person_movies.get("crew", []):
-                            if movie not in movies:
-                                movies.append(movie)
-
-        # Format and return recommendations
-        recommendations = [
-            {
-                "id": movie["id"],
-                "title": movie["title"],
-                "overview": movie["overview"],
-                "poster_path": movie["poster_path"],
-                "vote_average": movie["vote_average"]
-            }
-            for movie in movies[:10]  # Limit to top 10 recommendations
-        ]
-
-        return {"recommendations": recommendations}
-    except Exception as e:
-        print(f"Error getting recommendations: {str(e)}")
+        # One primary-key lookup; the feed is precomputed in the background from history, ratings and favorites
+        return await get_feed(user.id, limit=limit, refresh=refresh)
+    except Exception:
+        logger.exception("Loading recommendations for user %s failed", user.id)
         return {"recommendations": []}
 
 # Get user profile
@@ -348,11 +341,13 @@ def get_profile(user: User = Depends(get_current_user)):
 
 # Update user profile
 @router.put("/profile")
-def update_profile(
+async def update_profile(
     profile_update: UserCreate,
-    user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    user: User = Depends(get_current_user_for_update),
+    db: AsyncSession = Depends(get_async_db)
 ):
+    previous_username = user.username
+
     # Update user fields
     user.username = profile_update.username
     user.email = profile_update.email
@@ -362,10 +357,12 @@ def update_profile(
 
     # Only update password if provided
     if profile_update.password:
-        user.password = bcrypt_context.hash(profile_update.password)
+        user.password = await password_hasher.hash(profile_update.password)
 
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await invalidate_user(previous_username)
+    await invalidate_user(user.username)
+    feed_worker.mark_stale(user.id)
 
     return {
         "message": "Profile updated successfully",
@@ -380,50 +377,66 @@ def update_profile(
     }
 
 # Search movies
-@router.get("/search/movie")
+@router.get("/search/movie", response_model=MoviePage)
 async def search_movies(query: str):
     try:
-        print(f"Searching for movies with query: {query}")  # Debug log
-        response = requests.get(
-            "https://api.themoviedb.org/3/search/movie",
-            params={
-                "api_key": TMDB_API_KEY,
-                "query": query,
-                "language": "en-US",
-                "page": 1
+        logger.debug("Movie search for %r", query)
+        # Serve from the in-process catalog index; only go to TMDB when it has no hits
+        results = search_catalog(query)
+        if results:
+            return {
+                "page": 1,
+                "results": results,
+                "total_pages": 1,
+                "total_results": len(results),
+                "source": "local"
             }
+
+        response = await run_in_threadpool(
+            tmdb.get,
+            "/search/movie",
+            {"query": query, "language": "en-US", "page": 1}
         )
         
         if response.status_code != 200:
-            print(f"TMDB API Error: {response.status_code} - {response.text}")  # Debug log
+            logger.warning("TMDB movie search failed with status %s", response.status_code)
             raise HTTPException(status_code=response.status_code, detail="Failed to fetch movies from TMDB")
             
         return response.json()
+    except (HTTPException, tmdb.TMDBUnavailable):
+        raise
     except Exception as e:
-        print(f"Error in search_movies: {str(e)}")  # Debug log
+        logger.exception("Movie search for %r failed", query)
         raise HTTPException(status_code=500, detail=str(e))
 
 # Get popular movies
-@router.get("/movies/popular")
-async def get_popular_movies():
+@router.get(
+    "/movies/popular",
+    response_model=MoviePage,
+    dependencies=[Depends(conditional(
+        "popular", lambda: popularity.version, f"public, max-age={POPULAR_CACHE_MAX_AGE}"
+    ))]
+)
+async def get_popular_movies(response: Response):
     try:
-        print(f"Fetching popular movies with API key: {TMDB_API_KEY[:5]}...")  # Debug log
-        response = requests.get(
-            "https://api.themoviedb.org/3/movie/popular",
-            params={
-                "api_key": TMDB_API_KEY,
-                "language": "en-US",
-                "page": 1
-            }
-        )
-        
-        if response.status_code != 200:
-            print(f"TMDB API Error: {response.status_code} - {response.text}")  # Debug log
-            raise HTTPException(status_code=response.status_code, detail="Failed to fetch popular movies from TMDB")
-            
-        return response.json()
+        # Served from the in-memory popularity ranking; TMDB only if it is empty
+        results = popularity.top(20)
+        if results:
+            return {"page": 1, "results": results, "source": "local"}
+
+        # Live TMDB data isn't covered by the ranking's ETag
+        uncacheable(response)
+        tmdb_response = await run_in_threadpool(tmdb.get, "/movie/popular", {"language": "en-US", "page": 1})
+
+        if tmdb_response.status_code != 200:
+            logger.warning("TMDB popular movies failed with status %s", tmdb_response.status_code)
+            raise HTTPException(status_code=tmdb_response.status_code, detail="Failed to fetch popular movies from TMDB")
+
+        return tmdb_response.json()
+    except (HTTPException, tmdb.TMDBUnavailable):
+        raise
     except Exception as e:
-        print(f"Error in get_popular_movies: {str(e)}")  # Debug log
+        logger.exception("Loading popular movies failed")
         raise HTTPException(status_code=500, detail=str(e))
 
 # Add rating for a movie
@@ -432,7 +445,7 @@ async def rate_movie(
     tmdb_id: int,
     rating_request: RatingRequest,
     user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     try:
         rating = rating_request.rating
@@ -440,68 +453,88 @@ async def rate_movie(
         if not (0 <= rating <= 5):
             raise HTTPException(status_code=400, detail="Rating must be between 0 and 5")
 
-        # Check if movie exists in our database
-        movie = db.query(Movie).filter(Movie.tmdb_id == tmdb_id).first()
-        if not movie:
-            # Fetch movie details from TMDB
-            response = requests.get(
-                f"https://api.themoviedb.org/3/movie/{tmdb_id}?api_key={TMDB_API_KEY}"
-            )
-            if response.status_code != 200:
+        # Single upsert statement when the movie is already in the database
+        if not await upsert_rating(db, user.id, tmdb_id, rating):
+            title, overview = await _movie_title(tmdb_id)
+            if title is None:
                 raise HTTPException(status_code=404, detail="Movie not found")
-            
-            movie_data = response.json()
-            movie = Movie(
-                tmdb_id=tmdb_id,
-                title=movie_data["title"],
-                overview=movie_data.get("overview", "")
-            )
-            db.add(movie)
-            db.commit()
-            db.refresh(movie)
-
-        # Check if user has already rated this movie
-        existing_rating = db.query(Rating).filter(
-            Rating.user_id == user.id,
-            Rating.tmdb_id == tmdb_id
-        ).first()
-
-        if existing_rating:
-            # Update existing rating
-            existing_rating.rating = rating
-        else:
-            # Create new rating
-            new_rating = Rating(
-                user_id=user.id,
-                tmdb_id=tmdb_id,
-                rating=rating
-            )
-            db.add(new_rating)
-
-        db.commit()
+            await upsert_rating(db, user.id, tmdb_id, rating, title=title, overview=overview)
+        feed_worker.mark_stale(user.id)
+
         return {"message": "Rating added successfully", "rating": rating}
 
+    except (HTTPException, tmdb.TMDBUnavailable):
+        raise
     except Exception as e:
-        print(f"Error in rate_movie: {str(e)}")
+        logger.exception("Rating movie %s failed for user %s", tmdb_id, user.id)
         raise HTTPException(status_code=500, detail=str(e))
 
+# ✅ List the user's ratings (keyset pagination, most recent first)
+@router.get("/ratings")
+async def list_ratings(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="Value of the X-Next-Cursor header from the previous page"),
+    user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    query = (
+        select(Rating.id, Rating.tmdb_id, Rating.rating, Movie.title)
+        .join(Movie, Movie.tmdb_id == Rating.tmdb_id)
+        .where(Rating.user_id == user.id)
+        .order_by(Rating.id.desc())
+        .limit(limit + 1)
+    )
+    if cursor:
+        (after_id,) = decode_cursor(cursor, int)
+        query = query.where(Rating.id < after_id)
+
+    rows = (await db.execute(query)).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(rows[-1].id)
+
+    return [
+        {"id": row.id, "tmdb_id": row.tmdb_id, "title": row.title, "rating": row.rating}
+        for row in rows
+    ]
+
+# ✅ Stream all of the user's ratings as NDJSON
+@router.get("/ratings/export")
+async def export_ratings(user: User = Depends(get_current_user)):
+    query = (
+        select(Rating.id, Rating.tmdb_id, Rating.rating, Movie.title)
+        .join(Movie, Movie.tmdb_id == Rating.tmdb_id)
+        .where(Rating.user_id == user.id)
+        .order_by(Rating.id.desc())
+    )
+    return StreamingResponse(
+        stream_ndjson(query, lambda row: {
+            "id": row.id,
+            "tmdb_id": row.tmdb_id,
+            "title": row.title,
+            "rating": row.rating,
+        }),
+        media_type="application/x-ndjson"
+    )
+
 # Get user's rating for a movie
 @router.get("/movies/{tmdb_id}/rating")
 async def get_movie_rating(
     tmdb_id: int,
     user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     try:
-        rating = db.query(Rating).filter(
+        rating = (await db.execute(select(Rating.rating).where(
             Rating.user_id == user.id,
             Rating.tmdb_id == tmdb_id
-        ).first()
+        ))).scalar_one_or_none()
 
-        if rating:
-            return {"rating": rating.rating}
+        if rating is not None:
+            return {"rating": rating}
         return {"rating": None}
 
     except Exception as e:
-        print(f"Error in get_movie_rating: {str(e)}")
+        logger.exception("Loading rating of movie %s failed for user %s", tmdb_id, user.id)
         raise HTTPException(status_code=500, detail=str(e))
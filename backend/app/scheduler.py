@@ -0,0 +1,357 @@
+"""
+In-process scheduler for periodic background jobs, started with the app.
+
+Jobs have an interval or cron trigger, optional jitter, and a max runtime,
+after which the run is cancelled. A job never overlaps itself: the next run
+is scheduled when the current one ends. leader_only jobs run on one process
+across all replicas: the one holding a Postgres advisory lock, kept on a
+dedicated connection. If that process dies its connection closes, and
+another process takes over within SCHEDULER_LEADER_POLL seconds. Other jobs
+run in every process (for example refreshing in-memory state).
+
+Run times go to scheduler_job_duration_seconds, and GET /stats/scheduler
+shows each job's last run. SCHEDULER_SCHEDULES overrides a job's trigger
+by name: a number is an interval in seconds, and five fields are a cron
+expression (UTC).
+"""
+import asyncio
+import hashlib
+import logging
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import text
+from app.config import SCHEDULER_ENABLED, SCHEDULER_DATABASE_URL, SCHEDULER_LEADER_POLL, SCHEDULER_SCHEDULES
+from app.metrics import JOB_RUN_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# minute, hour, day of month, month, day of week (0 or 7 = Sunday)
+_CRON_FIELDS = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+# A cron expression with no match this far ahead (e.g. "0 0 31 2 *") is rejected
+_CRON_HORIZON = timedelta(days=5 * 366)
+
+
+class IntervalTrigger:
+    def __init__(self, seconds):
+        if seconds <= 0:
+            raise ValueError("Interval must be positive")
+        self.seconds = seconds
+
+    def next_after(self, timestamp):
+        return timestamp + self.seconds
+
+    def __str__(self):
+        return f"every {self.seconds:g}s"
+
+
+def _cron_field(spec, low, high):
+    values = set()
+    for part in spec.split(","):
+        body, slash, step = part.partition("/")
+        step = int(step) if slash else 1
+        if body == "*":
+            start, stop = low, high
+        elif "-" in body:
+            start, stop = (int(v) for v in body.split("-", 1))
+        else:
+            start = int(body)
+            stop = high if slash else start
+        if step < 1 or not low <= start <= stop <= high:
+            raise ValueError(f"Invalid cron field {spec!r}")
+        values.update(range(start, stop + 1, step))
+    return values
+
+
+class CronTrigger:
+    """Five-field cron expression ("*/15 * * * *", "0 3 * * 1-5") evaluated in UTC."""
+
+    def __init__(self, expression):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression needs 5 fields: {expression!r}")
+        self.expression = expression
+        self.minutes, self.hours, self.days, self.months, weekdays = (
+            _cron_field(spec, low, high) for spec, (low, high) in zip(fields, _CRON_FIELDS)
+        )
+        self.weekdays = {d % 7 for d in weekdays}
+        # As in cron: with both day fields restricted, either one matching is enough
+        self.any_day = fields[2] == "*"
+        self.any_weekday = fields[4] == "*"
+        self.next_after(time.time())  # fail now on expressions that never fire
+
+    def _day_matches(self, dt):
+        dom = dt.day in self.days
+        dow = dt.isoweekday() % 7 in self.weekdays
+        if self.any_day:
+            return dow
+        if self.any_weekday:
+            return dom
+        return dom or dow
+
+    def next_after(self, timestamp):
+        dt = datetime.fromtimestamp(timestamp, timezone.utc).replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = dt + _CRON_HORIZON
+        while dt < limit:
+            if dt.month not in self.months:
+                dt = (dt.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+            elif not self._day_matches(dt):
+                dt = dt.replace(hour=0, minute=0) + timedelta(days=1)
+            elif dt.hour not in self.hours:
+                dt = dt.replace(minute=0) + timedelta(hours=1)
+            elif dt.minute not in self.minutes:
+                dt += timedelta(minutes=1)
+            else:
+                return dt.timestamp()
+        raise ValueError(f"Cron expression never fires: {self.expression!r}")
+
+    def __str__(self):
+        return f"cron {self.expression}"
+
+
+def parse_trigger(spec):
+    """"300" -> every 300 seconds; "*/5 * * * *" -> cron."""
+    spec = spec.strip()
+    return CronTrigger(spec) if " " in spec else IntervalTrigger(float(spec))
+
+
+def _parse_schedules(spec):
+    schedules = {}
+    for item in spec.split(","):
+        name, sep, trigger = item.partition("=")
+        if sep and name.strip() and trigger.strip():
+            schedules[name.strip()] = parse_trigger(trigger)
+    return schedules
+
+
+def _lock_key(name):
+    """Stable signed 64-bit advisory lock key for a name."""
+    return int.from_bytes(hashlib.blake2b(name.encode(), digest_size=8).digest(), "big", signed=True)
+
+
+class LeaderElection:
+    """
+    Holds a session-level pg advisory lock while this process is the leader.
+
+    The lock lives on a dedicated autocommit connection, so it doesn't take a
+    pool slot and doesn't leave a transaction open. A non-leader retries
+    every `poll` seconds, and the leader checks that its connection is still alive.
+    """
+
+    def __init__(self, name, url, poll):
+        self.key = _lock_key(name)
+        self.url = url
+        self.poll = poll
+        self.is_leader = False
+        self.since = None
+        self.elections = 0
+        self._engine = None
+        self._conn = None
+        self._task = None
+
+    async def start(self):
+        if self._task is None:
+            from app.database import create_unpooled_async_engine
+            self._engine = create_unpooled_async_engine(self.url)
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            try:
+                await self._check()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if self.is_leader:
+                    logger.warning(f"Lost scheduler leadership: {str(e)}")
+                else:
+                    logger.error(f"Scheduler leader election failed: {str(e)}")
+                await self._release()
+            await asyncio.sleep(self.poll)
+
+    async def _check(self):
+        if self._conn is not None:
+            await self._conn.execute(text("SELECT 1"))
+            return
+        conn = await self._engine.connect()
+        try:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            acquired = (await conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": self.key})).scalar()
+        except BaseException:
+            await conn.close()
+            raise
+        if not acquired:
+            await conn.close()
+            return
+        self._conn = conn
+        self.is_leader = True
+        self.since = datetime.utcnow()
+        self.elections += 1
+        logger.info("This process is now the scheduler leader")
+
+    async def _release(self):
+        conn, self._conn = self._conn, None
+        self.is_leader = False
+        self.since = None
+        if conn is not None:
+            try:
+                # Closing the connection releases the lock; unlocking first frees it without waiting on the close
+                await conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": self.key})
+            except Exception:
+                pass
+            try:
+                await conn.close()
+            except Exception:
+                pass
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self._release()
+        if self._engine is not None:
+            await self._engine.dispose()
+            self._engine = None
+
+    def stats(self):
+        return {
+            "is_leader": self.is_leader,
+            "leader_since": self.since.isoformat() if self.since else None,
+            "elections_won": self.elections,
+        }
+
+
+class Job:
+    def __init__(self, name, fn, trigger, jitter, max_runtime, leader_only, run_at_start):
+        self.name = name
+        self.fn = fn
+        self.trigger = trigger
+        self.jitter = jitter
+        self.max_runtime = max_runtime
+        self.leader_only = leader_only
+        self.run_at_start = run_at_start
+        self.running = False
+        self.next_run = None
+        self.runs = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.skipped = 0
+        self.last_started = None
+        self.last_success = None
+        self.last_duration = None
+        self.last_error = None
+
+    def stats(self):
+        return {
+            "trigger": str(self.trigger),
+            "leader_only": self.leader_only,
+            "running": self.running,
+            "next_run": datetime.utcfromtimestamp(self.next_run).isoformat() if self.next_run else None,
+            "runs": self.runs,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "skipped_not_leader": self.skipped,
+            "last_started": datetime.utcfromtimestamp(self.last_started).isoformat() if self.last_started else None,
+            "last_success": datetime.utcfromtimestamp(self.last_success).isoformat() if self.last_success else None,
+            "last_duration_ms": round(self.last_duration * 1000, 3) if self.last_duration is not None else None,
+            "last_error": self.last_error,
+        }
+
+
+class Scheduler:
+    """Per-process job runner; `scheduler` is the shared instance services register their jobs on."""
+
+    def __init__(self, election, schedules=None):
+        self.election = election
+        self.schedules = schedules or {}
+        self.jobs = {}
+        self._tasks = []
+
+    def add(self, name, fn, trigger, jitter=0.0, max_runtime=None, leader_only=True, run_at_start=False):
+        """
+        Register `fn` (an async callable without arguments) as job `name`.
+
+        `jitter` adds up to that many random seconds before each run, so
+        replicas don't fire in lockstep. A run still going after
+        `max_runtime` seconds is cancelled.
+        """
+        if name in self.jobs:
+            raise ValueError(f"Job {name} is already registered")
+        trigger = self.schedules.get(name, trigger)
+        self.jobs[name] = Job(name, fn, trigger, jitter, max_runtime, leader_only, run_at_start)
+
+    async def start(self):
+        if not SCHEDULER_ENABLED or self._tasks:
+            return
+        if any(job.leader_only for job in self.jobs.values()):
+            await self.election.start()
+        self._tasks = [asyncio.create_task(self._loop(job)) for job in self.jobs.values()]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await self.election.stop()
+
+    async def _loop(self, job):
+        now = time.time()
+        job.next_run = now if job.run_at_start else job.trigger.next_after(now)
+        while True:
+            delay = job.next_run - time.time()
+            if job.jitter:
+                delay += random.uniform(0, job.jitter)
+            await asyncio.sleep(max(delay, 0.0))
+            if job.leader_only and not self.election.is_leader:
+                job.skipped += 1
+            else:
+                await self._run(job)
+            job.next_run = job.trigger.next_after(time.time())
+
+    async def _run(self, job):
+        job.running = True
+        job.last_started = time.time()
+        start = time.perf_counter()
+        outcome = "success"
+        try:
+            if job.max_runtime:
+                await asyncio.wait_for(job.fn(), job.max_runtime)
+            else:
+                await job.fn()
+        except asyncio.TimeoutError:
+            outcome = "timeout"
+            job.timeouts += 1
+            job.last_error = f"Cancelled after {job.max_runtime:g}s"
+            logger.error(f"Job {job.name} exceeded its max runtime of {job.max_runtime:g}s")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            outcome = "error"
+            job.failures += 1
+            job.last_error = str(e)
+            logger.error(f"Job {job.name} failed: {str(e)}", exc_info=e)
+        finally:
+            job.running = False
+            job.runs += 1
+            job.last_duration = time.perf_counter() - start
+            JOB_RUN_SECONDS.observe(job.last_duration, job.name, outcome)
+        if outcome == "success":
+            job.last_success = time.time()
+            job.last_error = None
+
+    def stats(self):
+        return {
+            "enabled": SCHEDULER_ENABLED,
+            "leader": self.election.stats(),
+            "jobs": {name: job.stats() for name, job in self.jobs.items()},
+        }
+
+
+scheduler = Scheduler(
+    LeaderElection("movie-rec:scheduler", SCHEDULER_DATABASE_URL, SCHEDULER_LEADER_POLL),
+    _parse_schedules(SCHEDULER_SCHEDULES),
+)
@@ -1,3 +1,4 @@
+from typing import List, Optional
 from pydantic import BaseModel
 from datetime import datetime
 
@@ -7,3 +8,58 @@ class HistoryResponse(BaseModel):
 
     class Config:
         orm_mode = True
+
+
+# Response models for the busiest read routes. They project only the fields the
+# frontend renders, so pass-through TMDB payloads and internal fields (scores used
+# for ranking, popularity) don't get serialized.
+
+class MovieSummary(BaseModel):
+    id: int
+    title: Optional[str] = None
+    overview: Optional[str] = None
+    poster_path: Optional[str] = None
+    vote_average: Optional[float] = None
+
+class MovieDetails(MovieSummary):
+    release_date: Optional[str] = None
+
+class MoviePage(BaseModel):
+    page: int = 1
+    results: List[MovieSummary]
+    total_pages: Optional[int] = None
+    total_results: Optional[int] = None
+    source: str = "tmdb"
+
+class Recommendation(BaseModel):
+    id: int
+    title: Optional[str] = None
+    poster_path: Optional[str] = None
+    year: Optional[int] = None
+    vote_average: Optional[float] = None
+    score: float
+
+class RecommendationList(BaseModel):
+    recommendations: List[Recommendation]
+
+class Suggestion(BaseModel):
+    id: int
+    title: str
+
+class SuggestionList(BaseModel):
+    suggestions: List[Suggestion]
+
+class FeedMovie(MovieSummary):
+    score: Optional[float] = None
+
+class FeedResponse(BaseModel):
+    recommendations: List[FeedMovie]
+    computed_at: Optional[str] = None
+    age_seconds: Optional[float] = None
+    stale: Optional[bool] = None
+
+class HistoryEntry(BaseModel):
+    id: Optional[int] = None
+    title: Optional[str] = None
+    timestamp: datetime
+    poster_path: str
@@ -0,0 +1,140 @@
+import heapq
+import math
+import re
+from collections import defaultdict
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Title matches count for more than matches in the overview/cast/keyword tags
+FIELD_WEIGHTS = {"title": 3.0, "text": 1.0}
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+STOP_WORDS = frozenset(
+    "a an and are as at be by for from has he in is it its of on or that the to was were will with".split()
+)
+
+
+def _stem(token):
+    """Very light suffix stripping so 'heroes'/'hero' and 'running'/'run' land on the same term."""
+    if len(token) > 5:
+        for suffix in ("ing", "ies", "ed", "es", "ly"):
+            if token.endswith(suffix):
+                return token[: -len(suffix)]
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def tokenize(text):
+    if not text:
+        return []
+    if not isinstance(text, str):
+        text = " ".join(str(t) for t in text)
+    return [_stem(t) for t in _TOKEN_RE.findall(text.lower()) if t not in STOP_WORDS]
+
+
+def _query_terms(query):
+    """
+    Query terms plus adjacent pairs glued together.
+
+    The model's tags store people and keywords without spaces ("samworthington"),
+    so "sam worthington" also has to be tried as one term.
+    """
+    raw = [t for t in _TOKEN_RE.findall(query.lower()) if t not in STOP_WORDS]
+    terms = [_stem(t) for t in raw]
+    terms += [_stem(a + b) for a, b in zip(raw, raw[1:])]
+    return list(dict.fromkeys(terms))
+
+
+class SearchIndex:
+    """
+    In-memory inverted index with BM25 scoring over the movie catalog.
+
+    Each document has a title field and a text field (overview, genres, cast,
+    keywords, director). Postings are kept per field as term -> [(doc, tf)]
+    and turned into precomputed BM25 weights by finalize().
+    """
+
+    def __init__(self):
+        self.doc_ids = []
+        self._postings = {field: defaultdict(list) for field in FIELD_WEIGHTS}
+        self._lengths = {field: [] for field in FIELD_WEIGHTS}
+        self._avg_length = {field: 1.0 for field in FIELD_WEIGHTS}
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+    def add(self, doc_id, title, text):
+        doc = len(self.doc_ids)
+        self.doc_ids.append(doc_id)
+        for field, value in (("title", title), ("text", text)):
+            tokens = tokenize(value)
+            self._lengths[field].append(len(tokens))
+            counts = defaultdict(int)
+            for token in tokens:
+                counts[token] += 1
+            postings = self._postings[field]
+            for token, tf in counts.items():
+                postings[token].append((doc, tf))
+
+    def finalize(self):
+        """
+        Precompute the length-normalized BM25 tf component of every posting,
+        so a query only multiplies by idf and field weight.
+        """
+        for field, lengths in self._lengths.items():
+            avg = (sum(lengths) / len(lengths)) if lengths and sum(lengths) else 1.0
+            self._avg_length[field] = avg
+            frozen = {}
+            for term, plist in self._postings[field].items():
+                frozen[term] = [
+                    (doc, tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * lengths[doc] / avg)))
+                    for doc, tf in plist
+                ]
+            # Plain dict so lookups for unknown terms don't grow the index
+            self._postings[field] = frozen
+
+    def search(self, query, limit=20):
+        """Return [(doc_id, score)] for the best `limit` matches, best first."""
+        terms = _query_terms(query)
+        if not terms or not self.doc_ids:
+            return []
+
+        n_docs = len(self.doc_ids)
+        scores = defaultdict(float)
+        for field, weight in FIELD_WEIGHTS.items():
+            postings = self._postings[field]
+            for term in terms:
+                plist = postings.get(term)
+                if not plist:
+                    continue
+                idf = weight * math.log(1 + (n_docs - len(plist) + 0.5) / (len(plist) + 0.5))
+                for doc, tf_part in plist:
+                    scores[doc] += idf * tf_part
+
+        best = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+        return [(self.doc_ids[doc], score) for doc, score in best]
+
+    @classmethod
+    def build(cls, movies, movie_meta=None):
+        """
+        Build the index from the model's movies frame.
+
+        The frame's `tags` column already mixes overview, genres, keywords, cast and
+        director; if local metadata is available its plain-text fields are added too.
+        """
+        movie_meta = movie_meta or {}
+        index = cls()
+        has_tags = "tags" in movies.columns
+        for row in movies.itertuples(index=False):
+            meta = movie_meta.get(row.movie_id, {})
+            text = [row.tags] if has_tags else []
+            for key in ("overview", "genres", "cast", "keywords", "directors"):
+                value = meta.get(key)
+                if value:
+                    text.append(value if isinstance(value, str) else " ".join(value))
+            index.add(row.movie_id, row.title, " ".join(text))
+        index.finalize()
+        return index
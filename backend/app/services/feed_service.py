@@ -0,0 +1,253 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import text
+from starlette.concurrency import run_in_threadpool
+from app.config import FEED_SIZE, FEED_MAX_AGE, FEED_SWEEP_INTERVAL, FEED_DEBOUNCE, FEED_WORKERS
+from app.database import AsyncSessionLocal
+from app.recommendations import recommend_for_profile, movie_details
+from app.scheduler import scheduler, IntervalTrigger
+from app.services.popularity_service import popularity
+
+logger = logging.getLogger(__name__)
+
+# Most recent watches used as seeds for the feed
+SEED_HISTORY = 50
+# Users with a watch in this window get a feed even if they never asked for one
+ACTIVE_DAYS = 30
+
+_PROFILE = text("""
+    SELECT favorite_genres, favorite_actors, favorite_directors FROM users WHERE id = :user_id
+""")
+
+_RECENT_HISTORY = text("""
+    SELECT m.tmdb_id
+    FROM history h
+    JOIN movies m ON m.id = h.movie_id
+    WHERE h.user_id = :user_id
+    ORDER BY h.timestamp DESC, h.id DESC
+    LIMIT :limit
+""")
+
+_RATINGS = text("SELECT tmdb_id, rating FROM ratings WHERE user_id = :user_id")
+
+_STORE_FEED = text("""
+    INSERT INTO user_feeds (user_id, tmdb_ids, scores, computed_at)
+    VALUES (:user_id, :tmdb_ids, :scores, :computed_at)
+    ON CONFLICT (user_id) DO UPDATE SET
+        tmdb_ids = EXCLUDED.tmdb_ids,
+        scores = EXCLUDED.scores,
+        computed_at = EXCLUDED.computed_at
+""")
+
+_LOAD_FEED = text("""
+    SELECT tmdb_ids, scores, computed_at FROM user_feeds WHERE user_id = :user_id
+""")
+
+# Feeds past their max age, plus recently active users without one
+_DUE_USERS = text("""
+    SELECT user_id FROM user_feeds
+    WHERE computed_at < :expired_before
+    UNION
+    SELECT DISTINCT h.user_id
+    FROM history h
+    LEFT JOIN user_feeds f ON f.user_id = h.user_id
+    WHERE f.user_id IS NULL AND h.timestamp > :active_since
+    LIMIT :limit
+""")
+
+
+async def compute_feed(user_id: int, size: int = FEED_SIZE):
+    """Recompute and store one user's feed; returns [(tmdb_id, score)]."""
+    computed_at = datetime.utcnow()
+    # Inputs are read in one session and the result written in another, so no
+    # connection is held while the model runs in the threadpool
+    async with AsyncSessionLocal() as db:
+        profile = (await db.execute(_PROFILE, {"user_id": user_id})).one_or_none()
+        if profile is None:
+            return []
+        watched = [row.tmdb_id for row in (await db.execute(
+            _RECENT_HISTORY, {"user_id": user_id, "limit": SEED_HISTORY}
+        )).all()]
+        ratings = (await db.execute(_RATINGS, {"user_id": user_id})).all()
+
+    # Watches count as mild likes; ratings pull towards (or away from) similar movies
+    seeds = {tmdb_id: 0.5 for tmdb_id in watched}
+    for row in ratings:
+        seeds[row.tmdb_id] = (row.rating - 2.5) / 2.5
+    favorites = [
+        name
+        for names in (profile.favorite_genres, profile.favorite_actors, profile.favorite_directors)
+        for name in (names or [])
+    ]
+
+    feed = await run_in_threadpool(recommend_for_profile, seeds, (), favorites, size)
+    if len(feed) < size:
+        # Top up thin profiles with what's popular right now
+        seen = set(seeds) | {tmdb_id for tmdb_id, _ in feed}
+        feed += [(m["id"], 0.0) for m in popularity.top(size - len(feed), exclude=seen)]
+
+    async with AsyncSessionLocal() as db:
+        await db.execute(_STORE_FEED, {
+            "user_id": user_id,
+            "tmdb_ids": [tmdb_id for tmdb_id, _ in feed],
+            "scores": [score for _, score in feed],
+            "computed_at": computed_at,
+        })
+        await db.commit()
+    return feed
+
+
+class FeedWorker:
+    """
+    Background job runner that keeps materialized feeds fresh.
+
+    Events mark the user's feed stale and enqueue the user (deduplicated and
+    debounced, so a burst of writes causes one recompute); the scheduled
+    sweep enqueues feeds that are past FEED_MAX_AGE or missing for recently
+    active users. Only the scheduler leader sweeps, so replicas don't all
+    recompute the same expired feeds.
+    """
+
+    def __init__(self, workers=FEED_WORKERS, debounce=FEED_DEBOUNCE):
+        self.workers = workers
+        self.debounce = debounce
+        self._queue = None
+        self._queued = set()
+        # user_id -> time of the oldest event not yet reflected in the stored feed
+        self._stale_since = {}
+        self._tasks = []
+        self.computed = 0
+        self.failed = 0
+        self.swept = 0
+        self.last_compute_ms = None
+        self.max_compute_ms = 0.0
+
+    async def start(self):
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def mark_stale(self, user_id: int):
+        """Record a write that affects the user's feed and schedule a refresh."""
+        self._stale_since.setdefault(user_id, datetime.utcnow())
+        self.enqueue(user_id)
+
+    def stale_since(self, user_id: int):
+        return self._stale_since.get(user_id)
+
+    def enqueue(self, user_id: int):
+        if self._queue is None or user_id in self._queued:
+            return
+        self._queued.add(user_id)
+        self._queue.put_nowait((user_id, time.monotonic()))
+
+    async def _work(self):
+        while True:
+            user_id, queued_at = await self._queue.get()
+            delay = queued_at + self.debounce - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            # Events from here on enqueue the user again and mark the new feed stale
+            self._queued.discard(user_id)
+            marked = self._stale_since.pop(user_id, None)
+            start = time.perf_counter()
+            try:
+                await compute_feed(user_id)
+            except Exception as e:
+                self.failed += 1
+                if marked is not None:
+                    self._stale_since.setdefault(user_id, marked)
+                logger.error(f"Feed refresh for user {user_id} failed: {str(e)}")
+                continue
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self.computed += 1
+            self.last_compute_ms = round(elapsed_ms, 3)
+            self.max_compute_ms = max(self.max_compute_ms, elapsed_ms)
+
+    async def sweep(self):
+        """Enqueue feeds past FEED_MAX_AGE and active users without one (scheduler job, leader only)."""
+        now = datetime.utcnow()
+        async with AsyncSessionLocal() as db:
+            due = (await db.execute(_DUE_USERS, {
+                "expired_before": now - timedelta(seconds=FEED_MAX_AGE),
+                "active_since": now - timedelta(days=ACTIVE_DAYS),
+                "limit": 1000,
+            })).scalars().all()
+        for user_id in due:
+            self.enqueue(user_id)
+        self.swept += len(due)
+
+    def stats(self):
+        return {
+            "running": bool(self._tasks),
+            "queued": len(self._queued),
+            "stale": len(self._stale_since),
+            "computed": self.computed,
+            "failed": self.failed,
+            "swept": self.swept,
+            "last_compute_ms": self.last_compute_ms,
+            "max_compute_ms": round(self.max_compute_ms, 3),
+        }
+
+
+feed_worker = FeedWorker()
+scheduler.add(
+    "feeds.sweep",
+    feed_worker.sweep,
+    IntervalTrigger(FEED_SWEEP_INTERVAL),
+    jitter=min(FEED_SWEEP_INTERVAL * 0.1, 30),
+    max_runtime=max(FEED_SWEEP_INTERVAL, 60),
+)
+
+
+async def get_feed(user_id: int, limit: int = 10, refresh: bool = False):
+    """
+    The user's materialized feed with display fields and staleness.
+
+    refresh=True computes the feed on the spot. A user without a stored feed
+    gets the popular list (marked stale, with no computed_at) while the
+    workers compute one, so the request doesn't wait on the model.
+    """
+    row = None
+    if not refresh:
+        async with AsyncSessionLocal() as db:
+            row = (await db.execute(_LOAD_FEED, {"user_id": user_id})).one_or_none()
+        if row is None:
+            feed_worker.mark_stale(user_id)
+            return {
+                "recommendations": [{**movie, "score": 0.0} for movie in popularity.top(limit)],
+                "computed_at": None,
+                "age_seconds": None,
+                "stale": True,
+            }
+
+    if row is None:
+        computed_at = datetime.utcnow()
+        items = await compute_feed(user_id)
+    else:
+        items, computed_at = list(zip(row.tmdb_ids, row.scores)), row.computed_at
+
+    recommendations = []
+    for tmdb_id, score in items[:limit]:
+        movie = movie_details(tmdb_id)
+        movie["score"] = score
+        recommendations.append(movie)
+
+    age = (datetime.utcnow() - computed_at).total_seconds()
+    return {
+        "recommendations": recommendations,
+        "computed_at": computed_at.isoformat(),
+        "age_seconds": round(age, 1),
+        "stale": age > FEED_MAX_AGE or (
+            feed_worker.stale_since(user_id) is not None and feed_worker.stale_since(user_id) > computed_at
+        ),
+    }
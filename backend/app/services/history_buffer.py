@@ -0,0 +1,260 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from sqlalchemy import text
+from sqlalchemy.exc import DataError, IntegrityError
+from app.config import (
+    HISTORY_BUFFER_SIZE,
+    HISTORY_FLUSH_BATCH,
+    HISTORY_FLUSH_INTERVAL,
+    HISTORY_ENQUEUE_TIMEOUT,
+    HISTORY_FLUSH_RETRIES,
+)
+from app.database import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Make sure every movie in the batch exists ...
+_INSERT_MOVIES = text("""
+    INSERT INTO movies (tmdb_id, title)
+    SELECT DISTINCT ON (tmdb_id) tmdb_id, title
+    FROM unnest(CAST(:tmdb_ids AS integer[]), CAST(:titles AS text[])) AS t(tmdb_id, title)
+    ORDER BY tmdb_id
+    ON CONFLICT (tmdb_id) DO NOTHING
+""")
+
+# ... then insert the whole batch of history rows in one statement
+_INSERT_HISTORY = text("""
+    INSERT INTO history (user_id, movie_id, title, timestamp)
+    SELECT e.user_id, m.id, m.title, e.ts
+    FROM unnest(
+        CAST(:user_ids AS integer[]),
+        CAST(:tmdb_ids AS integer[]),
+        CAST(:timestamps AS timestamp[])
+    ) AS e(user_id, tmdb_id, ts)
+    JOIN movies m ON m.tmdb_id = e.tmdb_id
+    ON CONFLICT ON CONSTRAINT unique_user_movie_history DO NOTHING
+""")
+
+RETRY_DELAY = 1.0  # seconds, doubled after each failed attempt
+# Queued by stop(): the flusher writes what it holds, drains the queue and exits
+_STOP = object()
+
+
+class HistoryBufferFull(Exception):
+    """The write-behind queue is full; the client should retry shortly."""
+
+
+@dataclass(eq=False)
+class PendingHistory:
+    user_id: int
+    tmdb_id: int
+    title: str
+    timestamp: datetime = field(default_factory=datetime.utcnow)
+
+
+class HistoryBuffer:
+    """
+    Write-behind buffer for watch-history events.
+
+    Accepted events wait in a bounded queue and a background task writes them
+    in multi-row inserts once `batch_size` events are queued or `flush_interval`
+    has passed. Events stay visible through pending_for() until committed, so a
+    user's own history reads served by this process include them, and stop()
+    drains everything to the database on shutdown.
+
+    A batch that keeps failing is retried HISTORY_FLUSH_RETRIES times. A batch
+    the database rejects (e.g. a user deleted while their events were queued) is
+    split until the offending rows are isolated. Those rows are logged and
+    dropped (dead-lettered), so one bad event can't stall the flusher.
+    """
+
+    def __init__(self, max_size=HISTORY_BUFFER_SIZE, batch_size=HISTORY_FLUSH_BATCH,
+                 flush_interval=HISTORY_FLUSH_INTERVAL, enqueue_timeout=HISTORY_ENQUEUE_TIMEOUT):
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+        self._queue = None
+        self._task = None
+        self._closing = False
+        # user_id -> {tmdb_id: event} for read-your-writes and clear_history
+        self._pending = {}
+        self.accepted = 0
+        self.rejected = 0
+        self.flushes = 0
+        self.rows_flushed = 0
+        self.flush_errors = 0
+        self.dead_lettered = 0
+        self.last_flush_ms = None
+        self.max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+
+    @property
+    def running(self):
+        # Once stopping, writes go straight to the database instead
+        return self._task is not None and not self._closing
+
+    async def start(self):
+        if self._task is None:
+            self._queue = asyncio.Queue(maxsize=self.max_size)
+            self._closing = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop accepting events and wait for the flusher to write out everything it holds."""
+        if self._task is None:
+            return
+        self._closing = True
+        # Never cancelled: a cancelled flusher would lose the batch it is holding
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+
+    async def add(self, event: PendingHistory):
+        """Queue an event, waiting briefly for space; raises HistoryBufferFull when saturated."""
+        user_events = self._pending.setdefault(event.user_id, {})
+        if event.tmdb_id in user_events:
+            # Already queued; the first watch is kept, as with the direct insert's ON CONFLICT DO NOTHING
+            return
+        # Registered before queueing: the flusher may take the event off the queue before put()
+        # returns here, and it only writes events that are still pending
+        user_events[event.tmdb_id] = event
+        try:
+            await asyncio.wait_for(self._queue.put(event), timeout=self.enqueue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            self._forget(event)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self.rejected += 1
+            raise HistoryBufferFull()
+        self.accepted += 1
+
+    def pending_for(self, user_id: int):
+        """Events accepted for this user but not yet committed, newest first."""
+        events = self._pending.get(user_id, {}).values()
+        return sorted(events, key=lambda e: e.timestamp, reverse=True)
+
+    def discard_user(self, user_id: int):
+        """Drop a user's queued events (used when they clear their history)."""
+        self._pending.pop(user_id, None)
+
+    def _drain(self, limit):
+        batch = []
+        while len(batch) < limit and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _run(self):
+        stopping = False
+        while not stopping:
+            first = await self._queue.get()
+            if first is _STOP:
+                break
+            deadline = time.monotonic() + self.flush_interval
+            batch = [first]
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    event = await asyncio.wait_for(self._queue.get(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    break
+                if event is _STOP:
+                    stopping = True
+                    break
+                batch.append(event)
+            await self._flush(batch)
+        # Events added while stop() waited for queue space sit behind the marker
+        while not self._queue.empty():
+            await self._flush(self._drain(self.batch_size))
+
+    async def _flush(self, batch):
+        # Skip events discarded by clear_history since they were queued
+        live = [e for e in batch if self._pending.get(e.user_id, {}).get(e.tmdb_id) is e]
+        if not live:
+            return
+
+        start = time.perf_counter()
+        written = await self._write(live)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.flushes += 1
+        self.rows_flushed += written
+        self.last_flush_ms = round(elapsed_ms, 3)
+        self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+        self._total_flush_ms += elapsed_ms
+
+        for e in live:
+            self._forget(e)
+
+    def _forget(self, event):
+        """Drop `event` from the pending view, unless discard_user already did."""
+        user_events = self._pending.get(event.user_id)
+        if user_events and user_events.get(event.tmdb_id) is event:
+            del user_events[event.tmdb_id]
+            if not user_events:
+                del self._pending[event.user_id]
+
+    async def _insert(self, events):
+        params = {
+            "user_ids": [e.user_id for e in events],
+            "tmdb_ids": [e.tmdb_id for e in events],
+            "titles": [e.title for e in events],
+            "timestamps": [e.timestamp for e in events],
+        }
+        async with AsyncSessionLocal() as db:
+            await db.execute(_INSERT_MOVIES, params)
+            await db.execute(_INSERT_HISTORY, params)
+            await db.commit()
+
+    async def _write(self, events):
+        """Insert `events`, isolating and dropping rows the database rejects; returns how many were written."""
+        for attempt in range(HISTORY_FLUSH_RETRIES + 1):
+            try:
+                await self._insert(events)
+                return len(events)
+            except (IntegrityError, DataError) as e:
+                # The same rows would fail the same way again, so find the bad ones instead of retrying
+                if len(events) == 1:
+                    self._dead_letter(events, e)
+                    return 0
+                middle = len(events) // 2
+                return await self._write(events[:middle]) + await self._write(events[middle:])
+            except Exception as e:
+                # Events stay visible to reads while the database is unreachable
+                self.flush_errors += 1
+                error = e
+                logger.error(f"History flush of {len(events)} events failed (attempt {attempt + 1}): {str(e)}")
+                if attempt < HISTORY_FLUSH_RETRIES:
+                    await asyncio.sleep(RETRY_DELAY * 2 ** attempt)
+        self._dead_letter(events, error)
+        return 0
+
+    def _dead_letter(self, events, error):
+        self.dead_lettered += len(events)
+        for e in events:
+            logger.error(
+                f"Dropping history event user={e.user_id} tmdb_id={e.tmdb_id} "
+                f"at={e.timestamp.isoformat()}: {str(error)}"
+            )
+
+    def stats(self):
+        return {
+            "enabled": self.running,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "flushes": self.flushes,
+            "rows_flushed": self.rows_flushed,
+            "flush_errors": self.flush_errors,
+            "dead_lettered": self.dead_lettered,
+            "last_flush_ms": self.last_flush_ms,
+            "avg_flush_ms": round(self._total_flush_ms / self.flushes, 3) if self.flushes else None,
+            "max_flush_ms": round(self.max_flush_ms, 3),
+        }
+
+
+history_buffer = HistoryBuffer()
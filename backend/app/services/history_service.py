@@ -0,0 +1,55 @@
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# Insert the history row for a movie we already know; reports whether the movie
+# exists at all so the caller can tell "already in history" from "unknown movie"
+_ADD_FOR_EXISTING_MOVIE = text("""
+    WITH m AS (
+        SELECT id, title FROM movies WHERE tmdb_id = :tmdb_id
+    ), ins AS (
+        INSERT INTO history (user_id, movie_id, title, timestamp)
+        SELECT :user_id, m.id, m.title, now() FROM m
+        ON CONFLICT ON CONSTRAINT unique_user_movie_history DO NOTHING
+        RETURNING id
+    )
+    SELECT (SELECT count(*) FROM m) AS movie_found, (SELECT count(*) FROM ins) AS inserted
+""")
+
+# Upsert the movie and insert the history row in one statement. The no-op
+# DO UPDATE makes RETURNING yield the id even when another request created the movie first.
+_ADD_WITH_MOVIE = text("""
+    WITH m AS (
+        INSERT INTO movies (tmdb_id, title, overview)
+        VALUES (:tmdb_id, :title, :overview)
+        ON CONFLICT (tmdb_id) DO UPDATE SET title = movies.title
+        RETURNING id, title
+    ), ins AS (
+        INSERT INTO history (user_id, movie_id, title, timestamp)
+        SELECT :user_id, m.id, m.title, now() FROM m
+        ON CONFLICT ON CONSTRAINT unique_user_movie_history DO NOTHING
+        RETURNING id
+    )
+    SELECT 1 AS movie_found, (SELECT count(*) FROM ins) AS inserted
+""")
+
+
+async def add_history_entry(db: AsyncSession, user_id: int, tmdb_id: int, title: str = None, overview: str = None):
+    """
+    Add a movie to the user's history with a single statement and commit.
+
+    Returns True if it was added, False if it was already in the history, and
+    None if the movie isn't in the database yet and no title was given to create it.
+    """
+    if title is None:
+        params = {"user_id": user_id, "tmdb_id": tmdb_id}
+        row = (await db.execute(_ADD_FOR_EXISTING_MOVIE, params)).one()
+    else:
+        params = {"user_id": user_id, "tmdb_id": tmdb_id, "title": title, "overview": overview}
+        row = (await db.execute(_ADD_WITH_MOVIE, params)).one()
+
+    if not row.movie_found:
+        # Nothing was written; leave the transaction open for the follow-up insert
+        return None
+
+    await db.commit()
+    return bool(row.inserted)
@@ -0,0 +1,326 @@
+import asyncio
+import csv
+import json
+import logging
+import time
+import uuid
+from datetime import datetime, timezone
+from itertools import islice
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from app import tmdb
+from app.cache import shared_cache
+from app.database import AsyncSessionLocal
+from app.recommendations import catalog_title
+
+logger = logging.getLogger(__name__)
+
+# Rows per staging load / transaction; bounds memory for multi-million-row files
+CHUNK_SIZE = 100_000
+# Concurrent TMDB lookups when resolving movies that aren't in the local catalog
+RESOLVE_CONCURRENCY = 8
+# How long import job status stays queryable; shared across replicas when CACHE_URL is set
+JOB_TTL = 24 * 3600
+
+_CREATE_STAGING = [
+    text("""
+        CREATE TEMP TABLE import_events (
+            username text,
+            user_id integer,
+            tmdb_id integer NOT NULL,
+            ts timestamp,
+            rating double precision
+        ) ON COMMIT DROP
+    """),
+    text("""
+        CREATE TEMP TABLE import_movies (
+            tmdb_id integer PRIMARY KEY,
+            title text NOT NULL,
+            overview text
+        ) ON COMMIT DROP
+    """),
+]
+
+_RESOLVE_USERNAMES = text("""
+    UPDATE import_events e SET user_id = u.id
+    FROM users u
+    WHERE e.user_id IS NULL AND u.username = e.username
+""")
+
+_UNKNOWN_MOVIES = text("""
+    SELECT DISTINCT e.tmdb_id
+    FROM import_events e
+    LEFT JOIN movies m ON m.tmdb_id = e.tmdb_id
+    WHERE m.id IS NULL
+""")
+
+_MERGE_MOVIES = text("""
+    INSERT INTO movies (tmdb_id, title, overview)
+    SELECT tmdb_id, title, overview FROM import_movies
+    ON CONFLICT (tmdb_id) DO NOTHING
+""")
+
+# One history row per (user, movie); replays keep the latest watch time
+_MERGE_HISTORY = text("""
+    INSERT INTO history (user_id, movie_id, title, timestamp)
+    SELECT DISTINCT ON (e.user_id, m.id) e.user_id, m.id, m.title, coalesce(e.ts, now())
+    FROM import_events e
+    JOIN users u ON u.id = e.user_id
+    JOIN movies m ON m.tmdb_id = e.tmdb_id
+    ORDER BY e.user_id, m.id, e.ts DESC NULLS LAST
+    ON CONFLICT ON CONSTRAINT unique_user_movie_history
+    DO UPDATE SET timestamp = GREATEST(history.timestamp, EXCLUDED.timestamp)
+""")
+
+# The most recent rating event per (user, movie) wins
+_MERGE_RATINGS = text("""
+    INSERT INTO ratings (user_id, tmdb_id, rating, created_at)
+    SELECT DISTINCT ON (e.user_id, e.tmdb_id) e.user_id, e.tmdb_id, e.rating, coalesce(e.ts, now())
+    FROM import_events e
+    JOIN users u ON u.id = e.user_id
+    JOIN movies m ON m.tmdb_id = e.tmdb_id
+    WHERE e.rating IS NOT NULL
+    ORDER BY e.user_id, e.tmdb_id, e.ts DESC NULLS LAST
+    ON CONFLICT ON CONSTRAINT unique_user_movie_rating
+    DO UPDATE SET rating = EXCLUDED.rating
+""")
+
+_COUNT_SKIPPED = text("""
+    SELECT
+        count(*) FILTER (WHERE u.id IS NULL) AS unknown_user,
+        count(*) FILTER (WHERE u.id IS NOT NULL AND m.id IS NULL) AS unknown_movie
+    FROM import_events e
+    LEFT JOIN users u ON u.id = e.user_id
+    LEFT JOIN movies m ON m.tmdb_id = e.tmdb_id
+""")
+
+
+class ImportFormatError(ValueError):
+    """A row in the import file can't be parsed."""
+
+
+def _parse_timestamp(value):
+    if value in (None, ""):
+        return None
+    if isinstance(value, (int, float)) or str(value).replace(".", "", 1).isdigit():
+        return datetime.fromtimestamp(float(value), tz=timezone.utc).replace(tzinfo=None)
+    ts = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    # Stored as naive UTC like the rest of the history table
+    return ts.astimezone(timezone.utc).replace(tzinfo=None) if ts.tzinfo else ts
+
+
+def _to_record(event, line_no):
+    """(username, user_id, tmdb_id, ts, rating) from a parsed CSV/NDJSON row."""
+    try:
+        user = event.get("user")
+        user_id = event.get("user_id")
+        if user in (None, "") and user_id in (None, ""):
+            raise ValueError("missing user or user_id")
+        rating = event.get("rating")
+        rating = None if rating in (None, "") else float(rating)
+        if rating is not None and not (0 <= rating <= 5):
+            raise ValueError("rating must be between 0 and 5")
+        return (
+            None if user in (None, "") else str(user),
+            None if user_id in (None, "") else int(user_id),
+            int(event["tmdb_id"]),
+            _parse_timestamp(event.get("timestamp")),
+            rating,
+        )
+    except (KeyError, TypeError, ValueError) as e:
+        raise ImportFormatError(f"line {line_no}: {e}")
+
+
+def parse_lines(lines, fmt):
+    """
+    Yield staging records from an iterable of text lines.
+
+    CSV needs a header with tmdb_id and user (username) or user_id, plus
+    optional timestamp (ISO 8601 or epoch seconds) and rating columns.
+    NDJSON takes one object per line with the same keys.
+    """
+    if fmt == "csv":
+        for line_no, row in enumerate(csv.DictReader(lines), 2):
+            yield _to_record(row, line_no)
+    elif fmt == "ndjson":
+        for line_no, line in enumerate(lines, 1):
+            if line.strip():
+                try:
+                    event = json.loads(line)
+                except ValueError as e:
+                    raise ImportFormatError(f"line {line_no}: {e}")
+                yield _to_record(event, line_no)
+    else:
+        raise ImportFormatError(f"unsupported format: {fmt}")
+
+
+def _resolve_from_tmdb(tmdb_id):
+    try:
+        response = tmdb.get(f"/movie/{tmdb_id}", priority=tmdb.PRIORITY_BACKGROUND)
+    except tmdb.TMDBUnavailable:
+        return None
+    if response.status_code != 200:
+        return None
+    data = response.json()
+    return (tmdb_id, data.get("title", "Unknown Title"), data.get("overview", ""))
+
+
+async def _resolve_movies(tmdb_ids):
+    """Titles for movies missing from the database: local catalog first, then TMDB in bounded batches."""
+    resolved = []
+    remote = []
+    for tmdb_id in tmdb_ids:
+        title = catalog_title(tmdb_id)
+        if title is not None:
+            resolved.append((tmdb_id, title, None))
+        else:
+            remote.append(tmdb_id)
+
+    for i in range(0, len(remote), RESOLVE_CONCURRENCY):
+        batch = remote[i:i + RESOLVE_CONCURRENCY]
+        results = await asyncio.gather(*(run_in_threadpool(_resolve_from_tmdb, t) for t in batch))
+        resolved.extend(r for r in results if r is not None)
+    return resolved
+
+
+async def _load_chunk(db: AsyncSession, records, stats):
+    for statement in _CREATE_STAGING:
+        await db.execute(statement)
+
+    # COPY straight into the staging table through the asyncpg connection
+    connection = await db.connection()
+    raw = (await connection.get_raw_connection()).driver_connection
+    await raw.copy_records_to_table(
+        "import_events",
+        records=records,
+        columns=["username", "user_id", "tmdb_id", "ts", "rating"],
+    )
+
+    await db.execute(_RESOLVE_USERNAMES)
+    unknown = [row.tmdb_id for row in (await db.execute(_UNKNOWN_MOVIES)).all()]
+    if unknown:
+        movies = await _resolve_movies(unknown)
+        if movies:
+            await raw.copy_records_to_table(
+                "import_movies", records=movies, columns=["tmdb_id", "title", "overview"]
+            )
+            stats["movies_created"] += (await db.execute(_MERGE_MOVIES)).rowcount
+
+    stats["history_upserted"] += (await db.execute(_MERGE_HISTORY)).rowcount
+    stats["ratings_upserted"] += (await db.execute(_MERGE_RATINGS)).rowcount
+    skipped = (await db.execute(_COUNT_SKIPPED)).one()
+    stats["skipped_unknown_user"] += skipped.unknown_user
+    stats["skipped_unknown_movie"] += skipped.unknown_movie
+    await db.commit()
+
+
+def _take(records, n):
+    return list(islice(records, n))
+
+
+async def import_events(db: AsyncSession, records, chunk_size: int = CHUNK_SIZE, progress=None):
+    """
+    Bulk-load (user, tmdb_id, timestamp, rating) events.
+
+    Each chunk is COPYed into temp staging tables, unknown movies are resolved
+    and created in one batch, then history and ratings are merged with
+    set-based upserts and committed. Records are read and parsed in the
+    threadpool, off the event loop. `progress(stats)` is awaited after every
+    chunk. Returns counters and throughput.
+    """
+    stats = {
+        "rows": 0,
+        "movies_created": 0,
+        "history_upserted": 0,
+        "ratings_upserted": 0,
+        "skipped_unknown_user": 0,
+        "skipped_unknown_movie": 0,
+    }
+    start = time.perf_counter()
+    records = iter(records)
+    while True:
+        chunk = await run_in_threadpool(_take, records, chunk_size)
+        if not chunk:
+            break
+        await _load_chunk(db, chunk, stats)
+        stats["rows"] += len(chunk)
+        _throughput(stats, start)
+        if progress is not None:
+            await progress(stats)
+
+    _throughput(stats, start)
+    return stats
+
+
+def _throughput(stats, start):
+    elapsed = time.perf_counter() - start
+    stats["seconds"] = round(elapsed, 3)
+    stats["rows_per_sec"] = round(stats["rows"] / elapsed, 1) if elapsed > 0 else None
+
+
+_jobs = shared_cache("import_jobs", JOB_TTL, 256)
+# Running import tasks, referenced so they aren't garbage collected mid-run
+_tasks = set()
+
+
+async def start_import(file, fmt):
+    """
+    Import an uploaded file (binary, positioned at the start) in the background.
+
+    Returns the job: poll get_import(job["id"]) for status, row counts and
+    rows/sec. The file is closed when the job ends.
+    """
+    job = {
+        "id": uuid.uuid4().hex,
+        "status": "queued",
+        "format": fmt,
+        "created_at": datetime.utcnow(),
+        "started_at": None,
+        "finished_at": None,
+        "stats": None,
+        "error": None,
+    }
+    await _jobs.aset(job["id"], dict(job))
+    task = asyncio.create_task(_run_import(job, file))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+    return dict(job)
+
+
+async def get_import(job_id: str):
+    return await _jobs.aget(job_id)
+
+
+async def _run_import(job, file):
+    async def save(**changes):
+        job.update(changes)
+        await _jobs.aset(job["id"], dict(job))
+
+    try:
+        await save(status="running", started_at=datetime.utcnow())
+        lines = (line.decode("utf-8") for line in file)
+        async with AsyncSessionLocal() as db:
+            stats = await import_events(
+                db, parse_lines(lines, job["format"]), progress=lambda s: save(stats=dict(s))
+            )
+        await save(status="succeeded", stats=stats, finished_at=datetime.utcnow())
+        logger.info(f"Import {job['id']} finished: {stats['rows']} rows at {stats['rows_per_sec']} rows/sec")
+    except ImportFormatError as e:
+        # Chunks before the bad row are already committed
+        await save(status="failed", error=str(e), finished_at=datetime.utcnow())
+    except asyncio.CancelledError:
+        await save(status="failed", error="Interrupted by shutdown", finished_at=datetime.utcnow())
+        raise
+    except Exception as e:
+        logger.error(f"Import {job['id']} failed: {str(e)}", exc_info=e)
+        await save(status="failed", error="Import failed, see server logs", finished_at=datetime.utcnow())
+    finally:
+        await run_in_threadpool(file.close)
+
+
+async def stop_imports():
+    """Cancel running imports on shutdown; their jobs are marked failed."""
+    for task in list(_tasks):
+        task.cancel()
+    await asyncio.gather(*_tasks, return_exceptions=True)
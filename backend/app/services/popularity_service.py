@@ -0,0 +1,194 @@
+import hashlib
+import logging
+import math
+import time
+from datetime import datetime
+import numpy as np
+from sqlalchemy import text
+from app.config import (
+    POPULARITY_HALF_LIFE_DAYS,
+    POPULARITY_ENGAGEMENT_WEIGHT,
+    POPULARITY_REFRESH_INTERVAL,
+    POPULAR_LIST_SIZE,
+)
+from app.database import AsyncSessionLocal
+from app.recommendations import movies, movie_meta, movie_details, row_for_tmdb_id, MODEL_VERSION
+from app.scheduler import scheduler, IntervalTrigger
+
+logger = logging.getLogger(__name__)
+
+# Watches newer than the watermark, each weighted by exp(-age / tau) at :now. The exponent is
+# capped because exp() below about -745 underflows, which PostgreSQL raises as an error
+# (history backfilled to 'epoch', imports of old events)
+_HISTORY_SINCE = text("""
+    SELECT m.tmdb_id,
+           sum(exp(-LEAST(
+               GREATEST(extract(epoch FROM (CAST(:now AS timestamp) - h.timestamp)), 0)
+               / CAST(:tau AS double precision),
+               CAST(:max_decay AS double precision)
+           ))) AS weight,
+           max(h.id) AS max_id
+    FROM history h
+    JOIN movies m ON m.id = h.movie_id
+    WHERE h.id > :after
+    GROUP BY m.tmdb_id
+""")
+
+# Ratings newer than the watermark, scaled by their stars and decayed like watches.
+# Re-rating updates the row in place (same id), so a changed star value is only
+# picked up by the next full rebuild, at most FULL_REBUILD_EVERY refreshes later.
+_RATINGS_SINCE = text("""
+    SELECT tmdb_id,
+           sum(rating / 5.0 * exp(-LEAST(
+               GREATEST(extract(epoch FROM (CAST(:now AS timestamp) - created_at)), 0)
+               / CAST(:tau AS double precision),
+               CAST(:max_decay AS double precision)
+           ))) AS weight,
+           max(id) AS max_id
+    FROM ratings
+    WHERE id > :after
+    GROUP BY tmdb_id
+""")
+
+# Incremental refreshes miss deletes, re-ratings and late commits; rebuild from scratch every this many
+FULL_REBUILD_EVERY = 60
+# Largest decay exponent passed to exp(); exp(-700) is ~1e-304, effectively zero weight
+MAX_DECAY_EXPONENT = 700.0
+
+
+def _log_scale(values):
+    """log1p-compress and scale to [0, 1] so a few blockbusters don't flatten the rest."""
+    scaled = np.log1p(np.maximum(values, 0.0))
+    top = scaled.max() if len(scaled) else 0.0
+    return scaled / top if top > 0 else scaled
+
+
+class PopularityService:
+    """
+    Catalog-wide popularity ranking served from memory.
+
+    Each refresh decays per-movie engagement (history and ratings) by the time
+    since the last refresh and adds only events past the id watermarks, then
+    blends it with the dataset's TMDB popularity and rebuilds a ready-to-serve
+    top list. Until the first refresh the ranking is dataset popularity alone.
+    """
+
+    def __init__(self, half_life_days=POPULARITY_HALF_LIFE_DAYS, engagement_weight=POPULARITY_ENGAGEMENT_WEIGHT,
+                 list_size=POPULAR_LIST_SIZE):
+        self.tau = half_life_days * 86400 / math.log(2)
+        self.engagement_weight = engagement_weight
+        self.list_size = list_size
+        self._dataset = _log_scale(np.array(
+            [movie_meta.get(mid, {}).get("popularity") or 0.0 for mid in movies["movie_id"]], dtype=np.float64
+        ))
+        self._engagement = np.zeros(len(movies), dtype=np.float64)
+        self._as_of = None
+        self._history_after = 0
+        self._ratings_after = 0
+        self.refreshes = 0
+        self.last_refresh_ms = None
+        self.last_refresh_at = None
+        self.events_applied = 0
+        self._ranked = []
+        self._publish()
+
+    def _publish(self):
+        scores = (1 - self.engagement_weight) * self._dataset + self.engagement_weight * _log_scale(self._engagement)
+        n = min(self.list_size, len(scores))
+        if n == 0:
+            self._ranked = []
+            self.version = MODEL_VERSION
+            return
+        top = np.argpartition(-scores, n - 1)[:n]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        ranked = []
+        for row in top:
+            movie = movie_details(movies["movie_id"].iat[row])
+            movie["popularity_score"] = round(float(scores[row]), 4)
+            ranked.append(movie)
+        # Swap in one assignment so readers never see a half-built list
+        self._ranked = ranked
+        # Changes only when the order does; display fields come from the model files (MODEL_VERSION)
+        self.version = hashlib.blake2b(
+            MODEL_VERSION.encode() + movies["movie_id"].to_numpy()[top].astype(np.int64).tobytes(), digest_size=8
+        ).hexdigest()
+
+    def top(self, limit=20, exclude=None):
+        """Most popular catalog movies (shared payload dicts; don't mutate), skipping tmdb ids in `exclude`."""
+        if not exclude:
+            return self._ranked[:limit]
+        result = []
+        for movie in self._ranked:
+            if movie["id"] not in exclude:
+                result.append(movie)
+                if len(result) >= limit:
+                    break
+        return result
+
+    def _apply(self, rows):
+        applied = 0
+        for tmdb_id, weight, _ in rows:
+            row = row_for_tmdb_id(tmdb_id)
+            if row is not None:
+                self._engagement[row] += float(weight)
+                applied += 1
+        return applied
+
+    async def refresh(self, full=False):
+        start = time.perf_counter()
+        now = datetime.utcnow()
+        if full or self._as_of is None:
+            engagement = np.zeros_like(self._engagement)
+            history_after = ratings_after = 0
+        else:
+            elapsed = (now - self._as_of).total_seconds()
+            engagement = self._engagement * math.exp(-max(elapsed, 0.0) / self.tau)
+            history_after, ratings_after = self._history_after, self._ratings_after
+
+        async with AsyncSessionLocal() as db:
+            history = (await db.execute(
+                _HISTORY_SINCE, {"now": now, "tau": self.tau, "max_decay": MAX_DECAY_EXPONENT, "after": history_after}
+            )).all()
+            ratings = (await db.execute(
+                _RATINGS_SINCE, {"now": now, "tau": self.tau, "max_decay": MAX_DECAY_EXPONENT, "after": ratings_after}
+            )).all()
+
+        self._engagement = engagement
+        self.events_applied += self._apply(history) + self._apply(ratings)
+        self._history_after = max([history_after] + [r.max_id for r in history])
+        self._ratings_after = max([ratings_after] + [r.max_id for r in ratings])
+        self._as_of = now
+        self._publish()
+
+        self.refreshes += 1
+        self.last_refresh_at = now
+        self.last_refresh_ms = round((time.perf_counter() - start) * 1000, 3)
+
+    async def scheduled_refresh(self):
+        """Scheduler job; on failure the previous ranking keeps being served."""
+        await self.refresh(full=self.refreshes % FULL_REBUILD_EVERY == 0)
+
+    def stats(self):
+        return {
+            "refreshes": self.refreshes,
+            "last_refresh_at": self.last_refresh_at.isoformat() if self.last_refresh_at else None,
+            "last_refresh_ms": self.last_refresh_ms,
+            "events_applied": self.events_applied,
+            "history_watermark": self._history_after,
+            "ratings_watermark": self._ratings_after,
+            "ranked": len(self._ranked),
+            "version": self.version,
+        }
+
+
+popularity = PopularityService()
+# Every process serves its own in-memory ranking, so every process refreshes it
+scheduler.add(
+    "popularity.refresh",
+    popularity.scheduled_refresh,
+    IntervalTrigger(POPULARITY_REFRESH_INTERVAL),
+    jitter=POPULARITY_REFRESH_INTERVAL * 0.1,
+    max_runtime=max(POPULARITY_REFRESH_INTERVAL, 60),
+    leader_only=False,
+    run_at_start=True,
+)
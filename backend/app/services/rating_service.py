@@ -0,0 +1,46 @@
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# Insert or update the rating, but only if the movie is already known
+_UPSERT_FOR_EXISTING_MOVIE = text("""
+    INSERT INTO ratings (user_id, tmdb_id, rating)
+    SELECT :user_id, :tmdb_id, :rating
+    WHERE EXISTS (SELECT 1 FROM movies WHERE tmdb_id = :tmdb_id)
+    ON CONFLICT ON CONSTRAINT unique_user_movie_rating DO UPDATE SET rating = EXCLUDED.rating
+    RETURNING id
+""")
+
+# Create the movie if needed and upsert the rating in one statement
+_UPSERT_WITH_MOVIE = text("""
+    WITH m AS (
+        INSERT INTO movies (tmdb_id, title, overview)
+        VALUES (:tmdb_id, :title, :overview)
+        ON CONFLICT (tmdb_id) DO NOTHING
+    )
+    INSERT INTO ratings (user_id, tmdb_id, rating)
+    VALUES (:user_id, :tmdb_id, :rating)
+    ON CONFLICT ON CONSTRAINT unique_user_movie_rating DO UPDATE SET rating = EXCLUDED.rating
+    RETURNING id
+""")
+
+
+async def upsert_rating(db: AsyncSession, user_id: int, tmdb_id: int, rating: float, title: str = None, overview: str = None):
+    """
+    Set the user's rating for a movie with a single statement and commit.
+
+    Returns False (and writes nothing) if the movie isn't in the database yet
+    and no title was given to create it.
+    """
+    params = {"user_id": user_id, "tmdb_id": tmdb_id, "rating": rating}
+    if title is None:
+        row = (await db.execute(_UPSERT_FOR_EXISTING_MOVIE, params)).first()
+    else:
+        params.update(title=title, overview=overview)
+        row = (await db.execute(_UPSERT_WITH_MOVIE, params)).first()
+
+    if row is None:
+        # Nothing was written; leave the transaction open for the follow-up insert
+        return False
+
+    await db.commit()
+    return True
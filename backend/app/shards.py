@@ -0,0 +1,372 @@
+"""
+Sharded similarity index for catalogs too large to scan in one process.
+
+The model's similarity matrix is split by columns (candidate movies) into
+contiguous slabs. Each slab holds every movie's similarity to that shard's
+candidates, so one query row is a contiguous read. A query scatters to
+every shard, each returns its local top-k as (score, row) pairs, and the
+sorted lists are merged with a heap. Per-query work and memory per process
+both shrink with the shard count, so more cores mean more catalog capacity.
+
+Slabs are .npy files opened with mmap. Every process on a host that maps the
+same shard (one per app worker) shares the page cache instead of holding its
+own copy. Build them with `python -m app.build_shards --shards 4`.
+
+A shard is anything with send(op, *args), which returns a Future of
+(status, value), and close(). ProcessShard talks to a dedicated worker
+process over a pipe, and LocalShard runs in the caller's thread. A shard on
+another host only needs the same two methods.
+
+This module only imports numpy, since shard worker processes import it.
+"""
+import heapq
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from itertools import islice
+from pathlib import Path
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = "manifest.json"
+BUILD_CHUNK_ROWS = 2048  # matrix rows copied per step while writing slabs
+STUCK_AFTER = 30.0  # seconds without a reply, with requests waiting, before a worker is replaced
+
+
+class ShardsUnavailable(Exception):
+    """No shard answered a query in time."""
+
+
+def _top(scores, k, offset, candidates=None):
+    """[(score, row + offset)] for the k best of `candidates` (default: all), best first, ties by row."""
+    if k <= 0:
+        return []
+    if candidates is None:
+        candidates = np.arange(len(scores))
+    if len(candidates) > k:
+        candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+    candidates = candidates[np.lexsort((candidates, -scores[candidates]))]
+    return [(float(scores[i]), int(i) + offset) for i in candidates]
+
+
+def _rank(hit):
+    return -hit[0], hit[1]
+
+
+def merge(results, k):
+    """Merge per-shard best-first lists into the overall top k."""
+    return list(islice(heapq.merge(*results, key=_rank), k))
+
+
+class ShardData:
+    """One slab: similarities of every row to candidate rows [start, stop)."""
+
+    def __init__(self, path, start, stop):
+        self.slab = np.load(path, mmap_mode="r")
+        self.start = start
+        self.stop = stop
+
+    def ready(self):
+        return os.getpid()
+
+    def similar(self, row, k):
+        return _top(np.asarray(self.slab[row], dtype=np.float64), k, self.start)
+
+    def profile(self, rows, weights, total, boosts, banned, k):
+        """Local top-k for a profile; mirrors recommend_for_profile over this shard's candidates."""
+        scores = np.zeros(self.stop - self.start, dtype=np.float64)
+        for row, weight in zip(rows, weights):
+            scores += weight * self.slab[row]
+        if total:
+            scores /= total
+        for row, boost in boosts:
+            if self.start <= row < self.stop:
+                scores[row - self.start] += boost
+        local = [row - self.start for row in banned if self.start <= row < self.stop]
+        scores[local] = -np.inf
+        return _top(scores, k, self.start, np.flatnonzero(scores > 0))
+
+
+def _serve(conn, path, start, stop):
+    """Shard worker process: answer (ticket, op, args) messages with (ticket, status, value) until the pipe closes."""
+    data = ShardData(path, start, stop)
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            return
+        if message is None:
+            return
+        ticket, op, args = message
+        try:
+            conn.send((ticket, "ok", getattr(data, op)(*args)))
+        except Exception as e:
+            conn.send((ticket, "error", repr(e)))
+
+
+def _reply(future, deadline):
+    """A shard's answer, waiting until `deadline` (time.monotonic()); raises OSError/EOFError when there is none."""
+    try:
+        status, value = future.result(timeout=max(0.0, deadline - time.monotonic()))
+    except FutureTimeout:
+        future.cancel()
+        raise TimeoutError("Shard missed its deadline")
+    if status == "error":
+        raise RuntimeError(value)
+    return value
+
+
+class LocalShard:
+    """Shard scanned in the calling thread (single-process setups and the benchmarks)."""
+
+    def __init__(self, path, start, stop):
+        self.data = ShardData(path, start, stop)
+        self.restarts = 0
+
+    def send(self, op, *args):
+        future = Future()
+        try:
+            future.set_result(("ok", getattr(self.data, op)(*args)))
+        except Exception as e:
+            future.set_result(("error", repr(e)))
+        return future
+
+    def close(self):
+        pass
+
+
+class _Worker:
+    """One spawned shard process, its pipe, and the requests waiting on it by ticket."""
+
+    def __init__(self, process, conn):
+        self.process = process
+        self.conn = conn
+        self.pending = {}
+        self.alive = True
+        self.last_reply = time.monotonic()
+
+    def stuck(self):
+        return bool(self.pending) and time.monotonic() - self.last_reply > STUCK_AFTER
+
+
+class ProcessShard:
+    """
+    Shard pinned to its own worker process, reached over a pipe. Workers are
+    spawned rather than forked, since the app process has threads.
+
+    Requests carry a ticket and a reader thread hands each reply to the
+    request with the same ticket, so queries from many threads overlap in the
+    pipe instead of taking turns. A reply that arrives after its deadline is
+    dropped. A worker that died, or hasn't replied for STUCK_AFTER seconds
+    while requests wait, is replaced on the next query.
+    """
+
+    def __init__(self, path, start, stop):
+        self.args = (str(path), start, stop)
+        self._worker = None
+        self._lock = threading.Lock()
+        self._tickets = itertools.count()
+        self.restarts = 0
+
+    def _ensure_running(self):
+        worker = self._worker
+        if worker is not None and worker.alive and worker.process.is_alive() and not worker.stuck():
+            return worker
+        if worker is not None:
+            # Died or hung; its reader thread fails whatever was still waiting on it
+            self._stop(worker)
+            self.restarts += 1
+        context = multiprocessing.get_context("spawn")
+        conn, child = context.Pipe()
+        process = context.Process(target=_serve, args=(child, *self.args), name=f"shard-{self.args[1]}", daemon=True)
+        process.start()
+        child.close()
+        worker = self._worker = _Worker(process, conn)
+        threading.Thread(target=self._read, args=(worker,), name=f"shard-{self.args[1]}-reader", daemon=True).start()
+        return worker
+
+    def _read(self, worker):
+        while True:
+            try:
+                ticket, status, value = worker.conn.recv()
+            except (EOFError, OSError):
+                break
+            worker.last_reply = time.monotonic()
+            future = worker.pending.pop(ticket, None)
+            if future is not None and not future.cancelled():
+                future.set_result((status, value))
+        # Under the send lock, so no request can be registered on this worker after the sweep
+        with self._lock:
+            worker.alive = False
+            pending, worker.pending = worker.pending, {}
+        for future in pending.values():
+            if not future.cancelled():
+                future.set_exception(EOFError(f"Shard worker {self.args[0]} exited"))
+
+    def send(self, op, *args):
+        """Queue a query on the worker; returns a Future of (status, value)."""
+        future = Future()
+        with self._lock:
+            worker = self._ensure_running()
+            ticket = next(self._tickets)
+            worker.pending[ticket] = future
+            try:
+                worker.conn.send((ticket, op, args))
+            except OSError:
+                worker.pending.pop(ticket, None)
+                raise
+        return future
+
+    def _stop(self, worker):
+        worker.conn.close()
+        worker.process.terminate()
+        worker.process.join(timeout=1)
+
+    def close(self):
+        with self._lock:
+            worker, self._worker = self._worker, None
+        if worker is not None:
+            try:
+                worker.conn.send(None)
+                worker.process.join(timeout=1)
+            except OSError:
+                pass
+            self._stop(worker)
+
+
+class ShardedIndex:
+    """
+    Scatter-gather top-k over the shards listed in a directory's manifest.
+
+    Queries from different threads run at the same time: each shard worker
+    answers its requests in order, so while one query is merging, the next
+    is already being scanned. More shards (and cores) add capacity.
+    """
+
+    def __init__(self, directory, processes=True, timeout=2.0):
+        self.directory = Path(directory)
+        manifest = json.loads((self.directory / MANIFEST).read_text())
+        self.rows = manifest["rows"]
+        self.source = manifest.get("source")
+        shard_class = ProcessShard if processes else LocalShard
+        self.shards = [
+            shard_class(self.directory / shard["file"], shard["start"], shard["stop"])
+            for shard in manifest["shards"]
+        ]
+        self.timeout = timeout
+        self._stats_lock = threading.Lock()
+        self.in_flight = 0
+        self.queries = 0
+        self.partial = 0
+        self.shard_failures = 0
+
+    def __len__(self):
+        return len(self.shards)
+
+    def warm(self, timeout=60.0):
+        """Start every shard and wait until its slab is mapped, so the first queries don't pay for it."""
+        futures = [shard.send("ready") for shard in self.shards]
+        deadline = time.monotonic() + timeout
+        return [_reply(future, deadline) for future in futures]
+
+    def _scatter(self, op, args, k):
+        with self._stats_lock:
+            self.in_flight += 1
+        results, futures, failed = [], [], 0
+        try:
+            for shard in self.shards:
+                try:
+                    futures.append(shard.send(op, *args))
+                except OSError:
+                    failed += 1
+            deadline = time.monotonic() + self.timeout
+            for future in futures:
+                try:
+                    results.append(_reply(future, deadline))
+                except RuntimeError as e:
+                    failed += 1
+                    logger.error("Shard query failed: %s", e)
+                except (OSError, EOFError):
+                    # Missed the deadline (TimeoutError is an OSError) or the worker died
+                    failed += 1
+        finally:
+            with self._stats_lock:
+                self.in_flight -= 1
+                self.queries += 1
+                if failed:
+                    self.partial += 1
+                    self.shard_failures += failed
+        if not results:
+            raise ShardsUnavailable(f"None of {len(self.shards)} shards answered within {self.timeout}s")
+        if failed:
+            logger.warning("%d of %d shards did not answer; returning partial results", failed, len(self.shards))
+        return merge(results, k)
+
+    def similar(self, row, k):
+        """[(score, row)] of the k rows most similar to `row` (itself included), best first."""
+        return self._scatter("similar", (row, k), k)
+
+    def profile(self, rows, weights, total, boosts, banned, k):
+        """
+        [(score, row)] for the weighted mean of `rows`' similarities plus
+        (row, boost) pairs, without `banned` rows or non-positive scores.
+        """
+        return self._scatter("profile", (list(rows), list(weights), total, list(boosts), list(banned), k), k)
+
+    def close(self):
+        for shard in self.shards:
+            shard.close()
+
+    def stats(self):
+        return {
+            "shards": len(self.shards),
+            "rows": self.rows,
+            "in_flight": self.in_flight,
+            "queries": self.queries,
+            "partial_results": self.partial,
+            "shard_failures": self.shard_failures,
+            "worker_restarts": sum(shard.restarts for shard in self.shards),
+        }
+
+
+def build(simi, out_dir, n_shards, dtype=None, source=None):
+    """
+    Write `simi` (N x N, an ndarray or anything whose [row] is a vector) as
+    `n_shards` column slabs plus a manifest. Returns the manifest.
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    n = len(simi)
+    if not 0 < n_shards <= n:
+        raise ValueError(f"Shard count must be between 1 and the {n} catalog rows")
+    dense = isinstance(simi, np.ndarray)
+    dtype = np.dtype(dtype or (simi.dtype if dense else np.float32))
+    bounds = [int(b) for b in np.linspace(0, n, n_shards + 1)]
+
+    shards = []
+    for i, (start, stop) in enumerate(zip(bounds[:-1], bounds[1:])):
+        name = f"shard-{i}-of-{n_shards}.npy"
+        slab = np.lib.format.open_memmap(out_dir / name, mode="w+", dtype=dtype, shape=(n, stop - start))
+        started = time.perf_counter()
+        for first in range(0, n, BUILD_CHUNK_ROWS):
+            last = min(n, first + BUILD_CHUNK_ROWS)
+            if dense:
+                slab[first:last] = simi[first:last, start:stop]
+            else:
+                slab[first:last] = np.stack([np.asarray(simi[r])[start:stop] for r in range(first, last)])
+        slab.flush()
+        del slab
+        logger.info("Wrote %s (%d columns) in %.1fs", name, stop - start, time.perf_counter() - started)
+        shards.append({"file": name, "start": start, "stop": stop})
+
+    manifest = {"rows": n, "dtype": dtype.name, "source": source, "shards": shards}
+    tmp = out_dir / (MANIFEST + ".tmp")
+    tmp.write_text(json.dumps(manifest, indent=2))
+    os.replace(tmp, out_dir / MANIFEST)
+    return manifest
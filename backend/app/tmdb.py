@@ -0,0 +1,427 @@
+import heapq
+import itertools
+import random
+import re
+import threading
+import time
+from collections import OrderedDict
+import requests
+from app.config import (
+    TMDB_API_KEY,
+    TMDB_BASE_URL,
+    TMDB_RATE_LIMIT,
+    TMDB_BURST,
+    TMDB_TIMEOUT,
+    TMDB_QUEUE_TIMEOUT,
+    TMDB_MAX_RETRIES,
+    TMDB_INTERACTIVE_RETRIES,
+    TMDB_DEADLINE,
+    TMDB_BACKGROUND_DEADLINE,
+    TMDB_BREAKER_THRESHOLD,
+    TMDB_BREAKER_COOLDOWN,
+    TMDB_CACHE_TTL,
+    TMDB_CACHE_SIZE,
+)
+from app import tracing
+from app.cache import shared_cache
+from app.metrics import TMDB_REQUEST_SECONDS
+
+# Request priorities: lower runs first when calls are queued on the rate limit
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 1
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_BACKOFF = 8.0
+STALE_CACHE_SIZE = 2048
+
+# "/movie/550" -> "/movie/{id}" for the latency metric's endpoint label
+_ID_SEGMENT = re.compile(r"/\d+(?=/|$)")
+
+# Shared session so concurrent calls reuse pooled connections to TMDB
+_session = requests.Session()
+
+
+class TMDBUnavailable(Exception):
+    """TMDB is rate limiting us, failing, or the circuit breaker is open."""
+
+    def __init__(self, message="TMDB is temporarily unavailable", retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class _Call:
+    """A single upstream TMDB call that other identical requests can wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.response = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent identical requests into one upstream call.
+
+    The first caller for a key does the work; every caller that arrives while
+    it is still running waits for it and receives the same result.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.requests = 0
+        self.upstream_calls = 0
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            self.requests += 1
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.coalesced += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self.upstream_calls += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+        else:
+            try:
+                call.response = fn()
+            except Exception as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    self._calls.pop(key, None)
+                call.done.set()
+
+        if call.error is not None:
+            raise call.error
+        return call.response
+
+    def stats(self):
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "upstream_calls": self.upstream_calls,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._calls),
+            }
+
+
+class TokenBucket:
+    """
+    Requests-per-second budget with a priority queue for callers that have to wait.
+
+    Tokens refill continuously at `rate` up to `burst`. Waiting callers are
+    served strictly by (priority, arrival order), so interactive requests jump
+    ahead of background refreshes.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._cond = threading.Condition()
+        self._waiting = []
+        self._seq = itertools.count()
+        self.rejected = 0
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, priority=PRIORITY_INTERACTIVE, timeout=None):
+        """Take one token, waiting at most `timeout` seconds. Returns False on timeout."""
+        if self.rate <= 0:
+            return True
+        deadline = None if timeout is None else time.monotonic() + timeout
+        entry = (priority, next(self._seq))
+        with self._cond:
+            heapq.heappush(self._waiting, entry)
+            try:
+                while True:
+                    self._refill()
+                    if self._waiting[0] == entry and self._tokens >= 1:
+                        self._tokens -= 1
+                        return True
+                    wait = (1 - self._tokens) / self.rate if self._tokens < 1 else None
+                    if deadline is not None:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self.rejected += 1
+                            return False
+                        wait = remaining if wait is None else min(wait, remaining)
+                    self._cond.wait(wait)
+            finally:
+                self._waiting.remove(entry)
+                heapq.heapify(self._waiting)
+                self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            self._refill()
+            return {
+                "tokens": round(self._tokens, 2),
+                "queued": len(self._waiting),
+                "rejected": self.rejected,
+            }
+
+
+class CircuitBreaker:
+    """
+    Trip open after `threshold` consecutive failures and fail fast for `cooldown` seconds.
+
+    After the cooldown one trial call is let through (half-open); success closes
+    the breaker, failure opens it again.
+    """
+
+    def __init__(self, threshold, cooldown):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+        self._trial_thread = None
+        self.short_circuited = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.cooldown:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        with self._lock:
+            state = self._state()
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._trial_running:
+                self._trial_running = True
+                self._trial_thread = threading.get_ident()
+                return True
+            self.short_circuited += 1
+            return False
+
+    def retry_after(self):
+        with self._lock:
+            if self._opened_at is None:
+                return None
+            return max(0.0, self.cooldown - (time.monotonic() - self._opened_at))
+
+    def release(self):
+        """Give back a trial slot this thread took but never reported on (e.g. no rate-limit token)."""
+        with self._lock:
+            if self._trial_running and self._trial_thread == threading.get_ident():
+                self._trial_running = False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_running = False
+            if self._opened_at is not None or self._failures >= self.threshold:
+                self._opened_at = time.monotonic()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "state": self._state(),
+                "consecutive_failures": self._failures,
+                "short_circuited": self.short_circuited,
+            }
+
+
+class _StaleCache:
+    """Last good response per request key, used as a degraded answer when TMDB is down."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._items = OrderedDict()
+        self.served = 0
+
+    def put(self, key, response):
+        with self._lock:
+            self._items[key] = response
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def get(self, key):
+        with self._lock:
+            response = self._items.get(key)
+            if response is not None:
+                self._items.move_to_end(key)
+                self.served += 1
+            return response
+
+
+_flight = SingleFlight()
+_bucket = TokenBucket(TMDB_RATE_LIMIT, TMDB_BURST)
+_breaker = CircuitBreaker(TMDB_BREAKER_THRESHOLD, TMDB_BREAKER_COOLDOWN)
+_stale = _StaleCache(STALE_CACHE_SIZE)
+# Successful response bodies by request key; with CACHE_URL set, one replica's fetch serves the whole fleet
+_responses = shared_cache("tmdb", TMDB_CACHE_TTL, TMDB_CACHE_SIZE)
+
+
+def _normalize(path, params):
+    """Build the coalescing key: the endpoint path plus sorted params, without the API key."""
+    items = tuple(sorted(
+        (str(k), str(v)) for k, v in (params or {}).items() if k != "api_key"
+    ))
+    return ("/" + path.strip("/"), items)
+
+
+def _cache_key(key):
+    return key[0] + "?" + "&".join(f"{k}={v}" for k, v in key[1])
+
+
+def _cached_response(entry):
+    """Rebuild a requests.Response from a cached (body, content type) pair."""
+    content, content_type = entry
+    response = requests.Response()
+    response.status_code = 200
+    response._content = content
+    response.encoding = "utf-8"
+    if content_type:
+        response.headers["Content-Type"] = content_type
+    return response
+
+
+def _backoff(attempt, response=None):
+    """Jittered exponential backoff, honoring Retry-After when TMDB sends one."""
+    if response is not None:
+        retry_after = response.headers.get("Retry-After")
+        if retry_after:
+            try:
+                return min(MAX_BACKOFF, float(retry_after)) + random.uniform(0, 0.25)
+            except ValueError:
+                pass
+    return random.uniform(0, min(MAX_BACKOFF, 0.25 * (2 ** attempt)))
+
+
+def _degraded(key, message):
+    response = _stale.get(key)
+    if response is not None:
+        return response
+    raise TMDBUnavailable(message, retry_after=_breaker.retry_after())
+
+
+def _fetch(key, query, priority):
+    if not _breaker.allow():
+        return _degraded(key, "TMDB circuit breaker is open")
+    try:
+        return _attempt(key, query, priority)
+    finally:
+        # A half-open trial that ended without a verdict must not keep the breaker shut
+        _breaker.release()
+
+
+def _attempt(key, query, priority):
+    # Interactive calls get fewer retries and a tighter overall deadline, so a request thread is held for seconds at most
+    if priority == PRIORITY_INTERACTIVE:
+        retries = min(TMDB_MAX_RETRIES, TMDB_INTERACTIVE_RETRIES)
+        deadline = time.monotonic() + TMDB_DEADLINE
+    else:
+        retries = TMDB_MAX_RETRIES
+        deadline = time.monotonic() + TMDB_BACKGROUND_DEADLINE
+
+    url = f"{TMDB_BASE_URL}{key[0]}"
+    endpoint = _ID_SEGMENT.sub("/{id}", key[0])
+    response = None
+    for attempt in range(retries + 1):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        if not _bucket.acquire(priority, timeout=min(TMDB_QUEUE_TIMEOUT, remaining)):
+            # Rate limit queue is saturated; this is our budget, not TMDB health
+            return _degraded(key, "TMDB request budget exhausted")
+        start = time.perf_counter()
+        try:
+            timeout = max(0.1, min(TMDB_TIMEOUT, deadline - time.monotonic()))
+            response = _session.get(url, params=query, timeout=timeout)
+        except requests.RequestException:
+            response = None
+        TMDB_REQUEST_SECONDS.observe(
+            time.perf_counter() - start, endpoint,
+            response.status_code if response is not None else "error"
+        )
+        if response is not None and response.status_code not in RETRY_STATUSES:
+            _breaker.record_success()
+            if response.status_code == 200:
+                _stale.put(key, response)
+                _responses.set(_cache_key(key), (response.content, response.headers.get("Content-Type")))
+            return response
+        if attempt < retries:
+            pause = _backoff(attempt, response)
+            if time.monotonic() + pause >= deadline:
+                break
+            time.sleep(pause)
+
+    _breaker.record_failure()
+    status = response.status_code if response is not None else "no response"
+    return _degraded(key, f"TMDB request failed within its deadline ({status})")
+
+
+def get(path: str, params: dict = None, priority: int = PRIORITY_INTERACTIVE):
+    """
+    GET a TMDB endpoint, e.g. get("/movie/550") or get("/search/movie", {"query": "Heat"}).
+
+    Identical calls that are already in flight share one upstream request and
+    its response. Successful responses are reused for TMDB_CACHE_TTL seconds
+    (shared across replicas when CACHE_URL is set). Calls are paced by the
+    token bucket, and 429/5xx responses are retried with backoff within the
+    call's deadline (TMDB_DEADLINE for interactive calls). When TMDB stays
+    unhealthy the last good response for the same request is returned
+    instead. If there is none, TMDBUnavailable is raised.
+    """
+    key = _normalize(path, params)
+    cached = _responses.get(_cache_key(key))
+    if cached is not None:
+        return _cached_response(cached)
+    query = dict(params or {})
+    query["api_key"] = TMDB_API_KEY
+    if not tracing.ENABLED:
+        return _flight.do(key, lambda: _fetch(key, query, priority))
+
+    # The span covers rate-limit waits, retries and waiting on a coalesced call
+    start = time.perf_counter()
+    try:
+        return _flight.do(key, lambda: _fetch(key, query, priority))
+    finally:
+        tracing.record("tmdb", _ID_SEGMENT.sub("/{id}", key[0]), start, time.perf_counter() - start)
+
+
+def response_cache_stats():
+    return _responses.stats()
+
+
+def stats():
+    """Single-flight, rate limiter, circuit breaker and stale-cache counters."""
+    return {
+        **_flight.stats(),
+        "response_cache": _responses.stats(),
+        "rate_limiter": _bucket.stats(),
+        "circuit_breaker": _breaker.stats(),
+        "stale_served": _stale.served,
+    }
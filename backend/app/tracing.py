@@ -0,0 +1,207 @@
+"""
+Slow-request span tracing, on when TRACE_SLOW_REQUEST_MS > 0.
+
+Each request gets a Trace in a context variable. DB statements, TMDB calls,
+model lookups, the endpoint body and response serialization add spans to it,
+and requests slower than the threshold are logged and kept for
+GET /api/admin/traces.
+
+When tracing is off, neither the middleware nor the route wrappers are
+installed, and the instrumentation points only check ENABLED.
+"""
+import asyncio
+import functools
+import json
+import logging
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from app.config import TRACE_SLOW_REQUEST_MS, TRACE_BUFFER_SIZE
+
+logger = logging.getLogger(__name__)
+
+ENABLED = TRACE_SLOW_REQUEST_MS > 0
+
+# Per-request span cap, so a runaway loop of queries can't grow a trace without bound
+MAX_SPANS = 500
+
+_current = ContextVar("trace", default=None)
+
+
+class Trace:
+    def __init__(self, method, path):
+        self.method = method
+        self.path = path
+        self.start = time.perf_counter()
+        self.spans = []
+        self.dropped = 0
+
+    def add(self, kind, name, start, elapsed):
+        # list.append is atomic, so threadpool and greenlet code can record into the same trace
+        if len(self.spans) < MAX_SPANS:
+            self.spans.append((kind, name, start, elapsed))
+        else:
+            self.dropped += 1
+
+    def to_dict(self, route, status, elapsed):
+        by_kind = {}
+        for kind, _, _, span_elapsed in self.spans:
+            by_kind[kind] = by_kind.get(kind, 0.0) + span_elapsed
+        return {
+            "method": self.method,
+            "path": self.path,
+            "route": route,
+            "status": status,
+            "duration_ms": round(elapsed * 1000, 3),
+            "at": time.time(),
+            # Spans can nest (DB time inside the endpoint span), so these don't add up to duration_ms
+            "totals_ms": {kind: round(total * 1000, 3) for kind, total in by_kind.items()},
+            "spans": [
+                {
+                    "kind": kind,
+                    "name": name,
+                    "offset_ms": round((start - self.start) * 1000, 3),
+                    "duration_ms": round(span_elapsed * 1000, 3),
+                }
+                for kind, name, start, span_elapsed in sorted(self.spans, key=lambda s: s[2])
+            ],
+            "dropped_spans": self.dropped,
+        }
+
+
+def record(kind, name, start, elapsed):
+    """Add a span to the current request's trace, if there is one."""
+    trace = _current.get()
+    if trace is not None:
+        trace.add(kind, name, start, elapsed)
+
+
+class _SlowTraces:
+    """The most recent slow-request traces in this process."""
+
+    def __init__(self, maxlen):
+        self._lock = threading.Lock()
+        self._items = deque(maxlen=maxlen)
+        self.requests = 0
+        self.slow = 0
+
+    def add(self, trace):
+        with self._lock:
+            self._items.append(trace)
+            self.slow += 1
+
+    def recent(self, limit):
+        with self._lock:
+            return list(self._items)[-limit:][::-1]
+
+    def stats(self):
+        return {
+            "enabled": ENABLED,
+            "threshold_ms": TRACE_SLOW_REQUEST_MS,
+            "requests": self.requests,
+            "slow": self.slow,
+            "kept": len(self._items),
+        }
+
+
+slow_traces = _SlowTraces(TRACE_BUFFER_SIZE)
+
+
+class SlowRequestTracer:
+    """ASGI middleware giving each HTTP request a Trace and keeping the slow ones."""
+
+    def __init__(self, app, threshold_ms=TRACE_SLOW_REQUEST_MS):
+        self.app = app
+        self.threshold = threshold_ms / 1000
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace(scope["method"], scope["path"])
+        token = _current.set(trace)
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            _current.reset(token)
+            elapsed = time.perf_counter() - trace.start
+            slow_traces.requests += 1
+            if elapsed >= self.threshold:
+                route = scope.get("route")
+                result = trace.to_dict(route.path if route is not None else None, status, elapsed)
+                slow_traces.add(result)
+                logger.warning(f"Slow request {trace.method} {trace.path}: {json.dumps(result)}")
+
+
+# Set per request by the route wrapper; the endpoint wrapper stores its end time in it
+_endpoint_end = ContextVar("endpoint_end", default=None)
+
+
+def _endpoint_done(start, name):
+    end = time.perf_counter()
+    holder = _endpoint_end.get()
+    if holder is not None:
+        holder[0] = end
+    record("endpoint", name, start, end - start)
+
+
+def _traced_endpoint(call, name):
+    """Wrap an endpoint function so its run time becomes an "endpoint" span; keeps sync/async-ness."""
+    if asyncio.iscoroutinefunction(call):
+        @functools.wraps(call)
+        async def endpoint(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await call(*args, **kwargs)
+            finally:
+                _endpoint_done(start, name)
+    else:
+        # Runs on a threadpool thread with a copy of the request's context; the holder list is shared
+        @functools.wraps(call)
+        def endpoint(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return call(*args, **kwargs)
+            finally:
+                _endpoint_done(start, name)
+    return endpoint
+
+
+def _traced_handler(handler, name):
+    async def traced(request):
+        holder = [None]
+        token = _endpoint_end.set(holder)
+        try:
+            return await handler(request)
+        finally:
+            _endpoint_end.reset(token)
+            if holder[0] is not None:
+                record("serialize", name, holder[0], time.perf_counter() - holder[0])
+    return traced
+
+
+def instrument_routes(app):
+    """
+    Wrap every API route so its trace also gets "endpoint" and "serialize" spans.
+
+    "serialize" covers what FastAPI does after the endpoint returns: response
+    model validation, jsonable encoding and rendering the body.
+    """
+    from fastapi.routing import APIRoute
+    from starlette.routing import request_response
+
+    for route in app.routes:
+        if isinstance(route, APIRoute) and not getattr(route, "traced", False):
+            route.dependant.call = _traced_endpoint(route.dependant.call, route.path)
+            route.app = request_response(_traced_handler(route.get_route_handler(), route.path))
+            route.traced = True
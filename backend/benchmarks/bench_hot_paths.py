@@ -0,0 +1,450 @@
+"""
+Hot-path timings against a synthetic catalog and a local TMDB stub.
+
+Generates a catalog (benchmarks.synthetic), serves it through the TMDB stub
+(benchmarks.tmdb_stub), points the app at both, and times recommend(),
+recommend_by_preferences(), search/autocomplete, response serialization,
+shared-cache lookups (against benchmarks.redis_stub), the sharded similarity
+index (with --shards), auth, get_history and add_history. Nothing leaves the machine. Run from backend/:
+
+    python -m benchmarks.bench_hot_paths --movies 5000 --users 1000 --out bench.json
+
+The get_history/add_history/login cases need a migrated PostgreSQL at
+DATABASE_URL; pass --skip-db to run the in-memory cases only. Synthetic rows
+use TMDB ids from 900000000 and usernames starting with bench_user_, and are
+removed afterwards. Compare two runs with benchmarks.compare.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from types import SimpleNamespace
+from benchmarks.synthetic import SYNTHETIC_ID_OFFSET, generate_catalog, generate_users
+from benchmarks.timing import time_calls, time_async_calls
+from benchmarks.tmdb_stub import TMDBStub
+from benchmarks.redis_stub import RedisStub
+
+SEED_BATCH = 10_000
+
+_SEED_USERS = """
+    INSERT INTO users (username, email, password, favorite_genres)
+    SELECT u.username, u.username || '@bench.local', :password, string_to_array(u.genres, ',')
+    FROM unnest(CAST(:usernames AS text[]), CAST(:genres AS text[])) AS u(username, genres)
+    RETURNING id, username
+"""
+
+_SEED_MOVIES = """
+    INSERT INTO movies (tmdb_id, title)
+    SELECT * FROM unnest(CAST(:tmdb_ids AS integer[]), CAST(:titles AS text[]))
+    ON CONFLICT (tmdb_id) DO NOTHING
+"""
+
+_SEED_HISTORY = """
+    INSERT INTO history (user_id, movie_id, title, timestamp)
+    SELECT e.user_id, m.id, m.title, now() - make_interval(mins => e.age)
+    FROM unnest(CAST(:user_ids AS integer[]), CAST(:tmdb_ids AS integer[]), CAST(:ages AS integer[]))
+        AS e(user_id, tmdb_id, age)
+    JOIN movies m ON m.tmdb_id = e.tmdb_id
+    ON CONFLICT ON CONSTRAINT unique_user_movie_history DO NOTHING
+"""
+
+_CLEANUP = [
+    "DELETE FROM users WHERE username LIKE 'bench\\_user\\_%'",
+    f"DELETE FROM movies WHERE tmdb_id >= {SYNTHETIC_ID_OFFSET}",
+]
+
+
+def configure_app(catalog_dir, tmdb_url, skip_db=False):
+    """Point the app at the synthetic catalog and TMDB stub; must run before anything imports app."""
+    os.environ["MODEL_DIR"] = str(catalog_dir)
+    os.environ["TMDB_BASE_URL"] = tmdb_url
+    os.environ.setdefault("TMDB_API_KEY", "bench")
+    os.environ.setdefault("SECRET_KEY", "bench-secret")
+    if skip_db:
+        os.environ.setdefault("DATABASE_URL", "postgresql://bench@127.0.0.1/bench")
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _typo(title, rng):
+    if len(title) < 4:
+        return title
+    i = rng.randrange(1, len(title) - 1)
+    return title[:i] + title[i + 1] + title[i] + title[i + 2:]
+
+
+def bench_model(args, meta, rng):
+    """In-memory cases: model load, recommendations, search and autocomplete."""
+    start = time.perf_counter()
+    from app import recommendations
+    results = {"catalog_load": {"seconds": round(time.perf_counter() - start, 3), "movies": len(meta)}}
+
+    ids = list(meta)
+    sample = [rng.choice(ids) for _ in range(args.iterations)]
+    titles = [meta[t]["title"] for t in sample]
+
+    results["recommend.exact_title"] = time_calls(recommendations.recommend, [(t,) for t in titles])
+    results["recommend.typo_title"] = time_calls(recommendations.recommend, [(_typo(t, rng),) for t in titles])
+    results["recommend_by_tmdb_id"] = time_calls(recommendations.recommend_by_tmdb_id, [(t,) for t in sample])
+
+    # Genres only: actor filters leave fewer than the 5 movies recommend_by_preferences samples
+    profiles = [
+        SimpleNamespace(favorite_genres=meta[t]["genres"][:1], favorite_actors=[], favorite_directors=[])
+        for t in sample[: max(1, args.iterations // 10)]
+    ]
+    results["recommend_by_preferences"] = time_calls(recommendations.recommend_by_preferences, [(p,) for p in profiles])
+    results["search_movies"] = time_calls(
+        recommendations.search_movies, [(" ".join(meta[t]["overview"].split()[:2]),) for t in sample]
+    )
+    results["suggest_titles.prefix"] = time_calls(recommendations.suggest_titles, [(t[:4],) for t in titles])
+    results["suggest_titles.typo"] = time_calls(recommendations.suggest_titles, [(_typo(t, rng),) for t in titles])
+    return results
+
+
+def bench_shards(args, catalog_dir, rng):
+    """Scatter-gather top-k over --shards worker processes, against the in-process scan."""
+    import pickle
+    import numpy as np
+    from app import shards
+
+    with open(os.path.join(catalog_dir, "simi.pkl"), "rb") as f:
+        simi = pickle.load(f)
+    shard_dir = tempfile.mkdtemp(prefix="bench-shards-")
+    start = time.perf_counter()
+    shards.build(simi, shard_dir, args.shards)
+    results = {"shards.build": {"seconds": round(time.perf_counter() - start, 3), "shards": args.shards}}
+
+    rows = [(rng.randrange(len(simi)), 6) for _ in range(args.iterations)]
+
+    def in_process(row, k):
+        scores = np.asarray(simi[row])
+        top = np.argpartition(-scores, k - 1)[:k]
+        return top[np.argsort(-scores[top], kind="stable")]
+
+    index = shards.ShardedIndex(shard_dir, processes=True)
+    try:
+        index.warm()
+        results["shards.similar.in_process"] = time_calls(in_process, rows)
+        results[f"shards.similar.{args.shards}_processes"] = time_calls(index.similar, rows)
+        profiles = [([r, (r * 7) % len(simi)], [1.0, 0.5], 1.5, [], [r], 50) for r, _ in rows]
+        results[f"shards.profile.{args.shards}_processes"] = time_calls(index.profile, profiles)
+        # Request threads querying at once, as a threadpool of app handlers would
+        threads = 2 * args.shards
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            start = time.perf_counter()
+            list(pool.map(lambda call: index.similar(*call), rows))
+            elapsed = time.perf_counter() - start
+        results[f"shards.similar.{args.shards}_processes.concurrent"] = {
+            "threads": threads, "queries_per_sec": round(len(rows) / elapsed, 1),
+        }
+    finally:
+        index.close()
+    return results
+
+
+def bench_serialization(args, meta, stub):
+    """
+    Rendering the popular/search pages: FastAPI's default path (jsonable_encoder
+    + json.dumps) against the response model + orjson path, with body sizes.
+    """
+    import gzip
+    import orjson
+    from fastapi.encoders import jsonable_encoder
+    from pydantic import TypeAdapter
+    from app import recommendations
+    from app.schemas import MoviePage
+
+    top = sorted(meta, key=lambda t: -(meta[t].get("popularity") or 0))[:20]
+    local_page = {
+        "page": 1,
+        "results": [{**recommendations.movie_details(t), "popularity_score": 1.0} for t in top],
+        "source": "local",
+    }
+    _, tmdb_page = stub.route("/3/movie/popular", {})
+    adapter = TypeAdapter(MoviePage)
+
+    def default(payload):
+        # What starlette's JSONResponse.render does after jsonable_encoder
+        return json.dumps(
+            jsonable_encoder(payload), ensure_ascii=False, allow_nan=False, separators=(",", ":")
+        ).encode("utf-8")
+
+    def model_orjson(payload):
+        return orjson.dumps(adapter.dump_python(adapter.validate_python(payload), mode="json"))
+
+    results = {}
+    for name, payload in (("popular.local", local_page), ("search.tmdb_passthrough", tmdb_page)):
+        for variant, render in (("default", default), ("model_orjson", model_orjson)):
+            body = render(payload)
+            results[f"serialize.{name}.{variant}"] = {
+                **time_calls(render, [(payload,)] * args.iterations),
+                "bytes": len(body),
+                "gzip_bytes": len(gzip.compress(body, 5)),
+            }
+    return results
+
+
+def bench_shared_cache(args, meta):
+    """
+    Near cache over the Redis-protocol stand-in: local hits, hits another
+    replica wrote, and 20 keys as one MGET against 20 single gets.
+    """
+    from app.cache import NearCache
+    from app.redis_backend import RedisBackend
+
+    server = RedisStub(latency_ms=args.cache_latency_ms).start()
+    try:
+        writer = NearCache("bench", 600, len(meta), RedisBackend(server.url))
+        reader = NearCache("bench", 600, len(meta), RedisBackend(server.url))
+        ids = list(meta)[: args.iterations * 20]
+        writer.set_many({t: meta[t] for t in ids})
+
+        def remote_get(tmdb_id):
+            reader.clear()
+            return reader.get(tmdb_id)
+
+        def sequential(batch):
+            reader.clear()
+            return [reader.get(t) for t in batch]
+
+        def pipelined(batch):
+            reader.clear()
+            return reader.get_many(batch)
+
+        batches = [(ids[i:i + 20],) for i in range(0, len(ids) - 19, 20)]
+        results = {"shared_cache.remote_hit": time_calls(remote_get, [(t,) for t in ids[:args.iterations]])}
+        reader.get_many(ids[:args.iterations])
+        results["shared_cache.near_hit"] = time_calls(reader.get, [(t,) for t in ids[:args.iterations]])
+        results["shared_cache.get_20.sequential"] = time_calls(sequential, batches)
+        results["shared_cache.get_20.pipelined"] = time_calls(pipelined, batches)
+        results["shared_cache.server"] = {"commands": server.commands, "connections": server.connections}
+        return results
+    finally:
+        server.stop()
+
+
+def bench_auth(args):
+    """bcrypt and JWT costs, without the database."""
+    from app.auth import hash_password, verify_password, create_access_token
+    from app import dependencies
+
+    n_hash = max(3, args.iterations // 20)
+    hashed = hash_password("bench-password")
+    results = {
+        "auth.hash_password": time_calls(hash_password, [("bench-password",)] * n_hash, warmup=1),
+        "auth.verify_password": time_calls(verify_password, [("bench-password", hashed)] * n_hash, warmup=1),
+        "auth.create_access_token": time_calls(
+            create_access_token, [({"sub": f"bench_user_{i}"},) for i in range(args.iterations)]
+        ),
+    }
+    tokens = [create_access_token({"sub": f"bench_user_{i}"}) for i in range(args.iterations)]
+
+    def verify_cold(token):
+        dependencies._token_cache.clear()
+        return dependencies._token_subject(token)
+
+    results["auth.verify_token.cold"] = time_calls(verify_cold, [(t,) for t in tokens])
+    results["auth.verify_token.cached"] = time_calls(dependencies._token_subject, [(t,) for t in tokens])
+    return results
+
+
+async def seed_database(args, meta):
+    """Insert synthetic users, their catalog movies and history; returns [(user_id, username)]."""
+    from sqlalchemy import text
+    from app.auth import hash_password
+    from app.database import AsyncSessionLocal
+
+    ranked = sorted(meta, key=lambda t: -(meta[t].get("popularity") or 0))
+    users = list(generate_users(args.users, ranked, seed=args.seed, history_per_user=args.history_per_user))
+    password = hash_password("bench-password")
+
+    seeded = []
+    async with AsyncSessionLocal() as db:
+        watched = sorted({t for _, _, history, _ in users for t in history})
+        for i in range(0, len(watched), SEED_BATCH):
+            batch = watched[i:i + SEED_BATCH]
+            await db.execute(text(_SEED_MOVIES), {"tmdb_ids": batch, "titles": [meta[t]["title"] for t in batch]})
+
+        for i in range(0, len(users), SEED_BATCH):
+            batch = users[i:i + SEED_BATCH]
+            rows = (await db.execute(text(_SEED_USERS), {
+                "usernames": [u[0] for u in batch],
+                "genres": [",".join(u[1]) for u in batch],
+                "password": password,
+            })).all()
+            ids = {row.username: row.id for row in rows}
+            seeded.extend((ids[u[0]], u[0]) for u in batch)
+
+            user_ids, tmdb_ids, ages = [], [], []
+            for username, _, history, _ in batch:
+                for age, tmdb_id in enumerate(history):
+                    user_ids.append(ids[username])
+                    tmdb_ids.append(tmdb_id)
+                    ages.append(age * 60)
+            await db.execute(text(_SEED_HISTORY), {"user_ids": user_ids, "tmdb_ids": tmdb_ids, "ages": ages})
+        await db.commit()
+    return seeded
+
+
+async def cleanup_database():
+    from sqlalchemy import text
+    from app.database import AsyncSessionLocal
+
+    async with AsyncSessionLocal() as db:
+        for statement in _CLEANUP:
+            await db.execute(text(statement))
+        await db.commit()
+
+
+async def bench_db(args, meta, rng):
+    """Route-level cases that go through the database (and the TMDB stub on cache misses)."""
+    from fastapi import Response
+    from app.database import AsyncSessionLocal, async_engine
+    from app.dependencies import get_current_user, _token_cache, _user_cache
+    from app.auth import create_access_token
+    from app.routes.user import get_history, add_history, login, HistoryCreate, LoginRequest
+
+    results = {}
+    await cleanup_database()
+    start = time.perf_counter()
+    seeded = await seed_database(args, meta)
+    results["seed"] = {"seconds": round(time.perf_counter() - start, 3), "users": len(seeded)}
+
+    sample = [rng.choice(seeded) for _ in range(args.iterations)]
+    tokens = [create_access_token({"sub": username}) for _, username in sample]
+
+    try:
+        async def current_user_cold(token):
+            _token_cache.clear()
+            _user_cache.clear()
+            return await get_current_user(token)
+
+        results["get_current_user.cold"] = await time_async_calls(current_user_cold, [(t,) for t in tokens])
+        results["get_current_user.cached"] = await time_async_calls(get_current_user, [(t,) for t in tokens])
+        users = [await get_current_user(t) for t in tokens]
+
+        cursors = []
+
+        async def history_page(user, cursor=None):
+            async with AsyncSessionLocal() as db:
+                response = Response()
+                await get_history(response=response, limit=20, cursor=cursor, user=user, db=db)
+                return response.headers.get("X-Next-Cursor")
+
+        async def first_page(user):
+            cursors.append((user, await history_page(user)))
+
+        results["get_history.first_page"] = await time_async_calls(first_page, [(u,) for u in users])
+        results["get_history.next_page"] = await time_async_calls(
+            history_page, [(u, c) for u, c in cursors if c]
+        )
+
+        async def add(user, tmdb_id):
+            async with AsyncSessionLocal() as db:
+                await add_history(HistoryCreate(tmdb_movie_id=tmdb_id), user=user, db=db)
+
+        catalog_ids = list(meta)
+        results["add_history.catalog_movie"] = await time_async_calls(
+            add, [(u, rng.choice(catalog_ids)) for u in users]
+        )
+        # Ids outside the catalog are resolved through the TMDB stub
+        outside = max(catalog_ids) + 1
+        results["add_history.tmdb_movie"] = await time_async_calls(
+            add, [(u, outside + i) for i, u in enumerate(users)]
+        )
+
+        async def sign_in(username):
+            async with AsyncSessionLocal() as db:
+                await login(LoginRequest(username=username, password="bench-password"), db=db)
+
+        n_login = max(3, args.iterations // 20)
+        results["login"] = await time_async_calls(sign_in, [(username,) for _, username in sample[:n_login]])
+    finally:
+        await cleanup_database()
+        await async_engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the backend hot paths on synthetic data")
+    parser.add_argument("--movies", type=int, default=5000, help="catalog size (5k to 1M)")
+    parser.add_argument("--users", type=int, default=1000, help="synthetic users seeded for the DB cases")
+    parser.add_argument("--history-per-user", type=int, default=20)
+    parser.add_argument("--iterations", type=int, default=200, help="timed calls per case")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="TMDB stub latency")
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--shards", type=int, default=0, help="also time the sharded similarity index")
+    parser.add_argument("--cache-latency-ms", type=float, default=0.2, help="shared cache stub round trip")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--catalog", help="Reuse an existing synthetic catalog directory")
+    parser.add_argument("--skip-db", action="store_true", help="Only run the in-memory cases")
+    parser.add_argument("--out", help="Write the JSON report here as well as to stdout")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    catalog_dir = args.catalog or tempfile.mkdtemp(prefix="bench-catalog-")
+    start = time.perf_counter()
+    if args.catalog:
+        import pickle
+        with open(os.path.join(catalog_dir, "movie_meta.pkl"), "rb") as f:
+            meta = pickle.load(f)
+        if not args.skip_db and min(meta) < SYNTHETIC_ID_OFFSET:
+            parser.error("--catalog ids overlap real TMDB ids; regenerate it with benchmarks.synthetic")
+    else:
+        meta = generate_catalog(args.movies, catalog_dir, seed=args.seed)
+    generate_seconds = round(time.perf_counter() - start, 3)
+
+    stub = TMDBStub(meta, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms).start()
+
+    configure_app(catalog_dir, stub.url, skip_db=args.skip_db)
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "created_at": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "params": vars(args),
+            "catalog_seconds": generate_seconds,
+        },
+        "results": {},
+    }
+    try:
+        # Keep stdout for the report
+        with contextlib.redirect_stdout(sys.stderr):
+            report["results"].update(bench_model(args, meta, rng))
+            report["results"].update(bench_serialization(args, meta, stub))
+            report["results"].update(bench_shared_cache(args, meta))
+            if args.shards:
+                report["results"].update(bench_shards(args, catalog_dir, rng))
+            report["results"].update(bench_auth(args))
+            if not args.skip_db:
+                report["results"].update(asyncio.run(bench_db(args, meta, rng)))
+        report["meta"]["tmdb_stub_requests"] = stub.requests
+    finally:
+        stub.stop()
+
+    output = json.dumps(report, indent=2, default=str)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output)
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Round trips and latency for the history/rating write paths: the old
+select-then-insert sequence vs. the single-statement upserts.
+
+Needs a migrated database at DATABASE_URL. Run from backend/:
+
+    python -m benchmarks.bench_write_paths --n 500
+
+Creates a throwaway user and movie ids above 900000000 and removes them afterwards.
+"""
+import argparse
+import asyncio
+import json
+import time
+import uuid
+from sqlalchemy import event, select, delete
+from app.database import AsyncSessionLocal, async_engine
+from app.models import User, Movie, History, Rating
+from app.services.history_service import add_history_entry
+from app.services.rating_service import upsert_rating
+
+BASE_TMDB_ID = 900000000
+
+
+class RoundTrips:
+    """Counts statements and commits sent on the async engine."""
+
+    def __init__(self):
+        self.statements = 0
+        self.commits = 0
+        sync_engine = async_engine.sync_engine
+        event.listen(sync_engine, "before_cursor_execute", self._on_statement)
+        event.listen(sync_engine, "commit", self._on_commit)
+
+    def _on_statement(self, *args):
+        self.statements += 1
+
+    def _on_commit(self, *args):
+        self.commits += 1
+
+    def reset(self):
+        self.statements = 0
+        self.commits = 0
+
+
+async def legacy_add_history(db, user_id, tmdb_id, title):
+    movie = (await db.execute(select(Movie).where(Movie.tmdb_id == tmdb_id))).scalar_one_or_none()
+    if not movie:
+        movie = Movie(tmdb_id=tmdb_id, title=title)
+        db.add(movie)
+        await db.commit()
+    existing = (await db.execute(select(History.id).where(
+        History.user_id == user_id, History.movie_id == movie.id
+    ))).first()
+    if existing:
+        return False
+    db.add(History(user_id=user_id, movie_id=movie.id, title=movie.title))
+    await db.commit()
+    return True
+
+
+async def legacy_rate(db, user_id, tmdb_id, rating, title):
+    movie = (await db.execute(select(Movie).where(Movie.tmdb_id == tmdb_id))).scalar_one_or_none()
+    if not movie:
+        db.add(Movie(tmdb_id=tmdb_id, title=title))
+        await db.commit()
+    existing = (await db.execute(select(Rating).where(
+        Rating.user_id == user_id, Rating.tmdb_id == tmdb_id
+    ))).scalar_one_or_none()
+    if existing:
+        existing.rating = rating
+    else:
+        db.add(Rating(user_id=user_id, tmdb_id=tmdb_id, rating=rating))
+    await db.commit()
+
+
+async def new_add_history(db, user_id, tmdb_id, title):
+    added = await add_history_entry(db, user_id, tmdb_id)
+    if added is None:
+        added = await add_history_entry(db, user_id, tmdb_id, title=title)
+    return added
+
+
+async def new_rate(db, user_id, tmdb_id, rating, title):
+    if not await upsert_rating(db, user_id, tmdb_id, rating):
+        await upsert_rating(db, user_id, tmdb_id, rating, title=title)
+
+
+async def _run_case(name, fn, user_id, ids, counter, **kwargs):
+    counter.reset()
+    start = time.perf_counter()
+    for tmdb_id in ids:
+        async with AsyncSessionLocal() as db:
+            await fn(db, user_id, tmdb_id, title=f"Bench {tmdb_id}", **kwargs)
+    elapsed = time.perf_counter() - start
+    return {
+        "case": name,
+        "ops": len(ids),
+        "statements_per_op": round(counter.statements / len(ids), 2),
+        "commits_per_op": round(counter.commits / len(ids), 2),
+        "ms_per_op": round(elapsed * 1000 / len(ids), 3),
+    }
+
+
+async def _cleanup(user_id, ids):
+    async with AsyncSessionLocal() as db:
+        await db.execute(delete(User).where(User.id == user_id))
+        await db.execute(delete(Movie).where(Movie.tmdb_id.in_(ids)))
+        await db.commit()
+
+
+async def main(n):
+    counter = RoundTrips()
+    async with AsyncSessionLocal() as db:
+        user = User(username=f"bench-{uuid.uuid4().hex[:8]}", email=f"{uuid.uuid4().hex[:8]}@bench.local", password="x")
+        db.add(user)
+        await db.commit()
+        user_id = user.id
+
+    legacy_ids = list(range(BASE_TMDB_ID, BASE_TMDB_ID + n))
+    new_ids = list(range(BASE_TMDB_ID + n, BASE_TMDB_ID + 2 * n))
+    results = []
+    try:
+        # First pass creates movies; second pass hits the "already known" path
+        results.append(await _run_case("legacy add_history (new movie)", legacy_add_history, user_id, legacy_ids, counter))
+        results.append(await _run_case("upsert add_history (new movie)", new_add_history, user_id, new_ids, counter))
+        results.append(await _run_case("legacy add_history (existing)", legacy_add_history, user_id, legacy_ids, counter))
+        results.append(await _run_case("upsert add_history (existing)", new_add_history, user_id, new_ids, counter))
+        results.append(await _run_case("legacy rate_movie", legacy_rate, user_id, legacy_ids, counter, rating=4.0))
+        results.append(await _run_case("upsert rate_movie", new_rate, user_id, new_ids, counter, rating=4.0))
+    finally:
+        await _cleanup(user_id, legacy_ids + new_ids)
+        await async_engine.dispose()
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--n", type=int, default=200, help="operations per case")
+    asyncio.run(main(parser.parse_args().n))
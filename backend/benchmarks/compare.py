@@ -0,0 +1,50 @@
+"""
+Compare two benchmark reports case by case.
+
+    python -m benchmarks.compare before.json after.json --threshold 1.2
+
+Prints p50/p95 for every case present in both reports and exits with status 1
+when any case's p50 grew by more than --threshold (a ratio).
+"""
+import argparse
+import json
+import sys
+
+
+def compare(before, after, threshold):
+    rows, regressions = [], []
+    for case, old in before["results"].items():
+        new = after["results"].get(case)
+        if not new or "p50_ms" not in old or "p50_ms" not in new:
+            continue
+        ratio = new["p50_ms"] / old["p50_ms"] if old["p50_ms"] else None
+        rows.append((case, old["p50_ms"], new["p50_ms"], old["p95_ms"], new["p95_ms"], ratio))
+        if ratio is not None and ratio > threshold:
+            regressions.append(case)
+    return rows, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark JSON reports")
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--threshold", type=float, default=1.2, help="p50 ratio that counts as a regression")
+    args = parser.parse_args()
+
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+
+    rows, regressions = compare(before, after, args.threshold)
+    print(f"{before['meta'].get('commit')} -> {after['meta'].get('commit')}")
+    print(f"{'case':<32} {'p50 before':>11} {'p50 after':>10} {'p95 before':>11} {'p95 after':>10} {'ratio':>7}")
+    for case, old_p50, new_p50, old_p95, new_p95, ratio in rows:
+        flag = "  <-- slower" if case in regressions else ""
+        ratio_text = f"{ratio:.2f}" if ratio is not None else "-"
+        print(f"{case:<32} {old_p50:>11.3f} {new_p50:>10.3f} {old_p95:>11.3f} {new_p95:>10.3f} {ratio_text:>7}{flag}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,387 @@
+"""
+HTTP load test: a weighted mix of user traffic at fixed arrival rates.
+
+Drives the FastAPI app in-process over ASGI (default) or a local uvicorn
+server, with TMDB replaced by benchmarks.tmdb_stub and a synthetic catalog.
+Each step sends requests open-loop at the target RPS for --duration seconds;
+latency is measured from the scheduled send time, so client-side queueing
+under overload shows up instead of being hidden. Run from backend/:
+
+    python -m benchmarks.loadtest --rps 25,50,100,200 --duration 20 --out load.json
+
+Needs a migrated PostgreSQL at DATABASE_URL (the write paths use
+Postgres-only SQL, so SQLite can't stand in). Synthetic users and movies are
+seeded first and removed afterwards, as in benchmarks.bench_hot_paths.
+"""
+import argparse
+import asyncio
+import contextlib
+import http.client
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import urlencode
+from benchmarks.bench_hot_paths import configure_app, git_commit, seed_database, cleanup_database
+from benchmarks.synthetic import generate_catalog
+from benchmarks.timing import summarize
+from benchmarks.tmdb_stub import TMDBStub
+
+DEFAULT_MIX = "login=5,search=20,suggest=10,recommend=25,popular=5,history_get=15,history_add=10,rate=10"
+PASSWORD = "bench-password"
+
+
+class ASGIClient:
+    """Minimal in-process HTTP client that calls the ASGI app directly."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def request(self, method, path, query=None, json_body=None, headers=None):
+        body = json.dumps(json_body).encode() if json_body is not None else b""
+        raw_headers = [(b"host", b"loadtest")]
+        if json_body is not None:
+            raw_headers.append((b"content-type", b"application/json"))
+        raw_headers += [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()]
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": urlencode(query or {}).encode(),
+            "root_path": "",
+            "headers": raw_headers,
+            "client": ("127.0.0.1", 0),
+            "server": ("loadtest", 80),
+        }
+        done = asyncio.Event()
+        sent = False
+        status = None
+        chunks = []
+
+        async def receive():
+            nonlocal sent
+            if not sent:
+                sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            # Streaming responses listen for a disconnect; only send it once the response is complete
+            await done.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+                if not message.get("more_body", False):
+                    done.set()
+
+        await self.app(scope, receive, send)
+        done.set()
+        return status, b"".join(chunks)
+
+
+class HTTPClient:
+    """Blocking http.client connections (one per worker thread) driven from asyncio."""
+
+    def __init__(self, host, port, max_in_flight):
+        self.host = host
+        self.port = port
+        self._local = threading.local()
+        self._executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="loadtest")
+
+    def _send(self, method, path, body, headers):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = http.client.HTTPConnection(self.host, self.port, timeout=60)
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            response = conn.getresponse()
+            return response.status, response.read()
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            self._local.conn = None
+            raise
+
+    async def request(self, method, path, query=None, json_body=None, headers=None):
+        headers = dict(headers or {})
+        body = None
+        if json_body is not None:
+            body = json.dumps(json_body)
+            headers["Content-Type"] = "application/json"
+        if query:
+            path = f"{path}?{urlencode(query)}"
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._send, method, path, body, headers)
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+
+class Scenarios:
+    """Builds requests for each traffic type from the synthetic catalog and seeded users."""
+
+    def __init__(self, meta, users, tokens, rng):
+        self.rng = rng
+        self.ids = list(meta)
+        self.titles = [meta[t]["title"] for t in self.ids]
+        self.words = [w for t in self.ids[:2000] for w in meta[t]["overview"].split()[:2]]
+        self.users = users
+        self.tokens = tokens
+
+    def _auth(self):
+        i = self.rng.randrange(len(self.users))
+        return {"Authorization": f"Bearer {self.tokens[i]}"}
+
+    def build(self, name):
+        """(route label, method, path, query, json body, headers) for one request."""
+        rng = self.rng
+        if name == "login":
+            _, username = rng.choice(self.users)
+            return "POST /api/users/login", "POST", "/api/users/login", None, \
+                {"username": username, "password": PASSWORD}, None
+        if name == "search":
+            return "GET /api/users/search/movie", "GET", "/api/users/search/movie", \
+                {"query": rng.choice(self.words)}, None, None
+        if name == "suggest":
+            return "GET /api/recommend/suggest", "GET", "/api/recommend/suggest", \
+                {"q": rng.choice(self.titles)[:4]}, None, None
+        if name == "recommend":
+            return "GET /api/recommend/", "GET", "/api/recommend/", \
+                {"tmdb_id": rng.choice(self.ids), "limit": 10}, None, None
+        if name == "popular":
+            return "GET /api/users/movies/popular", "GET", "/api/users/movies/popular", None, None, None
+        if name == "feed":
+            return "GET /api/feed", "GET", "/api/feed", None, None, self._auth()
+        if name == "history_get":
+            return "GET /api/users/history", "GET", "/api/users/history", {"limit": 20}, None, self._auth()
+        if name == "history_add":
+            return "POST /api/users/history", "POST", "/api/users/history", None, \
+                {"tmdb_movie_id": rng.choice(self.ids)}, self._auth()
+        if name == "rate":
+            tmdb_id = rng.choice(self.ids)
+            return "POST /api/users/movies/{tmdb_id}/rate", "POST", f"/api/users/movies/{tmdb_id}/rate", None, \
+                {"rating": rng.randint(1, 10) / 2}, self._auth()
+        raise ValueError(f"unknown scenario: {name}")
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+async def run_step(client, scenarios, mix, rps, duration, max_in_flight, rng):
+    """Send requests open-loop at `rps` for `duration` seconds; returns per-route stats."""
+    names, weights = list(mix), list(mix.values())
+    samples = {}
+    errors = {}
+    statuses = {}
+    dropped = 0
+    in_flight = set()
+    free_slots = max_in_flight
+
+    async def one(label, method, path, query, body, headers, scheduled):
+        nonlocal free_slots
+        try:
+            status, _ = await client.request(method, path, query=query, json_body=body, headers=headers)
+        except Exception as e:
+            status = type(e).__name__
+        finally:
+            free_slots += 1
+        samples.setdefault(label, []).append((time.perf_counter() - scheduled) * 1000)
+        statuses.setdefault(label, {}).setdefault(str(status), 0)
+        statuses[label][str(status)] += 1
+        if not isinstance(status, int) or status >= 500:
+            errors[label] = errors.get(label, 0) + 1
+
+    start = time.perf_counter()
+    total = int(rps * duration)
+    for i in range(total):
+        scheduled = start + i / rps
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if free_slots <= 0:
+            # The client itself is saturated; count it rather than queueing without bound
+            dropped += 1
+            continue
+        free_slots -= 1
+        request = scenarios.build(rng.choices(names, weights)[0])
+        task = asyncio.create_task(one(*request, scheduled))
+        in_flight.add(task)
+        task.add_done_callback(in_flight.discard)
+    if in_flight:
+        await asyncio.gather(*in_flight)
+    elapsed = time.perf_counter() - start
+
+    routes = {}
+    for label, latencies in sorted(samples.items()):
+        summary = summarize(latencies)
+        summary["errors"] = errors.get(label, 0)
+        summary["error_rate"] = round(summary["errors"] / len(latencies), 4)
+        summary["statuses"] = statuses[label]
+        routes[label] = summary
+    completed = sum(len(v) for v in samples.values())
+    overall = summarize([x for v in samples.values() for x in v])
+    overall["errors"] = sum(errors.values())
+    overall["error_rate"] = round(overall["errors"] / completed, 4) if completed else None
+    return {
+        "target_rps": rps,
+        "achieved_rps": round(completed / elapsed, 2),
+        "duration_s": round(elapsed, 2),
+        "sent": total - dropped,
+        "dropped": dropped,
+        "overall": overall,
+        "routes": routes,
+    }
+
+
+def find_saturation(steps, slo_p99_ms, max_error_rate):
+    """First step that misses its target rate, the p99 SLO or the error budget."""
+    for step in steps:
+        reasons = []
+        if step["achieved_rps"] < 0.9 * step["target_rps"] or step["dropped"]:
+            reasons.append("throughput")
+        if step["overall"].get("p99_ms", 0) > slo_p99_ms:
+            reasons.append("p99")
+        if (step["overall"].get("error_rate") or 0) > max_error_rate:
+            reasons.append("errors")
+        if reasons:
+            return {"rps": step["target_rps"], "reasons": reasons}
+    return None
+
+
+def _start_uvicorn(port, workers):
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--workers", str(workers),
+         "--log-level", "warning"],
+        env=dict(os.environ),
+        stdout=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/health")
+            if conn.getresponse().status == 200:
+                return process
+        except OSError:
+            time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError("uvicorn did not become healthy")
+
+
+def print_report(report, out=sys.stderr):
+    for step in report["steps"]:
+        print(f"\n== {step['target_rps']} rps target, {step['achieved_rps']} achieved, "
+              f"{step['dropped']} dropped ==", file=out)
+        print(f"{'route':<40} {'n':>6} {'p50':>9} {'p95':>9} {'p99':>9} {'err%':>6}", file=out)
+        for label, r in step["routes"].items():
+            print(f"{label:<40} {r['n']:>6} {r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f} {r['p99_ms']:>9.1f} "
+                  f"{r['error_rate'] * 100:>6.2f}", file=out)
+    saturation = report["saturation"]
+    print(f"\nSaturation: {saturation['rps']} rps ({', '.join(saturation['reasons'])})" if saturation
+          else "\nNo saturation within the tested rates", file=out)
+
+
+async def run(args, meta):
+    from app.auth import create_access_token
+
+    rng = random.Random(args.seed)
+    await cleanup_database()
+    users = await seed_database(args, meta)
+    tokens = [create_access_token({"sub": username}) for _, username in users]
+    scenarios = Scenarios(meta, users, tokens, rng)
+    mix = parse_mix(args.mix)
+
+    process = None
+    app = None
+    if args.target == "uvicorn":
+        process = _start_uvicorn(args.port, args.workers)
+        client = HTTPClient("127.0.0.1", args.port, args.max_in_flight)
+    else:
+        from app.main import app
+        await app.router.startup()
+        client = ASGIClient(app)
+
+    steps = []
+    try:
+        for rps in [float(r) for r in args.rps.split(",")]:
+            with contextlib.redirect_stdout(sys.stderr):
+                steps.append(await run_step(client, scenarios, mix, rps, args.duration, args.max_in_flight, rng))
+    finally:
+        if process is not None:
+            client.close()
+            process.terminate()
+            process.wait()
+        if app is not None:
+            await app.router.shutdown()
+        await cleanup_database()
+        from app.database import async_engine
+        await async_engine.dispose()
+    return steps
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the API with a weighted traffic mix")
+    parser.add_argument("--target", choices=["asgi", "uvicorn"], default="asgi")
+    parser.add_argument("--port", type=int, default=8099, help="uvicorn port")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers")
+    parser.add_argument("--rps", default="25,50,100", help="comma-separated target rates, one step each")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds per step")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="scenario=weight pairs")
+    parser.add_argument("--max-in-flight", type=int, default=256)
+    parser.add_argument("--slo-p99-ms", type=float, default=500.0)
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--movies", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--history-per-user", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="TMDB stub latency")
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--tmdb-error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="Write the JSON report here as well as to stdout")
+    args = parser.parse_args()
+
+    catalog_dir = tempfile.mkdtemp(prefix="loadtest-catalog-")
+    meta = generate_catalog(args.movies, catalog_dir, seed=args.seed)
+    stub = TMDBStub(meta, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, error_rate=args.tmdb_error_rate).start()
+    configure_app(catalog_dir, stub.url)
+    try:
+        steps = asyncio.run(run(args, meta))
+    finally:
+        stub.stop()
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "created_at": datetime.utcnow().isoformat(),
+            "params": vars(args),
+            "tmdb_stub_requests": stub.requests,
+        },
+        "steps": steps,
+        "saturation": find_saturation(steps, args.slo_p99_ms, args.max_error_rate),
+    }
+    print_report(report)
+    output = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output)
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
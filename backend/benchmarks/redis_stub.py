@@ -0,0 +1,214 @@
+"""
+In-memory stand-in for a Redis-protocol cache server, with injectable latency.
+
+Implements the commands the shared cache uses (GET, MGET, SET with EX/PX/NX/XX,
+DEL, EXISTS) plus PING, ECHO, AUTH, SELECT, DBSIZE, FLUSHDB/FLUSHALL and QUIT,
+so app.redis_backend and several app replicas can be exercised without a real
+server. Point the app at it with CACHE_URL=redis://127.0.0.1:<port>/0.
+
+    python -m benchmarks.redis_stub --port 6390 --latency-ms 0.5
+"""
+import argparse
+import socketserver
+import threading
+import time
+
+
+def parse_commands(buffer):
+    """
+    Complete RESP commands at the start of `buffer` (a bytearray), as lists of
+    bytes, and how many bytes they used. A partial command is left for the next read.
+    """
+    commands, pos = [], 0
+    while pos < len(buffer):
+        end = buffer.find(b"\r\n", pos)
+        if end < 0:
+            break
+        if buffer[pos:pos + 1] != b"*":
+            # Inline command, as typed into telnet
+            commands.append(bytes(buffer[pos:end]).split())
+            pos = end + 2
+            continue
+        args, cursor = [], end + 2
+        for _ in range(int(buffer[pos + 1:end])):
+            header_end = buffer.find(b"\r\n", cursor)
+            if header_end < 0:
+                break
+            length = int(buffer[cursor + 1:header_end])
+            data_end = header_end + 2 + length
+            if data_end + 2 > len(buffer):
+                break
+            args.append(bytes(buffer[header_end + 2:data_end]))
+            cursor = data_end + 2
+        else:
+            commands.append(args)
+            pos = cursor
+            continue
+        break
+    return commands, pos
+
+
+def _bulk(value):
+    if value is None:
+        return b"$-1\r\n"
+    return b"$%d\r\n%s\r\n" % (len(value), value)
+
+
+def _int(n):
+    return b":%d\r\n" % n
+
+
+def _error(message):
+    return f"-{message}\r\n".encode()
+
+
+OK = b"+OK\r\n"
+
+
+class RedisStub:
+    """Threaded TCP server keeping keys in a dict; each round trip waits `latency_ms` first."""
+
+    def __init__(self, latency_ms=0.0, host="127.0.0.1", port=0):
+        self.latency_ms = latency_ms
+        self._lock = threading.Lock()
+        self._data = {}  # key -> (value, expires_at or None)
+        self.commands = 0
+        self.connections = 0
+        self._server = socketserver.ThreadingTCPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"redis://{host}:{port}/0"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="redis-stub", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _get(self, key, now):
+        item = self._data.get(key)
+        if item is None:
+            return None
+        if item[1] is not None and item[1] <= now:
+            del self._data[key]
+            return None
+        return item[0]
+
+    def execute(self, args):
+        """Response bytes for one command (a list of bytes arguments)."""
+        name = args[0].upper().decode()
+        now = time.monotonic()
+        with self._lock:
+            self.commands += 1
+            if name == "PING":
+                return b"+PONG\r\n" if len(args) == 1 else _bulk(args[1])
+            if name == "ECHO":
+                return _bulk(args[1])
+            if name in ("AUTH", "SELECT"):
+                return OK
+            if name == "GET":
+                return _bulk(self._get(args[1], now))
+            if name == "MGET":
+                return b"*%d\r\n" % (len(args) - 1) + b"".join(_bulk(self._get(k, now)) for k in args[1:])
+            if name == "SET":
+                return self._set(args[1:], now)
+            if name == "DEL":
+                removed = 0
+                for key in args[1:]:
+                    if self._get(key, now) is not None:
+                        del self._data[key]
+                        removed += 1
+                return _int(removed)
+            if name == "EXISTS":
+                return _int(sum(self._get(key, now) is not None for key in args[1:]))
+            if name == "DBSIZE":
+                return _int(sum(self._get(key, now) is not None for key in list(self._data)))
+            if name in ("FLUSHDB", "FLUSHALL"):
+                self._data.clear()
+                return OK
+        return _error(f"ERR unknown command '{name}'")
+
+    def _set(self, args, now):
+        if len(args) < 2:
+            return _error("ERR wrong number of arguments for 'set' command")
+        key, value, options = args[0], args[1], [a.upper() for a in args[2:]]
+        expires_at = None
+        i = 0
+        while i < len(options):
+            option = options[i]
+            if option in (b"EX", b"PX") and i + 1 < len(options):
+                amount = int(options[i + 1])
+                if amount <= 0:
+                    return _error("ERR invalid expire time in 'set' command")
+                expires_at = now + (amount if option == b"EX" else amount / 1000)
+                i += 2
+                continue
+            if option == b"NX" and self._get(key, now) is not None:
+                return b"$-1\r\n"
+            if option == b"XX" and self._get(key, now) is None:
+                return b"$-1\r\n"
+            if option not in (b"NX", b"XX"):
+                return _error("ERR syntax error")
+            i += 1
+        self._data[key] = (value, expires_at)
+        return OK
+
+    def _handler(self):
+        stub = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                stub.connections += 1
+                buffer = bytearray()
+                while True:
+                    try:
+                        data = self.request.recv(65536)
+                    except OSError:
+                        return
+                    if not data:
+                        return
+                    buffer += data
+                    try:
+                        commands, used = parse_commands(buffer)
+                    except ValueError:
+                        self.request.sendall(_error("ERR Protocol error"))
+                        return
+                    del buffer[:used]
+                    if not commands:
+                        continue
+                    # A pipelined batch pays the latency once, like one network round trip
+                    if stub.latency_ms:
+                        time.sleep(stub.latency_ms / 1000)
+                    replies = []
+                    for args in commands:
+                        if not args:
+                            continue
+                        if args[0].upper() == b"QUIT":
+                            replies.append(OK)
+                            self.request.sendall(b"".join(replies))
+                            return
+                        replies.append(stub.execute(args))
+                    self.request.sendall(b"".join(replies))
+
+        return Handler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a local in-memory Redis-protocol stand-in")
+    parser.add_argument("--port", type=int, default=6390)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    stub = RedisStub(args.latency_ms, port=args.port)
+    print(f"Redis stub listening on {stub.url}")
+    try:
+        stub._server.serve_forever()
+    except KeyboardInterrupt:
+        stub.stop()
@@ -0,0 +1,183 @@
+"""
+Synthetic catalog and user generator for the benchmarks.
+
+Writes movie_dict.pkl, simi.pkl and movie_meta.pkl in the same shapes the app
+loads from app/ml_model, so app.recommendations can be pointed at them with
+MODEL_DIR. Everything is derived from a seed, so runs are reproducible.
+
+    python -m benchmarks.synthetic --movies 50000 --out /tmp/catalog
+"""
+import argparse
+import pickle
+from pathlib import Path
+import numpy as np
+
+# Up to this many movies the similarity matrix is dense, like the trained model
+DENSE_LIMIT = 10_000
+# Distinct rows kept for larger catalogs (rows are views into this pool)
+SIMILARITY_POOL = 16
+# Synthetic TMDB ids start here so they can't collide with real movies in a shared database
+SYNTHETIC_ID_OFFSET = 900000000
+
+GENRES = [
+    "Action", "Adventure", "Animation", "Comedy", "Crime", "Documentary", "Drama", "Family",
+    "Fantasy", "History", "Horror", "Music", "Mystery", "Romance", "Science Fiction",
+    "Thriller", "War", "Western",
+]
+
+_SYLLABLES = [
+    "ka", "lo", "mi", "ra", "ten", "vor", "shi", "an", "el", "dor", "ul", "bri", "gan", "tho",
+    "mar", "zen", "qui", "fa", "ro", "nex", "sol", "tra", "vin", "or", "ast", "ur", "pel", "dra",
+]
+
+
+class SyntheticSimilarity:
+    """
+    Stand-in for the N x N similarity matrix when N is too large to store.
+
+    simi[row] returns one of a small pool of precomputed rows, so lookups cost
+    what indexing the real matrix costs and the ranking work stays O(N).
+    """
+
+    def __init__(self, n_movies, seed=0, pool=SIMILARITY_POOL):
+        rng = np.random.default_rng(seed)
+        self.shape = (n_movies, n_movies)
+        self._pool = rng.random((pool, n_movies), dtype=np.float32)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, row):
+        return self._pool[row % len(self._pool)]
+
+
+def _words(rng, count, syllables=(2, 3)):
+    lengths = rng.integers(syllables[0], syllables[1] + 1, size=count)
+    picks = rng.integers(0, len(_SYLLABLES), size=int(lengths.sum()))
+    words, i = [], 0
+    for length in lengths:
+        words.append("".join(_SYLLABLES[j] for j in picks[i:i + length]))
+        i += length
+    return words
+
+
+def generate_catalog(n_movies, out_dir, seed=0, poster_fraction=0.9, dense_limit=DENSE_LIMIT,
+                     id_offset=SYNTHETIC_ID_OFFSET):
+    """
+    Write a synthetic model + metadata for `n_movies` movies to `out_dir`; returns the metadata dict.
+
+    `id_offset` shifts every TMDB id, so synthetic movies can't collide with real rows in a shared database.
+    """
+    rng = np.random.default_rng(seed)
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    vocabulary = np.array(_words(rng, 5000))
+    people = np.array([f"{a.title()} {b.title()}" for a, b in zip(_words(rng, 20000), _words(rng, 20000))])
+    genre_names = np.array(GENRES)
+    # TMDB ids are sparse and unordered in the real catalog
+    tmdb_ids = id_offset + rng.choice(np.arange(1, n_movies * 20), size=n_movies, replace=False)
+    popularity = rng.pareto(1.5, size=n_movies) * 10
+
+    # Draw everything per column up front; the loop below only assembles rows
+    title_lengths = rng.integers(1, 5, size=n_movies)
+    title_words = rng.integers(0, len(vocabulary), size=(n_movies, 4))
+    overview_words = rng.integers(0, len(vocabulary), size=(n_movies, 12))
+    keyword_words = rng.integers(0, len(vocabulary), size=(n_movies, 3))
+    genre_counts = rng.integers(1, 4, size=n_movies)
+    genre_picks = np.argsort(rng.random((n_movies, len(GENRES))), axis=1)[:, :3]
+    cast_picks = rng.integers(0, len(people), size=(n_movies, 4))
+    years = rng.integers(1950, 2025, size=n_movies)
+    months = rng.integers(1, 13, size=n_movies)
+    days = rng.integers(1, 29, size=n_movies)
+    votes = rng.uniform(3, 9, size=n_movies)
+    has_poster = rng.random(n_movies) < poster_fraction
+
+    titles, tags, meta = [], [], {}
+    genre_lists, cast_lists, director_lists = [], [], []
+    for i in range(n_movies):
+        title = " ".join(w.title() for w in vocabulary[title_words[i, :title_lengths[i]]])
+        genres = genre_names[genre_picks[i, :genre_counts[i]]].tolist()
+        cast = people[cast_picks[i, :3]].tolist()
+        directors = [str(people[cast_picks[i, 3]])]
+        overview = " ".join(vocabulary[overview_words[i]])
+        titles.append(title)
+        # Tags mimic the trained model: overview words plus glued, lowercased names
+        tags.append(" ".join(
+            [overview] + [g.lower().replace(" ", "") for g in genres]
+            + [p.lower().replace(" ", "") for p in cast + directors]
+        ))
+        genre_lists.append(genres)
+        cast_lists.append(cast)
+        director_lists.append(directors)
+        tmdb_id = int(tmdb_ids[i])
+        meta[tmdb_id] = {
+            "title": title,
+            "overview": overview,
+            "release_date": f"{years[i]}-{months[i]:02d}-{days[i]:02d}",
+            "vote_average": round(float(votes[i]), 1),
+            "popularity": round(float(popularity[i]), 3),
+            "genres": genres,
+            "keywords": vocabulary[keyword_words[i]].tolist(),
+            "cast": cast,
+            "directors": directors,
+            "poster_path": f"/synthetic{tmdb_id}.jpg" if has_poster[i] else None,
+        }
+
+    # The trained model has no genres/actors/directors columns; they are included here so
+    # recommend_by_preferences() can be timed at all
+    movie_dict = {
+        "movie_id": [int(t) for t in tmdb_ids],
+        "title": titles,
+        "tags": tags,
+        "genres": genre_lists,
+        "actors": cast_lists,
+        "directors": director_lists,
+    }
+    if n_movies <= dense_limit:
+        simi = rng.random((n_movies, n_movies), dtype=np.float32)
+    else:
+        simi = SyntheticSimilarity(n_movies, seed=seed)
+
+    with open(out_dir / "movie_dict.pkl", "wb") as f:
+        pickle.dump(movie_dict, f, protocol=pickle.HIGHEST_PROTOCOL)
+    with open(out_dir / "simi.pkl", "wb") as f:
+        pickle.dump(simi, f, protocol=pickle.HIGHEST_PROTOCOL)
+    with open(out_dir / "movie_meta.pkl", "wb") as f:
+        pickle.dump(meta, f, protocol=pickle.HIGHEST_PROTOCOL)
+    return meta
+
+
+def generate_users(n_users, catalog_ids, seed=0, history_per_user=20, ratings_per_user=5):
+    """
+    Yield (username, favorites, history tmdb ids, [(tmdb_id, rating)]) per synthetic user.
+
+    Watches are skewed towards the first (most popular) ids in `catalog_ids`.
+    """
+    rng = np.random.default_rng(seed + 1)
+    catalog_ids = np.asarray(catalog_ids)
+    # Zipf-like draw by inverse CDF: O(log N) per pick, so 1M-movie catalogs stay cheap
+    cdf = np.cumsum(1.0 / np.arange(1, len(catalog_ids) + 1))
+    cdf /= cdf[-1]
+    history_per_user = min(history_per_user, len(catalog_ids))
+    for i in range(n_users):
+        picks = np.searchsorted(cdf, rng.random(history_per_user * 3))
+        picks = picks[np.sort(np.unique(picks, return_index=True)[1])][:history_per_user]
+        watched = catalog_ids[picks]
+        rated = watched[:ratings_per_user]
+        yield (
+            f"bench_user_{i}",
+            list(rng.choice(GENRES, size=2, replace=False)),
+            [int(t) for t in watched],
+            [(int(t), float(rng.integers(1, 11)) / 2) for t in rated],
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic movie catalog")
+    parser.add_argument("--movies", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", required=True, help="Directory to write the .pkl files to")
+    args = parser.parse_args()
+    generate_catalog(args.movies, args.out, seed=args.seed)
+    print(f"Wrote {args.movies} movies to {args.out}")
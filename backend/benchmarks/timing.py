@@ -0,0 +1,45 @@
+import time
+
+
+def summarize(samples_ms):
+    """Latency summary (ms) for a list of samples."""
+    if not samples_ms:
+        return {"n": 0}
+    ordered = sorted(samples_ms)
+
+    def pct(q):
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 4)
+
+    return {
+        "n": len(ordered),
+        "mean_ms": round(sum(ordered) / len(ordered), 4),
+        "p50_ms": pct(0.50),
+        "p95_ms": pct(0.95),
+        "p99_ms": pct(0.99),
+        "min_ms": round(ordered[0], 4),
+        "max_ms": round(ordered[-1], 4),
+    }
+
+
+def time_calls(fn, args_list, warmup=3):
+    """Call fn(*args) for each args tuple; returns the latency summary (warm-up calls not counted)."""
+    for args in args_list[:warmup]:
+        fn(*args)
+    samples = []
+    for args in args_list:
+        start = time.perf_counter()
+        fn(*args)
+        samples.append((time.perf_counter() - start) * 1000)
+    return summarize(samples)
+
+
+async def time_async_calls(fn, args_list, warmup=0):
+    """Async counterpart of time_calls; calls run one at a time."""
+    for args in args_list[:warmup]:
+        await fn(*args)
+    samples = []
+    for args in args_list:
+        start = time.perf_counter()
+        await fn(*args)
+        samples.append((time.perf_counter() - start) * 1000)
+    return summarize(samples)
@@ -0,0 +1,156 @@
+"""
+Local stand-in for the TMDB endpoints the backend calls, with injectable latency.
+
+Serves /movie/{id}, /movie/popular, /search/movie, /genre/movie/list,
+/discover/movie, /search/person and /person/{id}/movie_credits under /3, from
+a synthetic catalog's metadata. Point the app at it with
+TMDB_BASE_URL=http://127.0.0.1:<port>/3.
+
+    python -m benchmarks.tmdb_stub --catalog /tmp/catalog --port 8765 --latency-ms 80
+"""
+import argparse
+import json
+import pickle
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlparse, parse_qs
+
+GENRE_IDS = {
+    "Action": 28, "Adventure": 12, "Animation": 16, "Comedy": 35, "Crime": 80, "Documentary": 99,
+    "Drama": 18, "Family": 10751, "Fantasy": 14, "History": 36, "Horror": 27, "Music": 10402,
+    "Mystery": 9648, "Romance": 10749, "Science Fiction": 878, "Thriller": 53, "War": 10752, "Western": 37,
+}
+
+# Ids at or above this are answered with 404, to exercise the "movie not found" paths
+MISSING_ID_FLOOR = 2_000_000_000
+
+_MOVIE_PATH = re.compile(r"^/3/movie/(\d+)$")
+_CREDITS_PATH = re.compile(r"^/3/person/(\d+)/movie_credits$")
+
+
+class TMDBStub:
+    """Threaded HTTP server answering TMDB-shaped JSON after `latency_ms` (+/- `jitter_ms`)."""
+
+    def __init__(self, movie_meta=None, latency_ms=50.0, jitter_ms=10.0, error_rate=0.0,
+                 host="127.0.0.1", port=0):
+        self.movie_meta = movie_meta or {}
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.requests = 0
+        self._popular = sorted(self.movie_meta, key=lambda t: -(self.movie_meta[t].get("popularity") or 0))[:200]
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/3"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="tmdb-stub", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def movie(self, tmdb_id):
+        meta = self.movie_meta.get(tmdb_id)
+        if meta is None:
+            meta = {"title": f"Stub Movie {tmdb_id}", "overview": "", "popularity": 1.0, "vote_average": 5.0}
+        return {
+            "id": tmdb_id,
+            "title": meta["title"],
+            "overview": meta.get("overview", ""),
+            "poster_path": meta.get("poster_path") or f"/stub{tmdb_id}.jpg",
+            "release_date": meta.get("release_date"),
+            "vote_average": meta.get("vote_average"),
+            "popularity": meta.get("popularity"),
+            "genre_ids": [GENRE_IDS[g] for g in meta.get("genres", []) if g in GENRE_IDS],
+        }
+
+    def _page(self, ids):
+        results = [self.movie(t) for t in ids[:20]]
+        return {"page": 1, "results": results, "total_pages": 1, "total_results": len(results)}
+
+    def route(self, path, params):
+        """(status, body) for a request path and its query params."""
+        match = _MOVIE_PATH.match(path)
+        if match:
+            tmdb_id = int(match.group(1))
+            if tmdb_id >= MISSING_ID_FLOOR:
+                return 404, {"status_code": 34, "status_message": "The resource you requested could not be found."}
+            return 200, self.movie(tmdb_id)
+        if path in ("/3/movie/popular", "/3/discover/movie"):
+            return 200, self._page(self._popular)
+        if path == "/3/search/movie":
+            query = params.get("query", [""])[0].lower()
+            ids = [t for t in self._popular if query in self.movie_meta[t]["title"].lower()]
+            return 200, self._page(ids)
+        if path == "/3/genre/movie/list":
+            return 200, {"genres": [{"id": i, "name": n} for n, i in GENRE_IDS.items()]}
+        if path == "/3/search/person":
+            name = params.get("query", [""])[0]
+            return 200, {"page": 1, "results": [{"id": abs(hash(name)) % 10_000_000, "name": name}]}
+        match = _CREDITS_PATH.match(path)
+        if match:
+            return 200, {"cast": [self.movie(t) for t in self._popular[:10]], "crew": []}
+        return 404, {"status_code": 34, "status_message": "The resource you requested could not be found."}
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                stub.requests += 1
+                delay = stub.latency_ms + random.uniform(-stub.jitter_ms, stub.jitter_ms)
+                time.sleep(max(delay, 0.0) / 1000)
+                if stub.error_rate and random.random() < stub.error_rate:
+                    status, body, headers = 503, {"status_message": "Service unavailable"}, {"Retry-After": "1"}
+                else:
+                    parsed = urlparse(self.path)
+                    status, body = stub.route(parsed.path, parse_qs(parsed.query))
+                    headers = {}
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a local TMDB stand-in")
+    parser.add_argument("--catalog", help="Directory with movie_meta.pkl (see benchmarks.synthetic)")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    meta = {}
+    if args.catalog:
+        with open(Path(args.catalog) / "movie_meta.pkl", "rb") as f:
+            meta = pickle.load(f)
+    stub = TMDBStub(meta, args.latency_ms, args.jitter_ms, args.error_rate, port=args.port)
+    print(f"TMDB stub listening on {stub.url}")
+    try:
+        stub._server.serve_forever()
+    except KeyboardInterrupt:
+        stub.stop()
@@ -0,0 +1,47 @@
+"""
+Shared setup for the backend tests. Run from backend/:
+
+    python -m pytest tests
+
+The app is pointed at a small synthetic catalog and an unreachable TMDB
+before any test imports it, so nothing leaves the machine. Tests that need
+PostgreSQL use TEST_DATABASE_URL (a disposable database; the app's tables
+are created if missing) and are skipped without it.
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+import pytest
+
+BACKEND = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BACKEND))
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+CATALOG_SIZE = 300
+
+# Never fall through to the DATABASE_URL of a developer's .env
+os.environ["DATABASE_URL"] = TEST_DATABASE_URL or "postgresql://localhost/unused"
+os.environ.setdefault("SECRET_KEY", "test")
+os.environ.setdefault("TMDB_API_KEY", "test")
+os.environ["TMDB_BASE_URL"] = "http://127.0.0.1:9/3"
+os.environ["CACHE_URL"] = ""
+os.environ["MODEL_SHARDS"] = "0"
+os.environ["SCHEDULER_ENABLED"] = "false"
+
+from benchmarks.synthetic import generate_catalog  # noqa: E402
+
+_catalog_dir = tempfile.mkdtemp(prefix="movie-rec-tests-")
+generate_catalog(CATALOG_SIZE, _catalog_dir)
+os.environ["MODEL_DIR"] = _catalog_dir
+
+
+@pytest.fixture(scope="session")
+def database():
+    """The app's sync engine on TEST_DATABASE_URL, with its tables; skips the test without one."""
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    from app.database import Base, engine
+    import app.models  # noqa: F401
+    Base.metadata.create_all(engine)
+    return engine
@@ -0,0 +1,98 @@
+import asyncio
+from datetime import datetime, timedelta
+import pytest
+from app.services.history_buffer import HistoryBuffer, HistoryBufferFull, PendingHistory
+
+
+def _event(tmdb_id, user_id=1, timestamp=None):
+    return PendingHistory(user_id=user_id, tmdb_id=tmdb_id, title=f"Movie {tmdb_id}",
+                          timestamp=timestamp or datetime.utcnow())
+
+
+def _buffer(written, release=None, **options):
+    """HistoryBuffer whose writes are recorded in `written`, held until `release` is set when given."""
+    buffer = HistoryBuffer(**{"max_size": 10, "batch_size": 10, "flush_interval": 0.01,
+                              "enqueue_timeout": 0.05, **options})
+
+    async def write(events):
+        if release is not None:
+            await release.wait()
+        written.extend(events)
+        return len(events)
+
+    buffer._write = write
+    return buffer
+
+
+def test_event_flushed_before_add_returns_is_written():
+    async def scenario():
+        written = []
+        buffer = _buffer(written, batch_size=1, enqueue_timeout=1.0)
+        await buffer.start()
+        put = buffer._queue.put
+
+        async def put_then_yield(item):
+            await put(item)
+            # The flusher takes and writes the event before add() resumes
+            await asyncio.sleep(0.05)
+
+        buffer._queue.put = put_then_yield
+        await buffer.add(_event(1))
+        await buffer.stop()
+        return written, buffer
+
+    written, buffer = asyncio.run(scenario())
+    assert [e.tmdb_id for e in written] == [1]
+    assert buffer.pending_for(1) == []
+
+
+def test_rejected_event_is_not_left_pending():
+    async def scenario():
+        written, release = [], asyncio.Event()
+        buffer = _buffer(written, release, max_size=1, batch_size=1)
+        await buffer.start()
+        await buffer.add(_event(1))  # taken by the flusher, which waits on `release`
+        await asyncio.sleep(0.01)
+        await buffer.add(_event(2))  # fills the queue
+        with pytest.raises(HistoryBufferFull):
+            await buffer.add(_event(3))
+        pending = [e.tmdb_id for e in buffer.pending_for(1)]
+        release.set()
+        await buffer.stop()
+        return written, buffer, pending
+
+    written, buffer, pending = asyncio.run(scenario())
+    assert sorted(pending) == [1, 2]
+    assert [e.tmdb_id for e in written] == [1, 2]
+    assert (buffer.accepted, buffer.rejected) == (2, 1)
+    assert buffer.pending_for(1) == []
+
+
+def test_repeat_watch_keeps_the_first():
+    async def scenario():
+        written = []
+        buffer = _buffer(written, flush_interval=0.2)
+        await buffer.start()
+        first = _event(1, timestamp=datetime.utcnow() - timedelta(minutes=5))
+        await buffer.add(first)
+        await buffer.add(_event(1))
+        await buffer.stop()
+        return written, first
+
+    written, first = asyncio.run(scenario())
+    assert written == [first]
+
+
+def test_discarded_events_are_not_written():
+    async def scenario():
+        written = []
+        buffer = _buffer(written, flush_interval=0.2)
+        await buffer.start()
+        await buffer.add(_event(1))
+        await buffer.add(_event(2, user_id=2))
+        buffer.discard_user(1)
+        await buffer.stop()
+        return written
+
+    written = asyncio.run(scenario())
+    assert [(e.user_id, e.tmdb_id) for e in written] == [(2, 2)]
@@ -0,0 +1,48 @@
+import asyncio
+import pytest
+from sqlalchemy import text
+from app.recommendations import movies, row_for_tmdb_id
+from app.services.popularity_service import PopularityService
+
+USERNAME = "test_user_popularity"
+
+
+@pytest.fixture
+def old_and_new_events(database):
+    """One movie watched and rated at the epoch and one watched now, by a throwaway user."""
+    old_id, new_id = (int(tmdb_id) for tmdb_id in movies["movie_id"].iloc[:2])
+    with database.begin() as conn:
+        user_id = conn.execute(text(
+            "INSERT INTO users (username, email, password) VALUES (:name, :name || '@test.local', 'x') RETURNING id"
+        ), {"name": USERNAME}).scalar_one()
+        conn.execute(text(
+            "INSERT INTO movies (tmdb_id, title) VALUES (:old, 'old'), (:new, 'new') ON CONFLICT (tmdb_id) DO NOTHING"
+        ), {"old": old_id, "new": new_id})
+        conn.execute(text("""
+            INSERT INTO history (user_id, movie_id, title, timestamp)
+            SELECT :user_id, id, title, CASE WHEN tmdb_id = :old THEN timestamp 'epoch' ELSE now() END
+            FROM movies WHERE tmdb_id IN (:old, :new)
+        """), {"user_id": user_id, "old": old_id, "new": new_id})
+        conn.execute(text(
+            "INSERT INTO ratings (user_id, tmdb_id, rating, created_at) VALUES (:user_id, :old, 5, timestamp 'epoch')"
+        ), {"user_id": user_id, "old": old_id})
+    yield old_id, new_id
+    with database.begin() as conn:
+        conn.execute(text("DELETE FROM users WHERE username = :name"), {"name": USERNAME})
+
+
+def test_refresh_survives_events_decades_old(old_and_new_events):
+    # exp() of the uncapped exponent underflows and PostgreSQL raises instead of returning 0
+    old_id, new_id = old_and_new_events
+    service = PopularityService(half_life_days=1)
+
+    async def refresh():
+        from app.database import async_engine
+        try:
+            await service.refresh(full=True)
+        finally:
+            await async_engine.dispose()
+
+    asyncio.run(refresh())
+    assert service._engagement[row_for_tmdb_id(old_id)] == pytest.approx(0.0)
+    assert service._engagement[row_for_tmdb_id(new_id)] > 0.5
@@ -0,0 +1,90 @@
+import os
+import signal
+import time
+import numpy as np
+import pytest
+from app import shards
+
+N_ROWS = 64
+K = 5
+
+
+@pytest.fixture
+def simi():
+    matrix = np.random.default_rng(0).random((N_ROWS, N_ROWS), dtype=np.float32)
+    return (matrix + matrix.T) / 2
+
+
+@pytest.fixture
+def index(simi, tmp_path):
+    shards.build(simi, tmp_path, 2)
+    index = shards.ShardedIndex(tmp_path, timeout=5.0)
+    index.warm()
+    yield index
+    index.close()
+
+
+def _expected(simi, row, k=K, columns=slice(None)):
+    offset = columns.start or 0
+    scores = simi[row, columns]
+    top = np.argsort(-scores, kind="stable")[:k]
+    return [(pytest.approx(float(scores[i])), int(i) + offset) for i in top]
+
+
+def _wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_scatter_gather_matches_a_full_scan(index, simi):
+    for row in (0, 17, N_ROWS - 1):
+        assert index.similar(row, K) == _expected(simi, row)
+
+
+def test_killed_worker_is_replaced(index, simi):
+    shard = index.shards[0]
+    worker = shard._worker
+    os.kill(worker.process.pid, signal.SIGKILL)
+    worker.process.join(timeout=5)
+    _wait_until(lambda: not worker.alive)
+
+    assert index.similar(3, K) == _expected(simi, 3)
+    assert shard.restarts == 1
+    assert index.stats()["partial_results"] == 0
+
+
+needs_sigstop = pytest.mark.skipif(not hasattr(signal, "SIGSTOP"), reason="needs SIGSTOP")
+
+
+@needs_sigstop
+def test_slow_shard_gives_partial_results(index, simi):
+    slow, fast = index.shards
+    pid = slow._worker.process.pid
+    index.timeout = 0.2
+    os.kill(pid, signal.SIGSTOP)
+    try:
+        # Only the second shard's columns make it into the answer
+        assert index.similar(7, K) == _expected(simi, 7, columns=slice(fast.args[1], fast.args[2]))
+    finally:
+        os.kill(pid, signal.SIGCONT)
+    assert index.stats()["partial_results"] == 1
+
+    # The late reply is dropped rather than answering the next query
+    index.timeout = 5.0
+    assert index.similar(9, K) == _expected(simi, 9)
+    assert slow.restarts == 0
+
+
+@needs_sigstop
+def test_no_shard_answering_raises(index):
+    for shard in index.shards:
+        os.kill(shard._worker.process.pid, signal.SIGSTOP)
+    index.timeout = 0.2
+    try:
+        with pytest.raises(shards.ShardsUnavailable):
+            index.similar(0, K)
+    finally:
+        for shard in index.shards:
+            os.kill(shard._worker.process.pid, signal.SIGCONT)
@@ -5,6 +5,7 @@ import { useAuthStore } from '@/store/auth';
 import { useRouter } from 'next/navigation';
 import axios from 'axios';
 import MovieCard from '@/components/ui/MovieCard';
+import { fetchAllPages } from '@/lib/api';
 
 interface Movie {
     id: number;
@@ -13,6 +14,12 @@ interface Movie {
     vote_average: number;
 }
 
+interface HistoryItem {
+    id: number;
+    title: string;
+    poster_path: string;
+}
+
 export default function HistoryPage() {
     const [history, setHistory] = useState<Movie[]>([]);
     const [loading, setLoading] = useState(true);
@@ -39,33 +46,25 @@ export default function HistoryPage() {
 
                 // Fetch user's history
                 console.log('Fetching user history...');
-                const response = await axios.get(
-                    `${process.env.NEXT_PUBLIC_API_URL}/api/users/history`,
-                    {
-                        headers: {
-                            'Authorization': `Bearer ${token}`,
-                            'Content-Type': 'application/json'
-                        }
-                    }
-                );
+                const data = await fetchAllPages<HistoryItem>('/api/users/history', token);
 
-                console.log('History response:', response.data);
+                console.log('History response:', data);
 
-                if (!response.data || !Array.isArray(response.data)) {
-                    console.error('Invalid history response format:', response.data);
+                if (!data || !Array.isArray(data)) {
+                    console.error('Invalid history response format:', data);
                     setError('Invalid history data received from server');
                     setHistory([]);
                     return;
                 }
 
-                if (response.data.length === 0) {
+                if (data.length === 0) {
                     console.log('No history items found');
                     setHistory([]);
                     return;
                 }
 
                 // Convert history items directly to movies
-                const movies: Movie[] = response.data.map(item => ({
+                const movies: Movie[] = data.map(item => ({
                     id: item.id,
                     title: item.title,
                     poster_path: item.poster_path.replace('https://image.tmdb.org/t/p/w500', ''),
@@ -67,10 +67,11 @@ export default function HomePage() {
 
                 setPopularMovies(popularResponse.data.results || []);
 
-                // Fetch user's history to get recommendations
+                // Fetch user's history to get recommendations (only whether there is any)
                 const historyResponse = await axios.get(
                     `${process.env.NEXT_PUBLIC_API_URL}/api/users/history`,
                     {
+                        params: { limit: 1 },
                         headers: {
                             'Authorization': `Bearer ${token}`,
                             'Content-Type': 'application/json'
@@ -38,8 +38,10 @@ interface MovieDetails {
 interface Recommendation {
     id: number;
     title: string;
-    poster_path: string;
-    vote_average: number;
+    poster_path: string | null;
+    year: number | null;
+    vote_average: number | null;
+    score: number;
 }
 
 const RatingComponent = ({ 
@@ -199,11 +201,12 @@ export default function MovieDetailsPage() {
             // First store in history
             await storeMovieHistory(movie.id);
     
-            // Then get recommendations
+            // Then get recommendations (enriched with id/poster by the backend, one request)
             const response = await axios.get(
                 `${process.env.NEXT_PUBLIC_API_URL}/api/recommend/`,
                 {
                     params: { 
+                        tmdb_id: movie.id,
                         movie: movie.title.trim() 
                     },
                     headers: { 
@@ -214,34 +217,7 @@ export default function MovieDetailsPage() {
             );
     
             if (response.data?.recommendations) {
-                // Fetch full movie details for each recommendation
-                const fullRecommendations = await Promise.all(
-                    response.data.recommendations.map(async (movieTitle: string) => {
-                        try {
-                            const tmdbResponse = await axios.get(
-                                `https://api.themoviedb.org/3/search/movie?api_key=${process.env.NEXT_PUBLIC_TMDB_API_KEY}&query=${encodeURIComponent(movieTitle)}&page=1`
-                            );
-                            
-                            // Get the first matching movie
-                            const movie = tmdbResponse.data.results[0];
-                            if (movie) {
-                                return {
-                                    id: movie.id,
-                                    title: movie.title,
-                                    poster_path: movie.poster_path,
-                                    vote_average: movie.vote_average
-                                };
-                            }
-                            return null;
-                        } catch (err) {
-                            console.error(`Error fetching details for ${movieTitle}:`, err);
-                            return null;
-                        }
-                    })
-                );
-
-                // Filter out any null results and set the recommendations
-                setRecommendations(fullRecommendations.filter((rec): rec is Recommendation => rec !== null));
+                setRecommendations(response.data.recommendations);
             } else {
                 setError('No recommendations available for this movie. Try another movie.');
             }
@@ -544,14 +520,14 @@ export default function MovieDetailsPage() {
                                     }}
                                 >
                                     <Image
-                                        src={`https://image.tmdb.org/t/p/w500${rec.poster_path}`}
+                                        src={rec.poster_path ? `https://image.tmdb.org/t/p/w500${rec.poster_path}` : '/default-movie-poster.jpg'}
                                         alt={`Movie poster for ${rec.title}`}
                                         fill
                                         className="object-cover transition-transform duration-300 group-hover:scale-105"
                                     />
                                     <div className="absolute inset-0 bg-gradient-to-t from-black via-black/50 to-transparent opacity-0 group-hover:opacity-100 transition-opacity duration-300">
                                         <div className="absolute bottom-0 left-0 right-0 p-4">
-                                            <h3 className="text-lg font-semibold mb-2">{rec.title}</h3>
+                                            <h3 className="text-lg font-semibold mb-2">{rec.title}{rec.year ? ` (${rec.year})` : ''}</h3>
                                             <p className="text-sm text-yellow-400">
                                                 Rating: {rec.vote_average ? rec.vote_average.toFixed(1) : 'N/A'} / 10
                                             </p>
@@ -57,56 +57,18 @@ export const loginUser = async (userData: { username: string; password: string }
 };
 
 // Fetch Recommendations with Full Movie Details
-export const getRecommendations = async (movie: string, token: string) => {
+export const getRecommendations = async (tmdbId: number, token: string, title?: string) => {
     try {
+        // The backend resolves ids and fills poster/year from local metadata in one response
         const response = await axios.get(`${API_BASE_URL}/api/recommend/`, {
-            params: { movie },
+            params: { tmdb_id: tmdbId, movie: title },
             headers: {
                 'Authorization': `Bearer ${token}`,
                 'Content-Type': 'application/json'
             }
         });
 
-        const movieTitles = response.data.recommendations || [];
-
-        // Fetch movie details from our backend
-        const movieDetails = await Promise.all(
-            movieTitles.map(async (title: string) => {
-                try {
-                    const searchRes = await axios.get(
-                        `${API_BASE_URL}/api/users/search/movie`,
-                        {
-                            params: { query: title },
-                            headers: {
-                                'Authorization': `Bearer ${token}`,
-                                'Content-Type': 'application/json'
-                            }
-                        }
-                    );
-
-                    if (!searchRes.data || !searchRes.data.results || !searchRes.data.results.length) {
-                        console.warn(`No results found for movie: ${title}`);
-                        return null;
-                    }
-
-                    const movieData = searchRes.data.results[0];
-
-                    return {
-                        id: movieData.id,
-                        title: movieData.title,
-                        poster_path: movieData.poster_path,
-                        overview: movieData.overview,
-                        vote_average: movieData.vote_average,
-                        genre_ids: movieData.genre_ids,
-                    };
-                } catch (err) {
-                    console.error("Error fetching movie details:", err);
-                    return null;
-                }
-            })
-        );
-
-        return movieDetails.filter(Boolean);
+        return response.data.recommendations || [];
     } catch (error) {
         console.error("Error fetching recommendations:", error);
         throw error;
@@ -148,16 +110,33 @@ export const getPopularMovies = async (token: string) => {
     }
 };
 
-// Fetch Recommendation History
-export const fetchHistory = async (token: string) => {
-    try {
-        const response = await axios.get(`${API_BASE_URL}/api/users/history`, {
+// Largest page the list endpoints serve (MAX_PAGE_SIZE in backend/app/pagination.py)
+const MAX_PAGE_SIZE = 200;
+
+// Fetch every page of a paginated list endpoint, following the X-Next-Cursor header
+export const fetchAllPages = async <T>(path: string, token: string): Promise<T[]> => {
+    const items: T[] = [];
+    let cursor: string | undefined;
+    do {
+        const response = await axios.get(`${API_BASE_URL}${path}`, {
+            params: { limit: MAX_PAGE_SIZE, cursor },
             headers: {
                 Authorization: `Bearer ${token}`,
             },
         });
+        if (!Array.isArray(response.data)) {
+            throw new Error(`Invalid response format from ${path}`);
+        }
+        items.push(...response.data);
+        cursor = response.headers["x-next-cursor"];
+    } while (cursor);
+    return items;
+};
 
-        return response.data;
+// Fetch Recommendation History
+export const fetchHistory = async (token: string) => {
+    try {
+        return await fetchAllPages("/api/users/history", token);
     } catch (error) {
         console.error("Error fetching history:", error);
         return [];